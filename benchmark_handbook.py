@@ -0,0 +1,809 @@
+# benchmark_handbook.py
+# Замеры производительности обработки справочника.
+# Запуск: python benchmark_handbook.py memory путь/к/handbook.txt
+# Набор замеров на синтетических справочниках (JSON для сравнения коммитов):
+#          python benchmark_handbook.py suite --output результат.json
+
+import argparse
+import gc
+import json
+import multiprocessing
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+from handbook_generator import generate_handbook
+from process_handbook import (
+    CACHE_CODECS,
+    CACHE_CONFIG,
+    CACHE_SERIALIZERS,
+    HANDBOOK_SECTIONS,
+    SECTION_CONFIG,
+    DeferredHandbookLoader,
+    HandbookData,
+    HandbookShardCache,
+    ITEM_LISTS,
+    ITEM_SORTING_CONFIG,
+    ROGUE_BUFF_CONFIG,
+    ROGUE_BUFF_LISTS,
+    Entry,
+    Item,
+    RogueBuffSu,
+    build_handbook_data,
+    build_handbook_data_parallel,
+    directory_size,
+    classify_sections,
+    identify_handbook,
+    iter_handbook_records,
+    iter_handbook_sections,
+    parse_handbook,
+    process_handbook,
+    parse_section_job,
+    scan_handbook_sections,
+)
+from search_engine import SEARCH_CONFIG, build_search_indexes, get_search_index, search_records
+
+# === Эталонные реализации для сравнения ===
+
+def legacy_parse(filename, server_type):
+    # Прежний способ: весь файл читается через readlines(), затем обходится по индексу
+    handbook_data = HandbookData()
+    with open(filename, 'r', encoding='utf-8') as f:
+        lines = f.readlines()
+
+    if server_type == 'LunarCore':
+        if lines[0].startswith('# Lunar Core'):
+            lines = lines[1:]
+    elif server_type == 'DanhengServer':
+        lines = lines[1:]
+
+    skip_sections = SECTION_CONFIG.get(server_type, {}).get('skip_sections', [])
+    processors = legacy_processors(server_type)
+
+    current_section = None
+    i = 0
+    while i < len(lines):
+        line = lines[i].strip()
+        if not line:
+            i += 1
+            continue
+        if line.startswith('#'):
+            current_section = line.lstrip('#').strip()
+            i += 1
+            continue
+        if current_section in skip_sections:
+            i += 1
+            continue
+        if ':' in line:
+            id_part, name_part = line.split(':', 1)
+            if current_section in processors:
+                processors[current_section](id_part.strip(), name_part.strip(), handbook_data, current_section)
+        i += 1
+    return handbook_data
+
+def legacy_process_item_line(id_str, name, handbook_data, current_section):
+    # Прежняя классификация предметов: цепочка проверок диапазонов ITEM_SORTING_CONFIG
+    if not id_str.isdigit():
+        return
+
+    id_int = int(id_str)
+
+    if ITEM_SORTING_CONFIG['unknown_marker'] in name.lower():
+        item_type = 'unknown'
+    elif ITEM_SORTING_CONFIG['skip_range'][0] <= id_int <= ITEM_SORTING_CONFIG['skip_range'][1]:
+        return
+    elif ITEM_SORTING_CONFIG['material_range'][0] <= id_int <= ITEM_SORTING_CONFIG['material_range'][1]:
+        item_type = 'material'
+    elif ITEM_SORTING_CONFIG['base_material_range'][0] <= id_int <= ITEM_SORTING_CONFIG['base_material_range'][1]:
+        item_type = 'base_material'
+    elif ITEM_SORTING_CONFIG['lightcone_range'][0] <= id_int <= ITEM_SORTING_CONFIG['lightcone_range'][1]:
+        item_type = 'lightcone'
+        if len(id_str) < 2:
+            return
+        second_digit = id_str[1]
+        rarity = ITEM_SORTING_CONFIG['lightcone_rarity_map'].get(second_digit)
+        item = Item(item_id=id_str, title=name, item_type=item_type, section=current_section, rarity=rarity)
+        handbook_data.lightcones_list.append(item)
+        return
+    elif len(id_str) == ITEM_SORTING_CONFIG['relic_valid_length'] and id_str[1] != '0':
+        first_digit = int(id_str[0])
+        low, high = ITEM_SORTING_CONFIG['relic_valid_first_digit_range']
+        if low <= first_digit <= high:
+            rarity = first_digit - 1
+            last_digit = int(id_str[-1])
+            if last_digit in ITEM_SORTING_CONFIG['relic_type_map']['default']:
+                item_type = 'default'
+            elif last_digit in ITEM_SORTING_CONFIG['relic_type_map']['planars']:
+                item_type = 'planars'
+            else:
+                item_type = 'unknown'
+            item = Item(item_id=id_str, title=name, item_type=item_type, section=current_section, rarity=rarity)
+            handbook_data.relics_list.append(item)
+            return
+        else:
+            item_type = 'other'
+    else:
+        item_type = 'other'
+
+    item = Item(item_id=id_str, title=name, item_type=item_type, section=current_section)
+    if item_type == 'material':
+        handbook_data.materials_list.append(item)
+    elif item_type == 'base_material':
+        handbook_data.base_materials_list.append(item)
+    elif item_type == 'unknown':
+        handbook_data.unknown_items_list.append(item)
+    elif item_type == 'other':
+        handbook_data.other_items_list.append(item)
+
+def legacy_process_rogue_buff_line(id_str, name, handbook_data):
+    # Прежняя классификация баффов: перебор префиксов category_map через startswith
+    if any(name.startswith(prefix) for prefix in ROGUE_BUFF_CONFIG['empty_prefixes']):
+        handbook_data.rogue_buffs_unknown.append(Entry(id_str, name))
+    elif len(id_str) == ROGUE_BUFF_CONFIG['su']['id_length'] and id_str.startswith(ROGUE_BUFF_CONFIG['su']['prefix']):
+        category = 'unknown'
+        for key, cat in ROGUE_BUFF_CONFIG['su']['category_map'].items():
+            if id_str.startswith(key):
+                category = cat
+                break
+
+        buff_type = None
+        rarity = None
+        if category in ['basic su', 'divergent su', 'divergent su: PH']:
+            buff_type = ROGUE_BUFF_CONFIG['su']['type_map'].get(id_str[3], 'Unknown')
+            rarity = ROGUE_BUFF_CONFIG['su']['rarity_map'].get(id_str[4])
+        handbook_data.rogue_buffs_su.append(RogueBuffSu(id_str, name, category, buff_type, rarity))
+    elif len(id_str) == ROGUE_BUFF_CONFIG['food']['id_length'] and id_str.startswith(ROGUE_BUFF_CONFIG['food']['prefix']):
+        handbook_data.rogue_buffs_food.append(Entry(id_str, name))
+    elif len(id_str) == ROGUE_BUFF_CONFIG['various']['id_length'] and id_str.startswith(ROGUE_BUFF_CONFIG['various']['prefix']):
+        handbook_data.rogue_buffs_various.append(Entry(id_str, name))
+    elif len(id_str) == ROGUE_BUFF_CONFIG['from_entities']['id_length'] and any(id_str.startswith(pref) for pref in ROGUE_BUFF_CONFIG['from_entities']['prefixes']):
+        handbook_data.rogue_buffs_from_entities.append(Entry(id_str, name))
+    else:
+        handbook_data.rogue_buffs_other.append(Entry(id_str, name))
+
+def legacy_entry_processor(attr):
+    return lambda id_str, name, hd, section: getattr(hd, attr).append(Entry(id_str, name))
+
+def legacy_processors(server_type):
+    # Прежняя диспетчеризация: отдельный вызов обработчика на каждую строку
+    config = SECTION_CONFIG.get(server_type, {})
+    processors = {}
+    for section, processor in config.get('processors', {}).items():
+        outputs = config['section_outputs'][section]
+        if isinstance(processor, str):
+            processors[section] = legacy_entry_processor(processor)
+        elif outputs is ITEM_LISTS:
+            processors[section] = lambda id_str, name, hd, section: legacy_process_item_line(id_str, name, hd, section)
+        elif outputs is ROGUE_BUFF_LISTS:
+            processors[section] = lambda id_str, name, hd, section: legacy_process_rogue_buff_line(id_str, name, hd)
+        else:
+            processors[section] = processor
+    return processors
+
+def legacy_classify(records, server_type):
+    handbook_data = HandbookData()
+    processors = legacy_processors(server_type)
+    for section, id_str, name in records:
+        processor = processors.get(section)
+        if processor:
+            processor(id_str, name, handbook_data, section)
+    return handbook_data
+
+class LegacyItem:
+    # Прежнее представление Item: обычный класс с __dict__
+    def __init__(self, item_id, title, item_type, section, rarity=None, main_stats=None):
+        self.id = item_id
+        self.title = title
+        self.type = item_type
+        self.section = section
+        self.rarity = rarity
+        self.main_stats = main_stats or []
+
+class LegacyRogueBuffSu:
+    # Прежнее представление RogueBuffSu: обычный класс с __dict__
+    def __init__(self, buff_id, name, category=None, buff_type=None, rarity=None):
+        self.id = buff_id
+        self.name = name
+        self.category = category
+        self.buff_type = buff_type
+        self.rarity = rarity
+
+def legacy_record(record):
+    # Прежние записи: Item/RogueBuffSu с __dict__, остальные разделы – словари {'id', 'name'}
+    if isinstance(record, Item):
+        return LegacyItem(*record.to_tuple())
+    if isinstance(record, RogueBuffSu):
+        return LegacyRogueBuffSu(*record.to_tuple())
+    return {'id': record.id, 'name': record.name}
+
+def current_record(record):
+    return type(record).from_tuple(record.to_tuple())
+
+def streaming_parse(filename, server_type):
+    return build_handbook_data(iter_handbook_records(filename, server_type), server_type)
+
+# === Вспомогательные функции ===
+
+def measure(func, *args):
+    # Возвращает (результат, время в секундах, пиковая память в байтах)
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+def format_bytes(size):
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024 or unit == 'GB':
+            return f"{size:.1f} {unit}"
+        size /= 1024
+
+def handbook_snapshot(handbook_data):
+    # Представление данных справочника, пригодное для сравнения
+    snapshot = {}
+    for key, value in handbook_data.get_data().items():
+        snapshot[key] = [record.to_dict() for record in value]
+    return snapshot
+
+def require_identical(identical, label):
+    # Несовпадение результата – ошибка: бенчмарк завершается с ненулевым кодом
+    if not identical:
+        raise SystemExit(f"Результаты не совпадают: {label}")
+
+def detect_server_type(filename, server_type):
+    if server_type:
+        return server_type
+    detected, _ = identify_handbook(filename)
+    if not detected:
+        raise SystemExit(f"Не удалось определить тип справочника: {filename}")
+    return detected
+
+# === Бенчмарки ===
+
+def bench_memory(filename, server_type):
+    # Сравнение пикового потребления памяти прежнего и потокового парсера
+    for label, func in (('readlines', legacy_parse), ('streaming', streaming_parse)):
+        handbook_data, elapsed, peak = measure(func, filename, server_type)
+        records = sum(len(value) for value in handbook_data.get_data().values())
+        print(f"{label:>10}: peak {format_bytes(peak):>10}, time {elapsed:.3f} s, records {records}")
+        del handbook_data
+
+def bench_parallel(filename, server_type):
+    # Сравнение последовательной и параллельной обработки, с проверкой идентичности результата.
+    # Процессорное время родительского процесса показывает, сколько работы остаётся
+    # на нём при любом числе ядер
+    start = time.perf_counter()
+    cpu_start = time.process_time()
+    sequential = streaming_parse(filename, server_type)
+    sequential_time = time.perf_counter() - start
+    sequential_cpu = time.process_time() - cpu_start
+
+    start = time.perf_counter()
+    cpu_start = time.process_time()
+    parallel = build_handbook_data_parallel(filename, server_type)
+    parallel_time = time.perf_counter() - start
+    parallel_cpu = time.process_time() - cpu_start
+
+    identical = handbook_snapshot(sequential) == handbook_snapshot(parallel)
+    print(f"     cores: {os.cpu_count()}")
+    print(f"sequential: {sequential_time:.3f} s")
+    print(f"  parallel: {parallel_time:.3f} s (x{sequential_time / parallel_time:.2f}), "
+          f"parent CPU {parallel_cpu:.3f} s vs {sequential_cpu:.3f} s sequential")
+    print(f" identical: {identical}")
+    require_identical(identical, 'sequential / parallel')
+    for workers, estimate in estimate_parallel_times(filename, server_type, (2, 4, 8)):
+        print(f"estimate {workers} workers: {estimate:.3f} s")
+
+def estimate_parallel_times(filename, server_type, worker_counts):
+    # Оценка времени параллельного разбора на нескольких ядрах по замерам в одном процессе
+    # (полезно на машине с одним ядром): просмотр файла, затем разделы распределяются по
+    # процессам от большего к меньшему, а родитель распаковывает их результаты в порядке файла.
+    # Запуск пула процессов не учитывается
+    serializer = CACHE_SERIALIZERS['marshal']
+    start = time.perf_counter()
+    table = scan_handbook_sections(filename, server_type)
+    scan_time = time.perf_counter() - start
+    job_times = {}
+    unpack_times = {}
+    for section, spans in table.spans.items():
+        start = time.perf_counter()
+        outputs, _, _ = parse_section_job(filename, server_type, section, spans)
+        job_times[section] = time.perf_counter() - start
+        start = time.perf_counter()
+        for key, raw in outputs.items():
+            serializer.load_section(key, raw)
+        unpack_times[section] = time.perf_counter() - start
+    by_size = sorted(table.spans, key=lambda section: -table.spans[section][0][1])
+    by_offset = sorted(table.spans, key=lambda section: table.spans[section][0][0])
+    for workers in worker_counts:
+        free_at = [scan_time] * workers
+        done_at = {}
+        for section in by_size:
+            worker = free_at.index(min(free_at))
+            free_at[worker] = done_at[section] = free_at[worker] + job_times[section]
+        clock = scan_time
+        for section in by_offset:
+            clock = max(clock, done_at[section]) + unpack_times[section]
+        yield workers, clock
+
+def bench_startup(filename, server_type, repeat=5):
+    # Время загрузки кэша (тёплый старт) для каждого формата сериализации
+    handbook_data = streaming_parse(filename, server_type)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name, serializer in CACHE_SERIALIZERS.items():
+            shard_cache = HandbookShardCache(os.path.join(tmp_dir, name), serializer)
+            start = time.perf_counter()
+            shard_cache.write(handbook_data)
+            dump_time = time.perf_counter() - start
+
+            load_times = []
+            for _ in range(repeat):
+                gc.collect()
+                start = time.perf_counter()
+                loaded = {key: shard_cache.load_section(key) for key in HANDBOOK_SECTIONS}
+                load_times.append(time.perf_counter() - start)
+                del loaded
+
+            size = sum(os.path.getsize(shard_cache.shard_path(key)) for key in HANDBOOK_SECTIONS)
+            print(f"{name:>8}: load {statistics.median(load_times) * 1000:8.1f} ms, "
+                  f"dump {dump_time * 1000:8.1f} ms, size {format_bytes(size):>10}")
+
+def bench_deferred(filename, server_type, section_list=None):
+    # Время до открытия окна: полный разбор против предварительного просмотра разделов,
+    # и время до готовности раздела, который запросила вкладка. Кэш не используется
+    section_list = section_list or ('relics_list' if server_type == 'LunarCore' else 'rogue_buffs_su')
+    start = time.perf_counter()
+    full = parse_handbook(filename, server_type, False)
+    full_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    table = scan_handbook_sections(filename, server_type)
+    scan_time = time.perf_counter() - start
+    loader = DeferredHandbookLoader(filename, server_type, "beta", table).start()
+    loader.request([section_list])
+    while section_list not in loader.poll():
+        time.sleep(0.001)
+    first_time = time.perf_counter() - start
+    loader.wait()
+    total_time = time.perf_counter() - start
+
+    identical = handbook_snapshot(full) == handbook_snapshot(loader.handbook_data)
+    sizes = ', '.join(f"{section} {sum(length for _, length in spans) / 1024:.0f} KB"
+                      for section, spans in table.spans.items())
+    print(f"     sections: {sizes}")
+    print(f"   full parse: {full_time * 1000:8.1f} ms")
+    print(f"     pre-scan: {scan_time * 1000:8.1f} ms")
+    print(f"{section_list:>13}: {first_time * 1000:8.1f} ms after start")
+    print(f" all sections: {total_time * 1000:8.1f} ms")
+    print(f"    identical: {identical}")
+    require_identical(identical, 'full parse / deferred loader')
+
+# Кодеки и уровни сжатия, сравниваемые в режиме codecs
+BENCH_CODECS = [('none', None), ('zlib', 1), ('zlib', 6), ('zlib', 9), ('lzma', 0), ('lzma', 6)]
+
+def bench_codecs(filename, server_type, repeat=5, serializer_names=None):
+    # Время загрузки, записи и размер кэша на диске для каждого формата и сжатия.
+    # Загрузка включает чтение файлов, проверку CRC32 и распаковку
+    handbook_data = streaming_parse(filename, server_type)
+    expected = handbook_snapshot(handbook_data)
+    mismatches = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for serializer_name in serializer_names or CACHE_SERIALIZERS:
+            serializer = CACHE_SERIALIZERS[serializer_name]
+            for codec_name, level in BENCH_CODECS:
+                codec = CACHE_CODECS[codec_name](level)
+                label = f"{serializer_name}+{codec_name}" + (f"-{level}" if codec_name != 'none' else '')
+                shard_cache = HandbookShardCache(os.path.join(tmp_dir, label), serializer, codec)
+                start = time.perf_counter()
+                shard_cache.write(handbook_data)
+                dump_time = time.perf_counter() - start
+
+                load_times = []
+                for _ in range(repeat):
+                    # Новый объект – манифест тоже читается заново
+                    shard_cache = HandbookShardCache(os.path.join(tmp_dir, label), serializer, codec)
+                    gc.collect()
+                    start = time.perf_counter()
+                    loaded = HandbookData.from_loader(shard_cache.load_section)
+                    for key in HANDBOOK_SECTIONS:
+                        getattr(loaded, key)
+                    load_times.append(time.perf_counter() - start)
+                identical = handbook_snapshot(loaded) == expected
+                if not identical:
+                    mismatches.append(label)
+                del loaded
+
+                size = directory_size(os.path.join(tmp_dir, label))
+                print(f"{label:>14}: load {statistics.median(load_times) * 1000:8.1f} ms, "
+                      f"dump {dump_time * 1000:8.1f} ms, size {format_bytes(size):>10}"
+                      + ('' if identical else '  MISMATCH'))
+    require_identical(not mismatches, ', '.join(mismatches))
+
+# Размер справочников (строк записей), генерируемых для проверки в режиме classify
+CLASSIFY_GENERATED_LINES = 20000
+
+# Размеры синтетических справочников (строк записей) в наборе suite по умолчанию
+SUITE_SIZES = [10000, 100000, 1000000]
+
+def peak_rss():
+    # Пиковый RSS текущего процесса в байтах; None, если модуля resource нет (Windows)
+    try:
+        import resource
+    except ImportError:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux сообщает килобайты, macOS – байты
+    return usage if sys.platform == 'darwin' else usage * 1024
+
+def current_commit():
+    try:
+        result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+    except OSError:
+        return None
+    return result.stdout.strip() or None
+
+def run_suite_case(filename, server_type, cache_dir, repeat):
+    # Выполняется в отдельном процессе, чтобы пиковый RSS относился только к этому справочнику.
+    # Разбор последовательный: результат не зависит от числа ядер
+    CACHE_CONFIG['cache_dir'] = cache_dir
+    result = {}
+
+    start = time.perf_counter()
+    handbook_data = parse_handbook(filename, server_type, parallel=False)
+    result['cold_parse_s'] = time.perf_counter() - start
+    result['records'] = sum(len(value) for value in handbook_data.get_data().values())
+    del handbook_data
+
+    # Холодный старт программы: разбор и запись кэша
+    start = time.perf_counter()
+    process_handbook(filename, server_type, parallel=False)
+    result['cold_start_s'] = time.perf_counter() - start
+
+    # Тёплый старт: поиск в кэше и загрузка всех разделов
+    warm_times = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        process_handbook(filename, server_type, parallel=False).load_all()
+        warm_times.append(time.perf_counter() - start)
+    result['warm_load_s'] = statistics.median(warm_times)
+
+    # Классификация по разделам: записей в секунду
+    sections = {}
+    for section, records in iter_handbook_sections(filename, server_type):
+        start = time.perf_counter()
+        classify_sections(HandbookData(), [(section, records)], server_type)
+        elapsed = time.perf_counter() - start
+        stats = sections.setdefault(section, {'records': 0, 'seconds': 0.0})
+        stats['records'] += len(records)
+        stats['seconds'] += elapsed
+    for stats in sections.values():
+        stats['records_per_s'] = stats['records'] / stats['seconds'] if stats['seconds'] else None
+    result['sections'] = sections
+
+    result['peak_rss_bytes'] = peak_rss()
+    return result
+
+def bench_suite(server_types, sizes, seed=0, repeat=3, output=None):
+    report = {
+        'commit': current_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'seed': seed,
+        'cache_format': CACHE_CONFIG['format'],
+        'cache_compression': CACHE_CONFIG['compression'],
+        'cases': [],
+    }
+    context = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for server_type in server_types:
+            for lines in sizes:
+                filename = os.path.join(tmp_dir, f"{server_type}_{lines}.txt")
+                generate_handbook(filename, server_type, lines, seed)
+                cache_dir = os.path.join(tmp_dir, f"cache_{server_type}_{lines}")
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                    case = executor.submit(run_suite_case, filename, server_type, cache_dir, repeat).result()
+                case = {'server_type': server_type, 'lines': lines, 'file_size': os.path.getsize(filename), **case}
+                report['cases'].append(case)
+                os.remove(filename)
+                rss = case['peak_rss_bytes']
+                print(f"{server_type:>13} {lines:>8}: cold parse {case['cold_parse_s']:7.3f} s, "
+                      f"cold start {case['cold_start_s']:7.3f} s, warm {case['warm_load_s']:7.3f} s, "
+                      f"peak RSS {format_bytes(rss) if rss is not None else 'n/a':>10}", file=sys.stderr)
+
+    text = json.dumps(report, indent=4)
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    return report
+
+def records_memory(records, convert):
+    # Память, занимаемая самими записями (строки уже существуют и не учитываются)
+    gc.collect()
+    tracemalloc.start()
+    converted = [convert(record) for record in records]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del converted
+    return size
+
+def bench_records(filename, server_type):
+    # Байты на запись по типам записей: прежнее представление и классы с __slots__
+    handbook_data = streaming_parse(filename, server_type)
+    by_type = {}
+    for records in handbook_data.get_data().values():
+        for record in records:
+            by_type.setdefault(type(record).__name__, []).append(record)
+
+    total_before = total_after = 0
+    for type_name, records in sorted(by_type.items()):
+        before = records_memory(records, legacy_record)
+        after = records_memory(records, current_record)
+        total_before += before
+        total_after += after
+        print(f"{type_name:>12}: {len(records):8} records, {before / len(records):6.1f} -> "
+              f"{after / len(records):6.1f} bytes/record")
+    print(f"{'total':>12}: {format_bytes(total_before)} -> {format_bytes(total_after)}")
+
+def synthetic_records(server_type):
+    # Перебор ID вокруг всех границ конфигурации: диапазоны предметов, длины и префиксы баффов
+    config = SECTION_CONFIG[server_type]['section_outputs']
+    records = []
+    for section, outputs in config.items():
+        if outputs is ITEM_LISTS:
+            for id_int in range(0, 130001):
+                records.append((section, str(id_int), f"Item {id_int}"))
+            records.append((section, '20000', 'null item'))
+            records.append((section, 'abc', 'not a number'))
+        elif outputs is ROGUE_BUFF_LISTS:
+            for id_int in range(6000000, 7000000, 37):
+                records.append((section, str(id_int) + '0', f"Buff {id_int}"))
+            for id_str in ('40123456', '312345678', '10000001', '80000001', '123'):
+                records.append((section, id_str, f"Buff {id_str}"))
+            records.append((section, '61201234', '[empty]'))
+            records.append((section, '61201234', '0 --- empty'))
+    return records
+
+def bench_classify(filename, server_type, repeat=5):
+    # Прежняя классификация (цепочки проверок, перебор префиксов, вызов на строку)
+    # против скомпилированных таблиц, с проверкой идентичности результата на самом справочнике,
+    # синтетических записях и сгенерированных справочниках обоих типов серверов
+    records = list(iter_handbook_records(filename, server_type))
+    checks = [('handbook', server_type, records), ('synthetic', server_type, synthetic_records(server_type))]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for generated_type in SECTION_CONFIG:
+            generated = os.path.join(tmp_dir, f"{generated_type}.txt")
+            generate_handbook(generated, generated_type, CLASSIFY_GENERATED_LINES)
+            checks.append((f"generated {generated_type}", generated_type,
+                           list(iter_handbook_records(generated, generated_type))))
+    for label, check_type, check_records in checks:
+        identical = (handbook_snapshot(legacy_classify(check_records, check_type))
+                     == handbook_snapshot(build_handbook_data(check_records, check_type)))
+        print(f"identical ({label}, {len(check_records)} records): {identical}")
+        require_identical(identical, f"classify, {label}")
+
+    timings = {}
+    for label, func in (('legacy', legacy_classify), ('compiled', build_handbook_data)):
+        times = []
+        for _ in range(repeat):
+            gc.collect()
+            start = time.perf_counter()
+            func(records, server_type)
+            times.append(time.perf_counter() - start)
+        timings[label] = statistics.median(times)
+        print(f"{label:>10}: {timings[label] * 1000:8.1f} ms, "
+              f"{timings[label] * 1e9 / len(records):6.0f} ns/record")
+    print(f"   speedup: x{timings['legacy'] / timings['compiled']:.2f}")
+
+# Запросы режима search: короткие (перебор), частые слова, редкие сочетания и ID
+SEARCH_QUERIES = ['a', 'st', 'star', 'moon', 'ember frost', 'seele', '10', '612', '1001', 'zzz']
+
+def legacy_search(records, text, match_id=True):
+    # Поиск вкладок до индекса: проверка подстроки в каждой записи
+    text = text.lower()
+    return [record for record in records
+            if text in record.search_key or (match_id and text in record.id)]
+
+def bench_search(filename, server_type, queries=None, repeat=5):
+    # Поиск по самому большому списку: перебор записей против индекса триграмм.
+    # Результаты обоих способов сравниваются для поиска по названию с ID и только по названию
+    handbook_data = streaming_parse(filename, server_type)
+    record_lists = [getattr(handbook_data, key) for key in HANDBOOK_SECTIONS]
+    start = time.perf_counter()
+    build_search_indexes(record_lists)
+    build_time = time.perf_counter() - start
+    key, records = max(((key, getattr(handbook_data, key)) for key in HANDBOOK_SECTIONS),
+                       key=lambda item: len(item[1]))
+    print(f"index build: {build_time * 1000:8.1f} ms for {sum(map(len, record_lists))} records")
+    print(f"       list: {key} ({len(records)} records)")
+
+    identical = True
+    for query in queries or SEARCH_QUERIES:
+        timings = {}
+        for label, search in (('scan', legacy_search), ('index', search_records)):
+            times = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                found = search(records, query)
+                times.append(time.perf_counter() - start)
+            timings[label] = statistics.median(times)
+        for match_id in (True, False):
+            identical &= search_records(records, query, match_id) == legacy_search(records, query, match_id)
+        print(f"{query!r:>13}: {len(found):7} found, scan {timings['scan'] * 1000:7.2f} ms, "
+              f"index {timings['index'] * 1000:7.2f} ms")
+    print(f"  identical: {identical}")
+    require_identical(identical, 'index search / substring scan')
+
+def keystroke_queries(query):
+    # Содержимое поля поиска при наборе query по букве и последующем стирании
+    typed = [query[:length] for length in range(1, len(query) + 1)]
+    return typed + typed[-2::-1]
+
+def bench_typing(filename, server_type, queries=None):
+    # Поиск при каждом нажатии клавиши по самому большому списку: полный поиск по индексу
+    # против сужения совпадений предыдущего запроса (и возврата к ним при стирании)
+    handbook_data = streaming_parse(filename, server_type)
+    key, records = max(((key, getattr(handbook_data, key)) for key in HANDBOOK_SECTIONS),
+                       key=lambda item: len(item[1]))
+    index = get_search_index(records)
+    print(f"     list: {key} ({len(records)} records)")
+    identical = True
+    for query in queries or [query for query in SEARCH_QUERIES if len(query) >= 3]:
+        timings = {'full': [], 'narrow': []}
+        for text in keystroke_queries(query):
+            start = time.perf_counter()
+            full = [records[position] for position in index.search(text)]
+            timings['full'].append(time.perf_counter() - start)
+            start = time.perf_counter()
+            narrowed = search_records(records, text)
+            timings['narrow'].append(time.perf_counter() - start)
+            identical &= narrowed == full
+        print(f"{query!r:>13}: {len(timings['full'])} keystrokes, full {sum(timings['full']) * 1000:7.2f} ms "
+              f"(max {max(timings['full']) * 1000:6.2f}), narrow {sum(timings['narrow']) * 1000:7.2f} ms "
+              f"(max {max(timings['narrow']) * 1000:6.2f})")
+    print(f"identical: {identical}")
+    require_identical(identical, 'narrowed search / full search')
+
+def make_typo(rng, text):
+    # Одна опечатка: перестановка соседних букв, пропуск или замена буквы
+    position = rng.randrange(len(text) - 1)
+    kind = rng.choice(('swap', 'drop', 'replace'))
+    if kind == 'swap':
+        return text[:position] + text[position + 1] + text[position] + text[position + 2:]
+    if kind == 'drop':
+        return text[:position] + text[position + 1:]
+    return text[:position] + rng.choice('abcdefghijklmnopqrstuvwxyz') + text[position + 1:]
+
+def bench_fuzzy(filename, server_type, count=200, seed=0):
+    # Нечёткий поиск по самому большому списку: названия случайных записей с одной опечаткой.
+    # Задержка на запрос (как при нажатии клавиши) и доля запросов, для которых запись
+    # с исходным названием попала в первые fuzzy_limit результатов
+    handbook_data = streaming_parse(filename, server_type)
+    key, records = max(((key, getattr(handbook_data, key)) for key in HANDBOOK_SECTIONS),
+                       key=lambda item: len(item[1]))
+    build_search_indexes([records])
+    rng = random.Random(seed)
+    names = [record.search_key.split('\n')[0] for record in records]
+    names = [name for name in names if len(name) >= 4]
+    times = []
+    found = 0
+    for name in rng.sample(names, min(count, len(names))):
+        query = make_typo(rng, name)
+        start = time.perf_counter()
+        results = search_records(records, query, fuzzy=True)
+        times.append(time.perf_counter() - start)
+        found += any(record.search_key.split('\n')[0] == name for record in results)
+    times.sort()
+    print(f"     list: {key} ({len(records)} records), top {SEARCH_CONFIG['fuzzy_limit']}")
+    print(f"  queries: {len(times)} with one typo")
+    print(f"   median: {statistics.median(times) * 1000:8.2f} ms")
+    print(f"      p95: {times[int(len(times) * 0.95)] * 1000:8.2f} ms")
+    print(f"      max: {times[-1] * 1000:8.2f} ms")
+    print(f"   recall: {found / len(times):.1%}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Handbook processing benchmarks')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    memory_parser = subparsers.add_parser('memory', help='peak memory: readlines vs streaming parser')
+    memory_parser.add_argument('handbook')
+    memory_parser.add_argument('--server-type', choices=list(SECTION_CONFIG))
+
+    parallel_parser = subparsers.add_parser('parallel', help='sequential vs process pool parser')
+    parallel_parser.add_argument('handbook')
+    parallel_parser.add_argument('--server-type', choices=list(SECTION_CONFIG))
+
+    startup_parser = subparsers.add_parser('startup', help='warm start: cache load time per serializer')
+    startup_parser.add_argument('handbook')
+    startup_parser.add_argument('--server-type', choices=list(SECTION_CONFIG))
+    startup_parser.add_argument('--repeat', type=int, default=5)
+
+    codecs_parser = subparsers.add_parser('codecs', help='cache load time and disk size per serializer and compression')
+    codecs_parser.add_argument('handbook')
+    codecs_parser.add_argument('--server-type', choices=list(SECTION_CONFIG))
+    codecs_parser.add_argument('--repeat', type=int, default=5)
+    codecs_parser.add_argument('--format', action='append', choices=list(CACHE_SERIALIZERS),
+                               help='only this serializer (may be repeated)')
+
+    records_parser = subparsers.add_parser('records', help='memory per record: dict/__dict__ vs __slots__')
+    records_parser.add_argument('handbook')
+    records_parser.add_argument('--server-type', choices=list(SECTION_CONFIG))
+
+    classify_parser = subparsers.add_parser('classify', help='line classification: config checks vs compiled tables')
+    classify_parser.add_argument('handbook')
+    classify_parser.add_argument('--server-type', choices=list(SECTION_CONFIG))
+    classify_parser.add_argument('--repeat', type=int, default=5)
+
+    deferred_parser = subparsers.add_parser('deferred', help='full parse vs pre-scan and parse-on-demand of sections')
+    deferred_parser.add_argument('handbook')
+    deferred_parser.add_argument('--server-type', choices=list(SECTION_CONFIG))
+    deferred_parser.add_argument('--list', choices=HANDBOOK_SECTIONS, help='list requested first, as by an opened tab')
+
+    search_parser = subparsers.add_parser('search', help='list search: substring scan vs trigram index')
+    search_parser.add_argument('handbook')
+    search_parser.add_argument('--server-type', choices=list(SECTION_CONFIG))
+    search_parser.add_argument('--query', action='append', help='search text (may be repeated)')
+    search_parser.add_argument('--repeat', type=int, default=5)
+
+    typing_parser = subparsers.add_parser('typing', help='search per keystroke: full search vs narrowing the previous matches')
+    typing_parser.add_argument('handbook')
+    typing_parser.add_argument('--server-type', choices=list(SECTION_CONFIG))
+    typing_parser.add_argument('--query', action='append', help='text typed and erased letter by letter (may be repeated)')
+
+    fuzzy_parser = subparsers.add_parser('fuzzy', help='fuzzy ranked search: latency and recall for names with a typo')
+    fuzzy_parser.add_argument('handbook')
+    fuzzy_parser.add_argument('--server-type', choices=list(SECTION_CONFIG))
+    fuzzy_parser.add_argument('--queries', type=int, default=200)
+    fuzzy_parser.add_argument('--seed', type=int, default=0)
+
+    suite_parser = subparsers.add_parser('suite', help='synthetic handbooks: cold parse, warm load, peak RSS as JSON')
+    suite_parser.add_argument('--server-type', action='append', choices=list(SECTION_CONFIG),
+                              help='server type (may be repeated; default: all)')
+    suite_parser.add_argument('--lines', type=int, action='append',
+                              help=f"handbook size in record lines (may be repeated; default: {SUITE_SIZES})")
+    suite_parser.add_argument('--seed', type=int, default=0)
+    suite_parser.add_argument('--repeat', type=int, default=3)
+    suite_parser.add_argument('--output', help='write the JSON report to this file instead of stdout')
+
+    args = parser.parse_args()
+    if args.command == 'suite':
+        bench_suite(args.server_type or list(SECTION_CONFIG), args.lines or SUITE_SIZES, args.seed, args.repeat, args.output)
+        return
+    server_type = detect_server_type(args.handbook, args.server_type)
+
+    if args.command == 'memory':
+        bench_memory(args.handbook, server_type)
+    elif args.command == 'parallel':
+        bench_parallel(args.handbook, server_type)
+    elif args.command == 'startup':
+        bench_startup(args.handbook, server_type, args.repeat)
+    elif args.command == 'codecs':
+        bench_codecs(args.handbook, server_type, args.repeat, args.format)
+    elif args.command == 'records':
+        bench_records(args.handbook, server_type)
+    elif args.command == 'classify':
+        bench_classify(args.handbook, server_type, args.repeat)
+    elif args.command == 'deferred':
+        bench_deferred(args.handbook, server_type, args.list)
+    elif args.command == 'search':
+        bench_search(args.handbook, server_type, args.query, args.repeat)
+    elif args.command == 'typing':
+        bench_typing(args.handbook, server_type, args.query)
+    elif args.command == 'fuzzy':
+        bench_fuzzy(args.handbook, server_type, args.queries, args.seed)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+# handbook_diff.py
+# Сравнение двух версий справочника: добавленные, удалённые и переименованные ID по разделам.
+# Запуск: python handbook_diff.py старый/handbook.txt новый/handbook.txt
+
+import argparse
+import json
+import os
+import sys
+import time
+
+from process_handbook import (CACHE_CONFIG, HANDBOOK_SECTIONS, SECTION_CONFIG, get_cache_root, identify_handbook,
+                              process_handbook, record_name)
+
+# Подкаталог кэша программы, в котором запуск из командной строки хранит свои записи:
+# они не вытесняют из общего кэша записи, созданные программой
+CLI_CACHE_SUBDIR = 'handbook_diff'
+
+class SectionDiff:
+    # Изменения одного раздела HandbookData:
+    #   added   – [(id, название)] записи, которых не было в старом справочнике;
+    #   removed – [(id, название)] записи, которых нет в новом справочнике;
+    #   renamed – [(id, старое название, новое название)]
+    def __init__(self):
+        self.added = []
+        self.removed = []
+        self.renamed = []
+
+    def __bool__(self):
+        return bool(self.added or self.removed or self.renamed)
+
+    def to_dict(self):
+        return {'added': self.added, 'removed': self.removed, 'renamed': self.renamed}
+
+def diff_section(old_records, old_sorted, new_records, new_sorted):
+    # Слияние двух списков ID, отсортированных по id_order_key (из HandbookIdIndex):
+    # один проход, O(n + m). Повторяющиеся ID сопоставляются по порядку появления
+    diff = SectionDiff()
+    old_ids, old_positions = old_sorted
+    new_ids, new_positions = new_sorted
+    old_count = len(old_ids)
+    new_count = len(new_ids)
+    i = j = 0
+    while i < old_count and j < new_count:
+        old_id = old_ids[i]
+        new_id = new_ids[j]
+        if old_id == new_id:
+            old_name = record_name(old_records[old_positions[i]])
+            new_name = record_name(new_records[new_positions[j]])
+            if old_name != new_name:
+                diff.renamed.append((old_id, old_name, new_name))
+            i += 1
+            j += 1
+        # Сравнение по id_order_key без создания кортежей: сначала длина, затем строка
+        elif len(old_id) < len(new_id) or (len(old_id) == len(new_id) and old_id < new_id):
+            diff.removed.append((old_id, record_name(old_records[old_positions[i]])))
+            i += 1
+        else:
+            diff.added.append((new_id, record_name(new_records[new_positions[j]])))
+            j += 1
+    for k in range(i, len(old_ids)):
+        diff.removed.append((old_ids[k], record_name(old_records[old_positions[k]])))
+    for k in range(j, len(new_ids)):
+        diff.added.append((new_ids[k], record_name(new_records[new_positions[k]])))
+    return diff
+
+def unchanged_sections(old_data, new_data, server_type):
+    # Разделы HandbookData, исходные разделы справочника которых совпадают по хэшу:
+    # их записи не загружаются и не сравниваются
+    old_hashes = old_data.section_hashes
+    new_hashes = new_data.section_hashes
+    unchanged = set()
+    for section, outputs in SECTION_CONFIG.get(server_type, {}).get('section_outputs', {}).items():
+        section_hash = new_hashes.get(section)
+        if section_hash is not None and old_hashes.get(section) == section_hash:
+            unchanged.update(outputs)
+    return unchanged
+
+def diff_handbooks(old_data, new_data, server_type, sections=None):
+    # Возвращает {раздел: SectionDiff} только для изменившихся разделов.
+    # Отсортированные ID берутся из индекса HandbookData (обычно он загружается из кэша)
+    skip = unchanged_sections(old_data, new_data, server_type)
+    old_index = old_data.id_index
+    new_index = new_data.id_index
+    result = {}
+    for key in sections or HANDBOOK_SECTIONS:
+        if key in skip:
+            continue
+        old_sorted = old_index.sorted_ids[key]
+        new_sorted = new_index.sorted_ids[key]
+        if not old_sorted[0] and not new_sorted[0]:
+            continue
+        diff = diff_section(getattr(old_data, key), old_sorted, getattr(new_data, key), new_sorted)
+        if diff:
+            result[key] = diff
+    return result
+
+def load_handbook(filename, server_type=None, program_version=None):
+    # Разбор справочника через process_handbook (с использованием кэша).
+    # program_version – версия программы, с которой записи кэша создаются при её работе:
+    # с той же версией используется та же запись, а не новая
+    if server_type is None:
+        server_type, _ = identify_handbook(filename)
+        if not server_type:
+            raise ValueError(f"Unknown handbook format: {filename}")
+    return process_handbook(filename, server_type, program_version), server_type
+
+def diff_handbook_files(old_filename, new_filename, sections=None, program_version=None):
+    old_data, old_type = load_handbook(old_filename, program_version=program_version)
+    new_data, new_type = load_handbook(new_filename, program_version=program_version)
+    if old_type != new_type:
+        raise ValueError(f"Handbooks belong to different servers: {old_type} and {new_type}")
+    return diff_handbooks(old_data, new_data, new_type, sections)
+
+def format_diff(result):
+    # Текстовый отчёт: "+" добавлено, "-" удалено, "~" переименовано
+    lines = []
+    for key, diff in result.items():
+        lines.append(f"# {key}: +{len(diff.added)} -{len(diff.removed)} ~{len(diff.renamed)}")
+        lines.extend(f"+ {entry_id}: {name}" for entry_id, name in diff.added)
+        lines.extend(f"- {entry_id}: {name}" for entry_id, name in diff.removed)
+        lines.extend(f"~ {entry_id}: {old_name} -> {new_name}" for entry_id, old_name, new_name in diff.renamed)
+    return lines
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare two handbook versions')
+    parser.add_argument('old')
+    parser.add_argument('new')
+    parser.add_argument('--section', action='append', choices=HANDBOOK_SECTIONS,
+                        help='compare only this section (may be repeated)')
+    parser.add_argument('--json', metavar='PATH', help='write the report as JSON')
+    parser.add_argument('--cache-dir', metavar='DIR',
+                        help=f'handbook cache directory (default: "{CLI_CACHE_SUBDIR}" inside the program cache)')
+    parser.add_argument('--no-cache', action='store_true', help='parse both handbooks without the cache')
+    args = parser.parse_args()
+
+    if args.no_cache:
+        # Версия "beta" – кэш не читается и не записывается
+        program_version = "beta"
+    else:
+        program_version = None
+        CACHE_CONFIG['cache_dir'] = args.cache_dir or os.path.join(get_cache_root(), CLI_CACHE_SUBDIR)
+
+    start = time.perf_counter()
+    try:
+        result = diff_handbook_files(args.old, args.new, args.section, program_version)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    elapsed = time.perf_counter() - start
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({key: diff.to_dict() for key, diff in result.items()}, f, ensure_ascii=False, indent=4)
+    else:
+        for line in format_diff(result):
+            print(line)
+    print(f"{len(result)} changed sections, {elapsed:.3f} s", file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,172 @@
+# handbook_generator.py
+# Генератор синтетических справочников LunarCore и DanhengServer для воспроизводимых замеров
+# без настоящих игровых данных. Разделы берутся из SECTION_CONFIG, форма ID – из
+# ITEM_SORTING_CONFIG и ROGUE_BUFF_CONFIG, поэтому записи попадают во все списки HandbookData.
+# Запуск: python handbook_generator.py handbook.txt --server-type DanhengServer --lines 300000
+
+import argparse
+import random
+from itertools import accumulate
+
+from process_handbook import ITEM_SORTING_CONFIG, ROGUE_BUFF_CONFIG, SECTION_CONFIG, id_order_key
+
+# Доли строк по разделам (примерно как в настоящих справочниках) и заголовки файла
+GENERATOR_CONFIG = {
+    'LunarCore': {
+        'header': ['# Lunar Core {version} Handbook', '# Created {version}'],
+        'section_prefix': '# ',
+        'commands': ['give : Gives an item', 'spawn : Spawns a monster or prop', 'scene : Teleports to a scene'],
+        'default_version': '2.3.0',
+        'section_weights': {
+            'Avatars': 1,
+            'Items': 40,
+            'Props (Spawnable)': 25,
+            'NPC Monsters (Spawnable)': 10,
+            'Battle Stages': 15,
+            'Battle Monsters': 7,
+            'Mazes': 2,
+        },
+    },
+    'DanhengServer': {
+        'header': ['Handbook generated in {version}'],
+        'section_prefix': '#',
+        'commands': ['give: Gives an item', 'avatar: Sets avatar properties', 'scene: Teleports to a scene'],
+        'default_version': '2024-01-01 00:00:00',
+        'section_weights': {
+            'Avatar': 1,
+            'Item': 8,
+            'MainMission': 3,
+            'SubMission': 18,
+            'RogueBuff': 65,
+            'RogueMiracle': 5,
+        },
+    },
+}
+
+# Доли видов ID в разделах предметов и баффов; unknown – записи с "пустым" названием
+ITEM_KIND_WEIGHTS = {'base_material': 10, 'skip': 5, 'material': 15, 'lightcone': 15, 'relic': 40,
+                     'other': 13, 'unknown': 2}
+ROGUE_KIND_WEIGHTS = {'su': 45, 'food': 5, 'various': 15, 'from_entities': 20, 'other': 10, 'unknown': 5}
+
+NAME_WORDS = ['Star', 'Rail', 'Light', 'Cone', 'Blade', 'Void', 'Ember', 'Frost', 'Moon', 'Sun', 'Aeon',
+              'Trail', 'Dream', 'Echo', 'Silver', 'Golden', 'Hunt', 'Memory', 'Path', 'Relic', 'Stellar',
+              'Crimson', 'Jade', 'Herta', 'Belobog', 'Xianzhou', 'Penacony', 'Simulated', 'Universe']
+
+def random_digits(rng, count):
+    return str(rng.randrange(10 ** count)).zfill(count)
+
+def random_name(rng):
+    return ' '.join(rng.choices(NAME_WORDS, k=rng.randint(1, 4)))
+
+def item_id(rng, kind):
+    config = ITEM_SORTING_CONFIG
+    if kind in ('base_material', 'skip', 'material'):
+        low, high = config[kind + '_range']
+        return str(rng.randint(low, high))
+    if kind == 'lightcone':
+        # Вторая цифра – редкость (lightcone_rarity_map)
+        low, high = config['lightcone_range']
+        rarity_digit = rng.choice(list(config['lightcone_rarity_map']))
+        return str(low)[0] + rarity_digit + random_digits(rng, len(str(low)) - 2)
+    if kind == 'relic':
+        # Первая цифра – редкость, вторая не 0, последняя – тип реликвии
+        first_low, first_high = config['relic_valid_first_digit_range']
+        relic_type = rng.choice([value for values in config['relic_type_map'].values() for value in values])
+        return (str(rng.randint(first_low, first_high)) + str(rng.randint(1, 9))
+                + random_digits(rng, config['relic_valid_length'] - 3) + str(relic_type))
+    # other / unknown: ID вне всех диапазонов
+    return str(rng.randint(200000, 999999))
+
+def rogue_buff_id(rng, kind):
+    config = ROGUE_BUFF_CONFIG
+    if kind == 'su':
+        su = config['su']
+        category_prefix = rng.choice(list(su['category_map']))
+        id_str = category_prefix
+        if len(category_prefix) == 3:
+            # Четвёртая цифра – тип, пятая – редкость
+            id_str += rng.choice(list(su['type_map'])) + rng.choice(list(su['rarity_map']))
+        return id_str + random_digits(rng, su['id_length'] - len(id_str))
+    if kind in ('food', 'various'):
+        prefix = config[kind]['prefix']
+        return prefix + random_digits(rng, config[kind]['id_length'] - len(prefix))
+    if kind == 'from_entities':
+        prefix = rng.choice(config['from_entities']['prefixes'])
+        return prefix + random_digits(rng, config['from_entities']['id_length'] - len(prefix))
+    # other / unknown
+    return str(rng.randint(1, 99999))
+
+def section_record(rng, section, kinds):
+    # (id, название) одной записи раздела
+    if section in ('Items', 'Item'):
+        kind = rng.choices(kinds['item'][0], cum_weights=kinds['item'][1])[0]
+        entry_id = item_id(rng, kind)
+        name = random_name(rng) + (' null' if kind == 'unknown' else '')
+    elif section == 'RogueBuff':
+        kind = rng.choices(kinds['rogue'][0], cum_weights=kinds['rogue'][1])[0]
+        entry_id = rogue_buff_id(rng, kind)
+        if kind == 'unknown':
+            name = rng.choice(ROGUE_BUFF_CONFIG['empty_prefixes']) + ' ' + random_name(rng)
+        else:
+            name = random_name(rng)
+    else:
+        entry_id = str(rng.randint(1, 10 ** rng.randint(3, 8)))
+        name = random_name(rng)
+    return entry_id, name
+
+def generate_handbook(path, server_type, lines=100000, seed=0, version=None):
+    # Записывает справочник примерно из lines строк записей. При одинаковом seed файл
+    # получается байт в байт одинаковым. Возвращает {раздел: число записей}
+    config = GENERATOR_CONFIG[server_type]
+    processors = SECTION_CONFIG[server_type]['processors']
+    rng = random.Random(seed)
+    kinds = {'item': (list(ITEM_KIND_WEIGHTS), list(accumulate(ITEM_KIND_WEIGHTS.values()))),
+             'rogue': (list(ROGUE_KIND_WEIGHTS), list(accumulate(ROGUE_KIND_WEIGHTS.values())))}
+    total_weight = sum(config['section_weights'].values())
+    version = version or config['default_version']
+
+    counts = {}
+    with open(path, 'w', encoding='utf-8', newline='\n') as f:
+        for header_line in config['header']:
+            f.write(header_line.format(version=version) + '\n')
+        f.write('\n' + config['section_prefix'] + SECTION_CONFIG[server_type]['skip_sections'][-1] + '\n')
+        f.writelines(command + '\n' for command in config['commands'])
+
+        for section in processors:
+            count = max(1, lines * config['section_weights'][section] // total_weight)
+            # Как и в настоящих справочниках, ID раздела уникальны и идут по возрастанию
+            records = {}
+            attempts = 0
+            while len(records) < count and attempts < count * 4:
+                entry_id, name = section_record(rng, section, kinds)
+                if entry_id in records:
+                    # ID этого вида заканчиваются (например, реликвий всего несколько тысяч) –
+                    # берём 9-значный ID, который не попадает ни в один диапазон и префикс
+                    entry_id = '2' + random_digits(rng, 8)
+                records.setdefault(entry_id, name)
+                attempts += 1
+            f.write('\n' + config['section_prefix'] + section + '\n')
+            separator = ' : ' if server_type == 'LunarCore' else ': '
+            f.writelines(f"{entry_id}{separator}{records[entry_id]}\n"
+                         for entry_id in sorted(records, key=id_order_key))
+            counts[section] = len(records)
+    return counts
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic handbook')
+    parser.add_argument('output')
+    parser.add_argument('--server-type', choices=list(GENERATOR_CONFIG), default='DanhengServer')
+    parser.add_argument('--lines', type=int, default=100000, help='number of record lines (10k to 2M)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--version', help='version written to the header')
+    args = parser.parse_args()
+    if args.lines <= 0:
+        parser.error('--lines must be positive')
+
+    counts = generate_handbook(args.output, args.server_type, args.lines, args.seed, args.version)
+    for section, count in counts.items():
+        print(f"{section}: {count}")
+    print(f"total: {sum(counts.values())}")
+
+if __name__ == '__main__':
+    main()
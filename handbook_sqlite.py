@@ -0,0 +1,349 @@
+# handbook_sqlite.py
+# Хранение HandbookData в базе SQLite: таблица на каждый вид записей (Entry, Item, RogueBuffSu)
+# с индексом по ID и полнотекстовый индекс FTS5 по названиям и ID всех разделов.
+# Используется как формат кэша (CACHE_CONFIG['format'] = 'sqlite'; FTS5 тогда отвечает на
+# HandbookData.search) и для запросов к справочнику без программы. Поля поиска вкладок
+# FTS5 не используют: индекс триграмм в памяти (search_engine) отвечает на запрос
+# к списку из 50 000 записей за ~5 мс, FTS5 – за ~130 мс.
+#   python handbook_sqlite.py export handbook.txt handbook.sqlite3
+#   python handbook_sqlite.py search handbook.sqlite3 "текст" --section relics_list
+
+import argparse
+import json
+import marshal
+import os
+import shutil
+import sqlite3
+import zlib
+from contextlib import closing, contextmanager
+
+from process_handbook import (
+    CACHE_FORMAT_VERSION,
+    HANDBOOK_SECTIONS,
+    MANIFEST_FILE,
+    SECTION_CONFIG,
+    SECTION_RECORD_TYPES,
+    Entry,
+    HandbookIdIndex,
+    Item,
+    NoCacheCodec,
+    RogueBuffSu,
+    atomic_write,
+    identify_handbook,
+    process_handbook,
+    record_name,
+)
+
+# Имя файла базы в каталоге записи кэша
+DATABASE_FILE = 'handbook.sqlite3'
+
+def join_aliases(aliases):
+    return '\n'.join(aliases) if aliases else None
+
+def split_aliases(text):
+    return tuple(text.split('\n')) if text else ()
+
+# Таблица, столбцы и преобразования для каждого вида записей. Столбец rarity объявлен
+# без типа: в нём хранятся и числа, и строки ('free', 'Mythic')
+RECORD_TABLES = {
+    Entry: {
+        'table': 'entries',
+        'columns': ('id TEXT', 'name TEXT', 'aliases TEXT'),
+        'to_row': lambda record: (record.id, record.name, join_aliases(record.aliases)),
+        'from_row': lambda row: Entry(row[0], row[1], split_aliases(row[2])),
+    },
+    Item: {
+        'table': 'items',
+        'columns': ('id TEXT', 'title TEXT', 'type TEXT', 'item_section TEXT', 'rarity',
+                    'main_stats TEXT', 'aliases TEXT'),
+        'to_row': lambda record: (record.id, record.title, record.type, record.section, record.rarity,
+                                  json.dumps(record.main_stats) if record.main_stats else None,
+                                  join_aliases(record.aliases)),
+        'from_row': lambda row: Item(row[0], row[1], row[2], row[3], row[4],
+                                     tuple(json.loads(row[5])) if row[5] else (), split_aliases(row[6])),
+    },
+    RogueBuffSu: {
+        'table': 'rogue_buffs_su',
+        'columns': ('id TEXT', 'name TEXT', 'category TEXT', 'buff_type TEXT', 'rarity TEXT', 'aliases TEXT'),
+        'to_row': lambda record: (record.id, record.name, record.category, record.buff_type, record.rarity,
+                                  join_aliases(record.aliases)),
+        'from_row': lambda row: RogueBuffSu(row[0], row[1], row[2], row[3], row[4], split_aliases(row[5])),
+    },
+}
+
+def record_table(key):
+    return RECORD_TABLES[SECTION_RECORD_TYPES.get(key, Entry)]
+
+def schema_statements():
+    statements = ['CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)',
+                  'CREATE TABLE IF NOT EXISTS id_index (section TEXT PRIMARY KEY, data BLOB)']
+    for config in RECORD_TABLES.values():
+        table = config['table']
+        columns = ', '.join(('section TEXT', 'position INTEGER') + config['columns'])
+        statements.append(f'CREATE TABLE IF NOT EXISTS {table} ({columns}, PRIMARY KEY (section, position))'
+                          f' WITHOUT ROWID')
+        statements.append(f'CREATE INDEX IF NOT EXISTS {table}_id ON {table} (id)')
+    return statements
+
+@contextmanager
+def database_errors(path):
+    # Ошибки SQLite превращаются в ValueError, который process_handbook считает
+    # признаком повреждённого кэша (CACHE_LOAD_ERRORS)
+    try:
+        yield
+    except sqlite3.DatabaseError as e:
+        raise ValueError(f"Cache database error in {path}: {e}") from e
+
+class HandbookDatabase:
+    # База с данными одного справочника. Поиск по названиям – через FTS5 с токенизатором
+    # trigram (подстрока без учёта регистра, как в фильтрах вкладок); если SQLite
+    # старше 3.34, используется unicode61 и поиск по началу слов
+    def __init__(self, path):
+        self.path = path
+        self._tokenizer = None
+
+    def connect(self):
+        return closing(sqlite3.connect(self.path))
+
+    def read_meta(self, connection, key, default=None):
+        row = connection.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def check_format(self, connection):
+        if self.read_meta(connection, 'format_version') != CACHE_FORMAT_VERSION:
+            raise ValueError(f"Unsupported cache database: {self.path}")
+
+    def create_schema(self, connection):
+        for statement in schema_statements():
+            connection.execute(statement)
+        if connection.execute("SELECT 1 FROM sqlite_master WHERE name = 'names'").fetchone() is None:
+            try:
+                connection.execute("CREATE VIRTUAL TABLE names USING fts5("
+                                   "search_key, id, section UNINDEXED, position UNINDEXED, tokenize='trigram')")
+                tokenizer = 'trigram'
+            except sqlite3.OperationalError:
+                connection.execute("CREATE VIRTUAL TABLE names USING fts5("
+                                   "search_key, id, section UNINDEXED, position UNINDEXED)")
+                tokenizer = 'unicode61'
+            connection.execute('INSERT OR REPLACE INTO meta VALUES (?, ?)', ('tokenizer', json.dumps(tokenizer)))
+
+    def write_database(self, handbook_data, keep=(), server_type=None):
+        # Разделы из keep уже есть в базе и не перезаписываются (в них не загружаются
+        # данные из handbook_data); остальные заменяются одной транзакцией
+        with database_errors(self.path), self.connect() as connection:
+            # Запись кэша собирается во временном каталоге и заменяется целиком,
+            # поэтому журнал на диске и fsync каждой транзакции не нужны
+            connection.execute('PRAGMA journal_mode = MEMORY')
+            connection.execute('PRAGMA synchronous = OFF')
+            with connection:
+                self.create_schema(connection)
+                for key in HANDBOOK_SECTIONS:
+                    if key in keep:
+                        continue
+                    config = record_table(key)
+                    table = config['table']
+                    records = getattr(handbook_data, key)
+                    placeholders = ', '.join('?' * (len(config['columns']) + 2))
+                    to_row = config['to_row']
+                    connection.execute(f'DELETE FROM {table} WHERE section = ?', (key,))
+                    connection.execute('DELETE FROM names WHERE section = ?', (key,))
+                    connection.executemany(f'INSERT INTO {table} VALUES ({placeholders})',
+                                           ((key, position) + to_row(record) for position, record in enumerate(records)))
+                    connection.executemany('INSERT INTO names VALUES (?, ?, ?, ?)',
+                                           ((record.search_key, record.id, key, position)
+                                            for position, record in enumerate(records)))
+                id_index = handbook_data.id_index
+                connection.executemany('INSERT OR REPLACE INTO id_index VALUES (?, ?)',
+                                       ((key, marshal.dumps(id_index.sorted_ids[key])) for key in HANDBOOK_SECTIONS))
+                meta = {'format_version': CACHE_FORMAT_VERSION, 'section_hashes': handbook_data.section_hashes}
+                if server_type:
+                    meta['server_type'] = server_type
+                connection.executemany('INSERT OR REPLACE INTO meta VALUES (?, ?)',
+                                       ((key, json.dumps(value)) for key, value in meta.items()))
+
+    def load_section(self, key):
+        config = record_table(key)
+        columns = ', '.join(column.split()[0] for column in config['columns'])
+        from_row = config['from_row']
+        with database_errors(self.path), self.connect() as connection:
+            self.check_format(connection)
+            rows = connection.execute(f"SELECT {columns} FROM {config['table']} WHERE section = ? ORDER BY position",
+                                      (key,))
+            return [from_row(row) for row in rows]
+
+    def load_id_index(self):
+        with database_errors(self.path), self.connect() as connection:
+            self.check_format(connection)
+            sorted_ids = dict(connection.execute('SELECT section, data FROM id_index'))
+        return HandbookIdIndex({key: marshal.loads(sorted_ids[key]) for key in HANDBOOK_SECTIONS})
+
+    def search(self, text, sections=None):
+        # [(раздел, позиция)] записей, в названии (с переводами) или ID которых есть text,
+        # в порядке разделов HANDBOOK_SECTIONS и записей в них. None, если индекс не подходит
+        # для запроса: trigram не ищет строки короче трёх символов, и их быстрее найти перебором
+        text = text.lower()
+        sections = sections or HANDBOOK_SECTIONS
+        with database_errors(self.path), self.connect() as connection:
+            self.check_format(connection)
+            if self._tokenizer is None:
+                self._tokenizer = self.read_meta(connection, 'tokenizer')
+            if not text or (self._tokenizer == 'trigram' and len(text) < 3):
+                return None
+            query = '"' + text.replace('"', '""') + '"'
+            if self._tokenizer != 'trigram':
+                query += '*'
+            rows = connection.execute('SELECT section, position FROM names WHERE names MATCH ?', (query,))
+            matches = [(section, position) for section, position in rows if section in sections]
+        order = {key: number for number, key in enumerate(HANDBOOK_SECTIONS)}
+        matches.sort(key=lambda match: (order[match[0]], match[1]))
+        return matches
+
+def file_checksum(path, buffer_size=1024 * 1024):
+    checksum = 0
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(buffer_size)
+            if not chunk:
+                return checksum
+            checksum = zlib.crc32(chunk, checksum)
+
+class SqliteHandbookCache(HandbookDatabase):
+    # Запись кэша HandbookCacheStore в формате 'sqlite'. Интерфейс тот же, что у
+    # HandbookShardCache; manifest.json записывается последним и отмечает готовую запись.
+    # Как и для шардов, манифест хранит CRC32 базы: она проверяется перед первым чтением,
+    # и изменённая или недописанная база считается повреждённой
+    def __init__(self, cache_dir):
+        super().__init__(os.path.join(cache_dir, DATABASE_FILE))
+        self.cache_dir = cache_dir
+        # Сжатие к базе не применяется
+        self.codec = NoCacheCodec()
+        self._verified = False
+
+    def manifest_path(self):
+        return os.path.join(self.cache_dir, MANIFEST_FILE)
+
+    def exists(self):
+        return os.path.isfile(self.manifest_path())
+
+    def verify(self):
+        if self._verified:
+            return
+        with open(self.manifest_path(), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('format_version') != CACHE_FORMAT_VERSION:
+            raise ValueError(f"Unsupported cache manifest: {self.cache_dir}")
+        if file_checksum(self.path) != manifest['checksum']:
+            raise ValueError(f"Cache database checksum mismatch: {self.path}")
+        self._verified = True
+
+    def check_format(self, connection):
+        self.verify()
+        super().check_format(connection)
+
+    def write(self, handbook_data, reuse_from=None):
+        # Инкрементальная запись: база прежней записи копируется, и в ней заменяются
+        # только разобранные заново разделы (незагруженные разделы handbook_data взяты из неё)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        keep = ()
+        if isinstance(reuse_from, SqliteHandbookCache):
+            try:
+                reuse_from.verify()
+                shutil.copyfile(reuse_from.path, self.path)
+                keep = [key for key in HANDBOOK_SECTIONS if not handbook_data.is_loaded(key)]
+            except (OSError, ValueError, KeyError):
+                # Прежняя база недоступна или повреждена – записываем все разделы заново
+                pass
+        try:
+            self.write_database(handbook_data, keep)
+        except ValueError:
+            if not keep:
+                raise
+            # Скопированная база повреждена – записываем все разделы заново
+            os.remove(self.path)
+            self.write_database(handbook_data)
+        atomic_write(self.manifest_path(), json.dumps({'format_version': CACHE_FORMAT_VERSION,
+                                                       'database': DATABASE_FILE,
+                                                       'checksum': file_checksum(self.path)}).encode('utf-8'))
+        self._verified = True
+
+def unchanged_keys(database, handbook_data, server_type):
+    # Разделы HandbookData, исходные разделы которых не изменились с прошлой выгрузки в базу
+    if not os.path.exists(database.path):
+        return []
+    with database_errors(database.path), database.connect() as connection:
+        try:
+            database.check_format(connection)
+        except (ValueError, sqlite3.OperationalError):
+            return []
+        if database.read_meta(connection, 'server_type') != server_type:
+            return []
+        stored_hashes = database.read_meta(connection, 'section_hashes', {})
+    new_hashes = handbook_data.section_hashes
+    keep = []
+    for section, outputs in SECTION_CONFIG[server_type]['section_outputs'].items():
+        section_hash = new_hashes.get(section)
+        if section_hash is not None and stored_hashes.get(section) == section_hash:
+            keep.extend(outputs)
+    return keep
+
+def export_handbook(handbook_filename, database_path, server_type=None):
+    # Выгрузка справочника в базу. Если база уже содержит прежнюю версию этого
+    # справочника, перезаписываются только изменившиеся разделы
+    if server_type is None:
+        server_type, _ = identify_handbook(handbook_filename)
+        if not server_type:
+            raise ValueError(f"Unknown handbook format: {handbook_filename}")
+    handbook_data = process_handbook(handbook_filename, server_type)
+    database = HandbookDatabase(database_path)
+    keep = unchanged_keys(database, handbook_data, server_type)
+    database.write_database(handbook_data, keep, server_type)
+    return [key for key in HANDBOOK_SECTIONS if key not in keep]
+
+def search_database(database_path, text, sections=None):
+    # [(раздел, id, название)] для поиска вне программы
+    database = HandbookDatabase(database_path)
+    matches = database.search(text, sections)
+    if matches is None:
+        text = text.lower()
+        matches = [(key, position) for key in sections or HANDBOOK_SECTIONS
+                   for position, record in enumerate(database.load_section(key))
+                   if text in record.search_key or text in record.id]
+    loaded = {}
+    result = []
+    for key, position in matches:
+        if key not in loaded:
+            loaded[key] = database.load_section(key)
+        record = loaded[key][position]
+        result.append((key, record.id, record_name(record)))
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description='Handbook SQLite database')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    export_parser = subparsers.add_parser('export', help='write the handbook into a SQLite database')
+    export_parser.add_argument('handbook')
+    export_parser.add_argument('database')
+
+    search_parser = subparsers.add_parser('search', help='full-text search across all sections')
+    search_parser.add_argument('database')
+    search_parser.add_argument('text')
+    search_parser.add_argument('--section', action='append', choices=HANDBOOK_SECTIONS,
+                               help='search only this section (may be repeated)')
+    search_parser.add_argument('--limit', type=int, default=50)
+
+    args = parser.parse_args()
+    try:
+        if args.command == 'export':
+            written = export_handbook(args.handbook, args.database)
+            print(f"{len(written)} sections written: {', '.join(written)}")
+        else:
+            result = search_database(args.database, args.text, args.section)
+            for key, entry_id, name in result[:args.limit]:
+                print(f"{key}\t{entry_id}\t{name}")
+            print(f"{len(result)} matches")
+    except ValueError as e:
+        raise SystemExit(str(e))
+
+if __name__ == '__main__':
+    main()
@@ -5,13 +5,37 @@ from tkinter import ttk, messagebox
 import os
 import json
 import sys
+import multiprocessing
+from collections import deque
 
-from process_handbook import process_handbook, identify_handbook
+from process_handbook import HandbookWatcher, process_handbooks_async, identify_handbook, start_cache_verification
+from search_engine import SEARCH_CONFIG, start_search_index_build
+from search_scheduler import search_scheduler
 from settings import SettingsWindow, get_path # Import the SettingsWindow class
 
 program_name = "HSR server Tools"
 program_version = "1.3"
 settings_file = 'settings.json'
+# How often the selected Handbook files are checked for changes, in milliseconds
+handbook_watch_interval = 2000
+# How often sections of a Handbook that is still being parsed are moved into the tabs, in milliseconds
+handbook_load_interval = 100
+# How often the loading splash checks the worker thread for progress, in milliseconds
+loading_poll_interval = 50
+# How often the background cache verification is checked for a hash mismatch, in milliseconds
+cache_verification_poll_interval = 500
+# Handbook lists shown by each tab (by class name): while a new Handbook is parsed in the background,
+# opening a tab moves its sections to the front of the queue and only these tabs are refreshed
+tab_handbook_lists = {
+    'PlanarsTab': ['relics_list'],
+    'ItemsTab': ['base_materials_list', 'lightcones_list', 'materials_list', 'other_items_list', 'unknown_items_list'],
+    'SpawnTab': ['props_list', 'npc_monsters_list', 'battle_stages', 'battle_monsters_list'],
+    'MazesTab': ['mazes_list'],
+    'AvatarsTab': ['avatars_list'],
+    'RogueBuffsTab': ['rogue_buffs_su', 'rogue_buffs_food', 'rogue_buffs_various', 'rogue_buffs_from_entities',
+                      'rogue_buffs_other', 'rogue_buffs_unknown', 'rogue_miracles'],
+    'BannerEditorTab': ['lightcones_list', 'avatars_list'],
+}
 
 def load_settings():
     # Load settings from settings.json
@@ -70,6 +94,7 @@ def create_tabs(notebook, command_manager, server_type, data, localization, sett
         import tab_avatars_LC
         import tab_commands_LC
         import tab_opencommand
+        import tab_handbook_diff
         import tab_server
 
         # Unpack data
@@ -148,6 +173,11 @@ def create_tabs(notebook, command_manager, server_type, data, localization, sett
         notebook.add(commands_tab.frame, text=main_locale['tab_commands'])
         tabs.append(commands_tab)
 
+        # Handbook Diff Tab
+        handbook_diff_tab = tab_handbook_diff.HandbookDiffTab(notebook, settings['selected_handbook'], server_type, program_version, localization['handbook_diff_tab'])
+        notebook.add(handbook_diff_tab.frame, text=main_locale.get('tab_handbook_diff', "Handbook diff"))
+        tabs.append(handbook_diff_tab)
+
         # OpenCommand Tab
         opencommand_tab = tab_opencommand.OpenCommandTab(notebook, localization=localization['opencommand_tab'])
         notebook.add(opencommand_tab.frame, text=main_locale['tab_opencommand_plugin'])
@@ -175,6 +205,7 @@ def create_tabs(notebook, command_manager, server_type, data, localization, sett
         import tab_opencommand
         import tab_command_DH
         import tab_banner_editor
+        import tab_handbook_diff
         # import tab_server
 
         # Unpack data
@@ -256,10 +287,15 @@ def create_tabs(notebook, command_manager, server_type, data, localization, sett
         notebook.add(command_tab.frame, text=main_locale.get('tab_commands', "Commands"))
         tabs.append(command_tab)
 
-        banner_editor_tab = tab_banner_editor.BannerEditorTab(notebook, lightcones_list, avatars_list, localization['banner_editor'])
+        banner_editor_tab = tab_banner_editor.BannerEditorTab(notebook, lightcones_list, avatars_list, localization['banner_editor'], data)
         notebook.add(banner_editor_tab.frame, text=main_locale.get('tab_banner_editor', "Редактор баннеров"))
         tabs.append(banner_editor_tab)
 
+        # Handbook Diff Tab
+        handbook_diff_tab = tab_handbook_diff.HandbookDiffTab(notebook, settings['selected_handbook'], server_type, program_version, localization['handbook_diff_tab'])
+        notebook.add(handbook_diff_tab.frame, text=main_locale.get('tab_handbook_diff', "Handbook diff"))
+        tabs.append(handbook_diff_tab)
+
         # OpenCommand Tab
         opencommand_tab = tab_opencommand.OpenCommandTab(notebook, localization=localization['opencommand_tab'])
         notebook.add(opencommand_tab.frame, text=main_locale['tab_opencommand_plugin'])
@@ -320,6 +356,10 @@ class Application:
         self.root = root
         self.root.protocol("WM_DELETE_WINDOW", self.on_close)
         self.settings_file = settings_file
+        self.handbook_watcher = None
+        self.handbook_loader = None
+        self.loading_updates = None
+        self.cache_mismatches = None
         self.initialize_app()
 
     def initialize_app(self):
@@ -331,13 +371,15 @@ class Application:
     def load_settings(self):
         self.settings = load_settings()
         self.language_code = self.settings.get('language')
+        SEARCH_CONFIG['fuzzy'] = self.settings.get('fuzzy_search', False)
 
     def load_localization(self):
         self.localization = load_localization(self.language_code)
         self.main_locale = self.localization['main']
 
     def create_widgets(self):
-        # Clear any existing widgets
+        # Clear any existing widgets, dropping search updates still scheduled for them
+        search_scheduler.cancel_all()
         for widget in self.root.winfo_children():
             widget.destroy()
 
@@ -359,6 +401,12 @@ class Application:
         self.server_type = server_type
         self.handbook_version = handbook_version
         self.selected_handbook = selected_handbook
+        # Other language variants of the same Handbook version: their names are used for search
+        self.language_handbooks = [selected_handbook] + [
+            path for path in self.settings.get('extra_handbooks', [])
+            if path != selected_handbook and os.path.exists(path)
+            and identify_handbook(path) == (server_type, handbook_version)
+        ]
 
         self.root.title(self.main_locale['window_title'].format(
             program_name=program_name,
@@ -376,6 +424,69 @@ class Application:
         menubar.add_cascade(label=self.main_locale['settings_menu'], menu=settings_menu)
         settings_menu.add_command(label=self.main_locale['settings_button'], command=self.open_settings)
 
+        # Process the file on a worker thread while a progress splash is shown; the rest of the window
+        # is built when the data arrives. A single Handbook that is not cached yet is only pre-scanned:
+        # the tabs open with empty lists that are filled as its sections are parsed in the background.
+        # The worker only appends to a queue: Tk must not be called from other threads
+        # (before mainloop starts, that even raises an error), so the queue is polled with root.after
+        self.stop_handbook_loader()
+        if self.handbook_watcher is not None:
+            self.handbook_watcher.stop()
+            self.handbook_watcher = None
+        self.cache_mismatches = None
+        self.show_loading_splash()
+        updates = self.loading_updates = deque()
+        process_handbooks_async(
+            self.language_handbooks,
+            self.server_type,
+            on_progress=lambda *progress: updates.append(('progress', progress)),
+            on_done=lambda future: updates.append(('done', future)),
+            program_version=program_version,
+            deferred=True
+        )
+        self.root.after(loading_poll_interval, self.poll_loading_updates, updates)
+
+    def show_loading_splash(self):
+        self.loading_splash = tk.Frame(self.root)
+        self.loading_splash.place(relx=0.5, rely=0.5, anchor=tk.CENTER)
+        tk.Label(self.loading_splash, text=self.main_locale.get('loading_handbook', 'Loading Handbook...'),
+                 font=('Arial', 14)).pack(pady=5)
+        self.loading_bar = ttk.Progressbar(self.loading_splash, length=400, mode='determinate')
+        self.loading_bar.pack(pady=5)
+        self.loading_label = tk.Label(self.loading_splash, text='')
+        self.loading_label.pack()
+
+    def poll_loading_updates(self, updates):
+        if updates is not self.loading_updates:
+            return  # Replaced after the settings changed
+        while updates:
+            kind, value = updates.popleft()
+            if kind == 'progress':
+                self.update_loading_splash(*value)
+            else:
+                self.loading_updates = None
+                self.loading_splash.destroy()
+                self.on_handbook_loaded(value)
+                return
+        self.root.after(loading_poll_interval, self.poll_loading_updates, updates)
+
+    def update_loading_splash(self, bytes_done, total_bytes, sections_done):
+        self.loading_bar['maximum'] = max(total_bytes, 1)
+        self.loading_bar['value'] = bytes_done
+        self.loading_label.config(text=self.main_locale.get(
+            'loading_progress', '{done:.1f} of {total:.1f} MB, sections: {sections}'
+        ).format(done=bytes_done / 1024 / 1024, total=total_bytes / 1024 / 1024, sections=sections_done))
+
+    def on_handbook_loaded(self, future):
+        try:
+            handbook_data, self.handbook_loader = future.result()
+        except Exception as e:
+            messagebox.showerror(self.main_locale.get('handbook_load_failed_title', 'Handbook Load Failed'), str(e))
+            self.open_settings()
+            return
+        self.create_main_widgets(handbook_data)
+
+    def create_main_widgets(self, handbook_data):
         # Initialize shared variables
         self.give_command = tk.StringVar()
         self.autocopy_var = tk.BooleanVar()
@@ -388,8 +499,7 @@ class Application:
         # Create a CommandManager or similar to handle command updates
         self.command_manager = CommandManager(self.root, self.give_command, self.autocopy_var, self.main_locale)
 
-        # Process the file
-        handbook_data = process_handbook(self.selected_handbook, self.server_type, program_version)
+        self.handbook_data = handbook_data
         # Extract data
         data = handbook_data.get_data()
 
@@ -433,6 +543,45 @@ class Application:
         # Bind F5 key to execute command
         self.root.bind('<F5>', lambda event: self.execute_command())
 
+        # Pick up regenerated Handbook files without restarting
+        self.start_handbook_watcher()
+
+        if self.handbook_loader is not None:
+            self.set_tabs_handbook_loading(True)
+            self.notebook.bind('<<NotebookTabChanged>>', self.on_tab_changed)
+            self.on_tab_changed()
+            self.root.after(handbook_load_interval, self.poll_handbook_loader, self.handbook_loader)
+        else:
+            # Index the lists for the search boxes while the user looks around
+            start_search_index_build(data.values())
+
+        # The cache was accepted by file size/mtime only: re-check the full hash in the background.
+        # on_mismatch runs on the verification threads, so it only appends to a queue polled with root.after
+        if handbook_data.validated_by_stat:
+            mismatches = self.cache_mismatches = deque()
+            threads = [
+                start_cache_verification(
+                    handbook_path,
+                    self.server_type,
+                    on_mismatch=lambda: mismatches.append(True)
+                )
+                for handbook_path in self.language_handbooks
+            ]
+            self.root.after(cache_verification_poll_interval, self.poll_cache_verification, mismatches, threads)
+
+    def poll_cache_verification(self, mismatches, threads):
+        if mismatches is not self.cache_mismatches:
+            return  # Replaced after the settings changed
+        # Checked before the queue: a thread that has finished has already appended its result
+        running = any(thread.is_alive() for thread in threads)
+        if mismatches:
+            self.cache_mismatches = None
+            self.on_handbook_changed()
+        elif running:
+            self.root.after(cache_verification_poll_interval, self.poll_cache_verification, mismatches, threads)
+        else:
+            self.cache_mismatches = None
+
     def open_settings(self):
         self.root.withdraw()  # Hide the main window
         settings_window = SettingsWindow(self.root, settings_file=self.settings_file)
@@ -446,10 +595,109 @@ class Application:
         # Reload settings and reinitialize the application
         self.initialize_app()
 
+    def on_handbook_changed(self):
+        # The Handbook content no longer matches the cache: reprocess it in the background
+        if self.handbook_watcher is not None:
+            self.handbook_watcher.request_reload()
+
+    def on_tab_changed(self, event=None):
+        # The sections shown by the opened tab are parsed next
+        if self.handbook_loader is None:
+            return
+        selected = self.notebook.select()
+        for tab in self.tabs:
+            if str(tab.frame) == selected:
+                self.handbook_loader.request(tab_handbook_lists.get(type(tab).__name__, []))
+
+    def poll_handbook_loader(self, loader):
+        # Sections are parsed on the loader's worker thread; here, on the Tk thread, they are moved into the tabs
+        if loader is not self.handbook_loader:
+            return  # Replaced after the settings changed
+        try:
+            updated = loader.poll()
+        except Exception as e:
+            # Parse the whole Handbook again the regular way
+            self.handbook_loader = None
+            self.set_tabs_handbook_loading(False)
+            messagebox.showerror(self.main_locale.get('handbook_reload_failed_title', 'Handbook Reload Failed'), str(e))
+            self.on_handbook_changed()
+            return
+        if updated:
+            # Some list updates clear the command line; keep what the user has typed
+            command = self.give_command.get()
+            for tab in self.tabs:
+                if hasattr(tab, 'refresh') and set(tab_handbook_lists.get(type(tab).__name__, [])) & set(updated):
+                    tab.refresh()
+            self.give_command.set(command)
+        if loader.done:
+            self.handbook_loader = None
+            self.set_tabs_handbook_loading(False)
+            start_search_index_build(self.handbook_data.get_data().values())
+        else:
+            self.root.after(handbook_load_interval, self.poll_handbook_loader, loader)
+
+    def set_tabs_handbook_loading(self, loading):
+        # Tabs that must wait until the Handbook is fully parsed (e.g. the Handbook diff)
+        for tab in self.tabs:
+            if hasattr(tab, 'set_handbook_loading'):
+                tab.set_handbook_loading(loading)
+
+    def stop_handbook_loader(self):
+        if self.handbook_loader is not None:
+            self.handbook_loader.stop()
+            self.handbook_loader = None
+
+    def start_handbook_watcher(self):
+        if self.handbook_watcher is not None:
+            self.handbook_watcher.stop()
+        self.handbook_watcher = HandbookWatcher(self.language_handbooks, self.server_type, program_version)
+        self.root.after(handbook_watch_interval, self.poll_handbook_watcher, self.handbook_watcher)
+
+    def poll_handbook_watcher(self, watcher):
+        # The Handbook files are reparsed on the watcher's worker thread; here we only check for the result
+        if watcher is not self.handbook_watcher:
+            return  # Replaced after the settings changed
+        try:
+            handbook_data = watcher.poll()
+        except Exception as e:
+            handbook_data = None
+            messagebox.showerror(self.main_locale.get('handbook_reload_failed_title', 'Handbook Reload Failed'), str(e))
+        if handbook_data is not None:
+            self.apply_handbook_data(handbook_data)
+        self.root.after(handbook_watch_interval, self.poll_handbook_watcher, watcher)
+
+    def apply_handbook_data(self, handbook_data):
+        # Swap the new data into the open tabs within one Tk callback, so no tab ever sees a mix
+        # of old and new records. Tabs keep references to the same lists, which are updated in place.
+        # Sections of the previous file that are still being parsed are no longer needed
+        self.stop_handbook_loader()
+        self.handbook_data.replace_with(handbook_data)
+        # Some list updates clear the command line; keep what the user has typed
+        command = self.give_command.get()
+        for tab in self.tabs:
+            if hasattr(tab, 'refresh'):
+                tab.refresh()
+        self.give_command.set(command)
+        start_search_index_build(self.handbook_data.get_data().values())
+
+        server_type, handbook_version = identify_handbook(self.selected_handbook)
+        if server_type == self.server_type and handbook_version != self.handbook_version:
+            self.handbook_version = handbook_version
+            self.root.title(self.main_locale['window_title'].format(
+                program_name=program_name,
+                program_version=program_version,
+                server_type=self.server_type,
+                handbook_version=self.handbook_version
+            ))
+
     def execute_command(self):
         self.command_manager.execute_command()
 
     def on_close(self):
+        if self.handbook_watcher is not None:
+            self.handbook_watcher.stop()
+        self.stop_handbook_loader()
+        search_scheduler.cancel_all()
         # Assuming self.tabs were created and the last one is the server tab
         if hasattr(self, 'tabs') and self.tabs:
             if self.server_type == "LunarCore":
@@ -528,4 +776,6 @@ class CommandManager:
                 messagebox.showwarning(self.localization['no_command_title'], self.localization['no_command_message'])
 
 if __name__ == '__main__':
+    # Required for the Handbook parsing process pool in a frozen .exe
+    multiprocessing.freeze_support()
     main()
@@ -1,36 +1,139 @@
+import codecs
+import errno
 import hashlib
+import io
 import json
+import lzma
+import marshal
+import mmap
 import os
+import pickle
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from bisect import bisect_right
+from collections import deque
+from collections.abc import Mapping
+from contextlib import contextmanager
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import groupby, repeat
+from operator import itemgetter
+
+try:
+    import fcntl
+    msvcrt = None
+except ImportError:
+    # Windows
+    fcntl = None
+    import msvcrt
 
 # === Конфигурация параметров сортировки ===
 
-# Параметры для обработки разделов в зависимости от типа сервера
+# Списки HandbookData, которые заполняются при разборе предметов и баффов
+ITEM_LISTS = ['relics_list', 'lightcones_list', 'materials_list', 'base_materials_list',
+              'unknown_items_list', 'other_items_list']
+ROGUE_BUFF_LISTS = ['rogue_buffs_su', 'rogue_buffs_food', 'rogue_buffs_various', 'rogue_buffs_from_entities',
+                    'rogue_buffs_other', 'rogue_buffs_unknown']
+
+# Параметры для обработки разделов в зависимости от типа сервера.
+# processors – обработчик строки раздела либо имя списка HandbookData, в который
+# записи раздела попадают как есть (Entry).
+# section_outputs – какие списки HandbookData заполняет каждый раздел
+# (используется, чтобы переиспользовать неизменившиеся разделы из прежнего кэша)
 SECTION_CONFIG = {
     'LunarCore': {
         'skip_sections': ['Lunar Core', 'Created', 'Commands'],
         'processors': {
-            'Avatars': lambda id_str, name, hd, section: hd.avatars_list.append({'id': id_str, 'name': name}),
+            'Avatars': 'avatars_list',
             'Items': lambda id_str, name, hd, section: process_item_line(id_str, name, hd, section),
-            'Props (Spawnable)': lambda id_str, name, hd, section: hd.props_list.append({'id': id_str, 'name': name}),
-            'NPC Monsters (Spawnable)': lambda id_str, name, hd, section: hd.npc_monsters_list.append({'id': id_str, 'name': name}),
-            'Battle Stages': lambda id_str, name, hd, section: hd.battle_stages.append({'id': id_str, 'name': name}),
-            'Battle Monsters': lambda id_str, name, hd, section: hd.battle_monsters_list.append({'id': id_str, 'name': name}),
-            'Mazes': lambda id_str, name, hd, section: hd.mazes_list.append({'id': id_str, 'name': name}),
+            'Props (Spawnable)': 'props_list',
+            'NPC Monsters (Spawnable)': 'npc_monsters_list',
+            'Battle Stages': 'battle_stages',
+            'Battle Monsters': 'battle_monsters_list',
+            'Mazes': 'mazes_list',
+        },
+        'section_outputs': {
+            'Avatars': ['avatars_list'],
+            'Items': ITEM_LISTS,
+            'Props (Spawnable)': ['props_list'],
+            'NPC Monsters (Spawnable)': ['npc_monsters_list'],
+            'Battle Stages': ['battle_stages'],
+            'Battle Monsters': ['battle_monsters_list'],
+            'Mazes': ['mazes_list'],
         }
     },
     'DanhengServer': {
         'skip_sections': ['Command'],
         'processors': {
-            'Avatar': lambda id_str, name, hd, section: hd.avatars_list.append({'id': id_str, 'name': name}),
+            'Avatar': 'avatars_list',
             'Item': lambda id_str, name, hd, section: process_item_line(id_str, name, hd, section),
-            'MainMission': lambda id_str, name, hd, section: hd.main_missions.append({'id': id_str, 'name': name}),
-            'SubMission': lambda id_str, name, hd, section: hd.sub_missions.append({'id': id_str, 'name': name}),
+            'MainMission': 'main_missions',
+            'SubMission': 'sub_missions',
             'RogueBuff': lambda id_str, name, hd, section: process_rogue_buff_line(id_str, name, hd),
-            'RogueMiracle': lambda id_str, name, hd, section: hd.rogue_miracles.append({'id': id_str, 'name': name}),
+            'RogueMiracle': 'rogue_miracles',
+        },
+        'section_outputs': {
+            'Avatar': ['avatars_list'],
+            'Item': ITEM_LISTS,
+            'MainMission': ['main_missions'],
+            'SubMission': ['sub_missions'],
+            'RogueBuff': ROGUE_BUFF_LISTS,
+            'RogueMiracle': ['rogue_miracles'],
         }
     }
 }
 
+# Параметры параллельной обработки больших справочников: родительский процесс только находит
+# границы разделов (scan_handbook_sections), каждый раздел читается и разбирается в своём
+# процессе. Быстрее последовательного разбора, только если ядер достаточно, файл большой
+# (пул процессов в Windows запускается заметное время) и ни один раздел не занимает
+# большую часть файла – разбор самого большого раздела не делится между процессами.
+# Оценка по benchmark_handbook.py parallel: справочник DanhengServer 6.7 МБ,
+# 1.16 с последовательно, ~0.73 с на 4 процессах
+PARALLEL_PARSE_CONFIG = {
+    # Минимальный размер файла (в байтах), начиная с которого параллельный режим включается
+    # автоматически; None – только явно (parallel=True)
+    'min_file_size': 16 * 1024 * 1024,
+    # Минимальное число ядер для автоматического включения
+    'min_cpu_count': 4,
+    # Наибольшая доля файла (в байтах), которую может занимать один раздел при автоматическом
+    # включении: иначе разбор этого раздела дольше, чем последовательный разбор остальных
+    'max_section_share': 0.5,
+    # Число процессов; None – по числу ядер
+    'max_workers': None
+}
+
+# Параметры кэша справочника
+CACHE_CONFIG = {
+    # Каталог кэша; None – каталог cache рядом с программой (см. get_cache_root)
+    'cache_dir': None,
+    # Формат кэша: 'marshal', 'pickle', 'json' (см. CACHE_SERIALIZERS) или 'sqlite' –
+    # база SQLite с полнотекстовым индексом названий (handbook_sqlite.py)
+    'format': 'marshal',
+    # Сжатие шардов: 'none', 'zlib' или 'lzma' (см. CACHE_CODECS) и уровень сжатия
+    # (zlib 0–9, lzma 0–9; None – уровень по умолчанию). Сравнение скорости и размера
+    # на своём справочнике: python benchmark_handbook.py codecs путь/к/handbook.txt
+    'compression': 'none',
+    'compression_level': None,
+    # Дополнительно сохранять читаемую JSON-копию кэша для отладки
+    'debug_json_export': False,
+    # Файлы не больше этого размера при проверке хэша остаются в памяти,
+    # чтобы при промахе кэша разобрать их без повторного чтения с диска
+    'max_hash_buffer_size': 64 * 1024 * 1024,
+    # Ограничения хранилища кэша одного типа сервера: при превышении
+    # удаляются записи, которые дольше всего не использовались
+    'max_entries': 5,
+    'max_size': 512 * 1024 * 1024
+}
+
+# Версия структуры кэша; при изменении формата записей кэш пересоздаётся
+CACHE_FORMAT_VERSION = 1
+
 # Параметры для сортировки предметов
 ITEM_SORTING_CONFIG = {
     'unknown_marker': 'null',
@@ -102,18 +205,87 @@ ROGUE_BUFF_CONFIG = {
 }
 
 # === Классы данных ===
+# Записи справочника исчисляются десятками тысяч, поэтому все классы записей
+# объявлены с __slots__ – без отдельного __dict__ у каждого экземпляра.
+# aliases – названия записи в других языковых версиях справочника (см. merge_handbook_languages);
+# в кэше сохраняются только непустые aliases
+
+def make_search_key(name, aliases):
+    # Строка для поиска без учёта регистра: название и его переводы через перевод строки
+    if not aliases:
+        return name.lower()
+    return '\n'.join((name,) + aliases).lower()
+
+class Entry:
+    # Простая запись раздела: ID и название.
+    # Поддерживает доступ как к словарю (entry['id'], entry.get('name')) для совместимости
+    __slots__ = ('id', 'name', 'aliases')
+
+    def __init__(self, entry_id, name, aliases=()):
+        self.id = entry_id
+        self.name = name
+        self.aliases = aliases
+
+    @property
+    def search_key(self):
+        return make_search_key(self.name, self.aliases)
+
+    def __getitem__(self, key):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        if key not in self.__slots__:
+            return default
+        return getattr(self, key)
+
+    def __eq__(self, other):
+        if isinstance(other, Entry):
+            return self.id == other.id and self.name == other.name
+        return NotImplemented
+
+    def __repr__(self):
+        return f"Entry({self.id!r}, {self.name!r})"
+
+    def to_dict(self):
+        data = {'id': self.id, 'name': self.name}
+        if self.aliases:
+            data['aliases'] = self.aliases
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['id'], data['name'], tuple(data.get('aliases', ())))
+
+    def to_tuple(self):
+        if self.aliases:
+            return (self.id, self.name, self.aliases)
+        return (self.id, self.name)
+
+    @classmethod
+    def from_tuple(cls, data):
+        return cls(*data)
 
 class Item:
-    def __init__(self, item_id, title, item_type, section, rarity=None, main_stats=None):
+    __slots__ = ('id', 'title', 'type', 'section', 'rarity', 'main_stats', 'aliases')
+
+    def __init__(self, item_id, title, item_type, section, rarity=None, main_stats=None, aliases=()):
         self.id = item_id
         self.title = title
         self.type = item_type  # 'default', 'planars', 'base_material', 'lightcone', 'material', 'unknown', 'other'
         self.section = section
         self.rarity = rarity
-        self.main_stats = main_stats or []
+        # Пустой кортеж общий для всех записей – не создаём отдельный список на каждый предмет
+        self.main_stats = main_stats or ()
+        self.aliases = aliases
+
+    @property
+    def search_key(self):
+        return make_search_key(self.title, self.aliases)
 
     def to_dict(self):
-        return {
+        data = {
             'id': self.id,
             'title': self.title,
             'type': self.type,
@@ -121,6 +293,9 @@ class Item:
             'rarity': self.rarity,
             'main_stats': self.main_stats
         }
+        if self.aliases:
+            data['aliases'] = self.aliases
+        return data
 
     @classmethod
     def from_dict(cls, data):
@@ -130,25 +305,45 @@ class Item:
             item_type=data['type'],
             section=data['section'],
             rarity=data.get('rarity'),
-            main_stats=data.get('main_stats', [])
+            main_stats=data.get('main_stats'),
+            aliases=tuple(data.get('aliases', ()))
         )
 
+    def to_tuple(self):
+        if self.aliases:
+            return (self.id, self.title, self.type, self.section, self.rarity, self.main_stats, self.aliases)
+        return (self.id, self.title, self.type, self.section, self.rarity, self.main_stats)
+
+    @classmethod
+    def from_tuple(cls, data):
+        return cls(*data)
+
 class RogueBuffSu:
-    def __init__(self, buff_id, name, category=None, buff_type=None, rarity=None):
+    __slots__ = ('id', 'name', 'category', 'buff_type', 'rarity', 'aliases')
+
+    def __init__(self, buff_id, name, category=None, buff_type=None, rarity=None, aliases=()):
         self.id = buff_id
         self.name = name
         self.category = category  # например, 'basic su', 'divergent su', 'equations', и т.д.
         self.buff_type = buff_type  # например, 'Preservation', 'Memory', и т.д.
         self.rarity = rarity  # 'Mythic', 'Legendary', 'Rare', 'Common' или None
+        self.aliases = aliases
+
+    @property
+    def search_key(self):
+        return make_search_key(self.name, self.aliases)
 
     def to_dict(self):
-        return {
+        data = {
             'id': self.id,
             'name': self.name,
             'category': self.category,
             'buff_type': self.buff_type,
             'rarity': self.rarity
         }
+        if self.aliases:
+            data['aliases'] = self.aliases
+        return data
 
     @classmethod
     def from_dict(cls, data):
@@ -157,11 +352,27 @@ class RogueBuffSu:
             name=data['name'],
             category=data.get('category'),
             buff_type=data.get('buff_type'),
-            rarity=data.get('rarity')
+            rarity=data.get('rarity'),
+            aliases=tuple(data.get('aliases', ()))
         )
 
+    def to_tuple(self):
+        if self.aliases:
+            return (self.id, self.name, self.category, self.buff_type, self.rarity, self.aliases)
+        return (self.id, self.name, self.category, self.buff_type, self.rarity)
+
+    @classmethod
+    def from_tuple(cls, data):
+        return cls(*data)
+
 class HandbookData:
     def __init__(self):
+        self._section_loader = None
+        self._validated_by_stat = False
+        self._section_hashes = {}
+        self._id_index = None
+        self._id_index_loader = None
+        self._search_backend = None
         # Общие разделы
         self.avatars_list = []
         self.relics_list = []
@@ -187,8 +398,239 @@ class HandbookData:
         self.rogue_buffs_unknown = []
         self.rogue_miracles = []
 
+    @classmethod
+    def from_loader(cls, section_loader):
+        # Разделы не заполняются сразу: каждый загружается section_loader(key)
+        # при первом обращении к соответствующему атрибуту
+        handbook_data = cls.__new__(cls)
+        handbook_data._section_loader = section_loader
+        handbook_data._validated_by_stat = False
+        handbook_data._section_hashes = {}
+        handbook_data._id_index = None
+        handbook_data._id_index_loader = None
+        handbook_data._search_backend = None
+        return handbook_data
+
+    @property
+    def validated_by_stat(self):
+        # True, если кэш принят по метаданным файла, без подсчёта хэша
+        return self._validated_by_stat
+
+    @property
+    def section_hashes(self):
+        # Хэши содержимого разделов справочника, из которого получены данные
+        return self._section_hashes
+
+    def __getattr__(self, name):
+        # Вызывается только для отсутствующих атрибутов, то есть для ещё не загруженных разделов
+        section_loader = self.__dict__.get('_section_loader')
+        if section_loader is None or name not in HANDBOOK_SECTIONS:
+            raise AttributeError(name)
+        value = section_loader(name)
+        setattr(self, name, value)
+        return value
+
+    @property
+    def id_index(self):
+        # Индекс ID: загружается из кэша или строится при первом обращении
+        if self._id_index is None:
+            if self._id_index_loader is not None:
+                self._id_index = self._id_index_loader()
+            else:
+                self._id_index = HandbookIdIndex.build(self)
+        return self._id_index
+
+    def find(self, entry_id, section=None):
+        # Запись с данным ID во всех разделах (или только в разделе section); None, если не найдена
+        location = self.id_index.locate(str(entry_id), section)
+        if location is None:
+            return None
+        key, position = location
+        return getattr(self, key)[position]
+
+    def find_range(self, section, low, high):
+        # Записи раздела с ID от low до high включительно, в порядке возрастания ID
+        records = getattr(self, section)
+        return [records[position] for position in self.id_index.range_positions(section, str(low), str(high))]
+
+    def search(self, text, sections=None):
+        # [(раздел, запись)], в названии (вместе с переводами) или ID которых встречается text,
+        # без учёта регистра. Для данных из кэша SQLite запрос выполняется по индексу FTS5.
+        # Вкладки ищут не здесь, а по индексу в памяти (search_records), он быстрее FTS5
+        text = text.lower()
+        sections = sections or HANDBOOK_SECTIONS
+        if self._search_backend is not None:
+            try:
+                matches = self._search_backend.search(text, sections)
+            except CACHE_LOAD_ERRORS:
+                # База недоступна – дальше ищем перебором
+                self._search_backend = None
+            else:
+                if matches is not None:
+                    return [(key, getattr(self, key)[position]) for key, position in matches]
+        return [(key, record) for key in sections for record in getattr(self, key)
+                if text in record.search_key or text in record.id]
+
+    def is_loaded(self, key):
+        # False, если раздел ещё не загружен из кэша
+        return key in self.__dict__
+
+    def load_all(self):
+        # Загружает все разделы и индекс ID (например, в рабочем потоке перед replace_with)
+        for key in HANDBOOK_SECTIONS:
+            getattr(self, key)
+        self.id_index
+        return self
+
+    def replace_with(self, other):
+        # Подменяет содержимое данными other. Уже загруженные списки изменяются на месте,
+        # поэтому вкладки, которые держат ссылки на них, сразу видят новые записи.
+        # other должен быть загружен полностью (load_all), тогда подмена не обращается к диску
+        for key in HANDBOOK_SECTIONS:
+            value = getattr(other, key)
+            if self.is_loaded(key):
+                getattr(self, key)[:] = value
+            else:
+                setattr(self, key, value)
+        self._section_loader = None
+        self._validated_by_stat = other._validated_by_stat
+        self._section_hashes = other._section_hashes
+        self._id_index = other.id_index
+        self._id_index_loader = None
+        self._search_backend = other._search_backend
+
     def get_data(self):
-        return self.__dict__
+        return HandbookDataView(self)
+
+# Имена всех разделов справочника в порядке объявления
+HANDBOOK_SECTIONS = tuple(key for key in vars(HandbookData()) if not key.startswith('_'))
+
+class HandbookDataView(Mapping):
+    # Словарь разделов поверх HandbookData: раздел загружается только при обращении к ключу
+    def __init__(self, handbook_data):
+        self._handbook_data = handbook_data
+
+    def __getitem__(self, key):
+        if key not in HANDBOOK_SECTIONS:
+            raise KeyError(key)
+        return getattr(self._handbook_data, key)
+
+    def __iter__(self):
+        return iter(HANDBOOK_SECTIONS)
+
+    def __len__(self):
+        return len(HANDBOOK_SECTIONS)
+
+    @property
+    def handbook_data(self):
+        return self._handbook_data
+
+    def find(self, entry_id, section=None):
+        return self._handbook_data.find(entry_id, section)
+
+    def find_range(self, section, low, high):
+        return self._handbook_data.find_range(section, low, high)
+
+    def search(self, text, sections=None):
+        return self._handbook_data.search(text, sections)
+
+def id_order_key(entry_id):
+    # Порядок ID: числовые ID без ведущих нулей сравниваются как числа
+    return (len(entry_id), entry_id)
+
+def bisect_ids(ids, entry_id, right=False):
+    # bisect_left/bisect_right по списку ID, упорядоченному по id_order_key
+    target = id_order_key(entry_id)
+    low, high = 0, len(ids)
+    while low < high:
+        middle = (low + high) // 2
+        value = id_order_key(ids[middle])
+        if value < target or (right and value == target):
+            low = middle + 1
+        else:
+            high = middle
+    return low
+
+def record_name(record):
+    # У предметов название хранится в title, у остальных записей – в name
+    title = getattr(record, 'title', None)
+    return title if title is not None else record.name
+
+def join_sorted_ids(left_sorted, right_sorted):
+    # Пары позиций (left, right) записей с одинаковым ID: слияние двух списков sorted_ids
+    # из HandbookIdIndex за один проход. Повторяющиеся ID сопоставляются по порядку появления
+    left_ids, left_positions = left_sorted
+    right_ids, right_positions = right_sorted
+    i = j = 0
+    while i < len(left_ids) and j < len(right_ids):
+        left_id = left_ids[i]
+        right_id = right_ids[j]
+        if left_id == right_id:
+            yield left_positions[i], right_positions[j]
+            i += 1
+            j += 1
+        # Сравнение по id_order_key без создания кортежей: сначала длина, затем строка
+        elif len(left_id) < len(right_id) or (len(left_id) == len(right_id) and left_id < right_id):
+            i += 1
+        else:
+            j += 1
+
+def sort_section_ids(records):
+    # (ID по возрастанию, позиции записей в разделе); записи с одинаковым ID сохраняют порядок
+    positions = sorted(range(len(records)), key=lambda position: id_order_key(records[position].id))
+    return [records[position].id for position in positions], positions
+
+class HandbookIdIndex:
+    # Индекс ID по всем разделам HandbookData:
+    #   by_id      – ID -> (раздел, позиция записи). Если ID встречается несколько раз,
+    #                хранится первая запись в порядке HANDBOOK_SECTIONS;
+    #   sorted_ids – раздел -> (ID по возрастанию, позиции записей) для двоичного поиска
+    #                и выборки диапазонов внутри раздела.
+    # Индекс содержит только ID и позиции, поэтому для неизменившихся разделов он берётся
+    # из прежнего кэша без загрузки самих записей.
+    # В кэше хранится только sorted_ids: by_id строится из него при первом обращении
+    # так же быстро, как загружался бы из файла
+    __slots__ = ('sorted_ids', '_by_id')
+
+    def __init__(self, sorted_ids):
+        self.sorted_ids = sorted_ids
+        self._by_id = None
+
+    @property
+    def by_id(self):
+        if self._by_id is None:
+            by_id = {}
+            # Обход в обратном порядке: при совпадении ID остаётся самая первая запись
+            for key in reversed(HANDBOOK_SECTIONS):
+                ids, positions = self.sorted_ids[key]
+                by_id.update(zip(reversed(ids), zip(repeat(key), reversed(positions))))
+            self._by_id = by_id
+        return self._by_id
+
+    @classmethod
+    def build(cls, handbook_data, previous=None):
+        # previous – индекс прежней записи кэша для разделов, которые не загружены
+        sorted_ids = {}
+        for key in HANDBOOK_SECTIONS:
+            if previous is not None and not handbook_data.is_loaded(key):
+                sorted_ids[key] = previous.sorted_ids[key]
+            else:
+                sorted_ids[key] = sort_section_ids(getattr(handbook_data, key))
+        return cls(sorted_ids)
+
+    def locate(self, entry_id, section=None):
+        # (раздел, позиция) записи с данным ID или None
+        if section is None:
+            return self.by_id.get(entry_id)
+        ids, positions = self.sorted_ids[section]
+        index = bisect_ids(ids, entry_id)
+        if index < len(ids) and ids[index] == entry_id:
+            return section, positions[index]
+        return None
+
+    def range_positions(self, section, low, high):
+        ids, positions = self.sorted_ids[section]
+        return positions[bisect_ids(ids, low):bisect_ids(ids, high, right=True)]
 
 # === Вспомогательные функции ===
 
@@ -209,6 +651,74 @@ def identify_handbook(filename):
     except Exception:
         return None, None
 
+def file_stat_signature(filename):
+    # Метаданные файла, по которым кэш проверяется без чтения содержимого
+    stat_result = os.stat(filename)
+    return {
+        'path': os.path.abspath(filename),
+        'size': stat_result.st_size,
+        'mtime_ns': stat_result.st_mtime_ns,
+        'inode': stat_result.st_ino
+    }
+
+def probe_handbook(filename):
+    # (метаданные файла, (server_type, version)); выполняется в потоке пула при сканировании
+    return file_stat_signature(filename), identify_handbook(filename)
+
+class HandbookMetadataCache:
+    # Результаты identify_handbook для файлов, проверенных ранее, с их метаданными.
+    # Пока размер, mtime и inode файла не изменились, заголовок повторно не читается.
+    # Файлы, не являющиеся справочниками, тоже запоминаются (server_type = None)
+    def __init__(self, cache_file=None):
+        self.cache_file = cache_file or os.path.join(get_cache_root(), 'handbook_metadata.json')
+        self.files = self.load()
+        self.changed = False
+
+    def load(self):
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                files = json.load(f).get('files')
+            if isinstance(files, dict):
+                return files
+        except (OSError, ValueError, AttributeError):
+            pass
+        return {}
+
+    def save(self):
+        if not self.changed:
+            return
+        # Записи об удалённых файлах не храним
+        self.files = {path: known for path, known in self.files.items() if os.path.exists(path)}
+        atomic_write(self.cache_file, json.dumps({'files': self.files}, ensure_ascii=False, indent=4).encode('utf-8'))
+        self.changed = False
+
+    def lookup(self, filename):
+        # (server_type, version), если файл не менялся с последней проверки, иначе None
+        try:
+            stat_signature = file_stat_signature(filename)
+        except OSError:
+            return None
+        known = self.files.get(stat_signature['path'])
+        if known and known.get('stat') == stat_signature:
+            return known['server_type'], known['version']
+        return None
+
+    def store(self, stat_signature, metadata):
+        server_type, version = metadata
+        self.files[stat_signature['path']] = {'stat': stat_signature, 'server_type': server_type, 'version': version}
+        self.changed = True
+
+    def identify(self, filename):
+        # identify_handbook с использованием кэша
+        metadata = self.lookup(filename)
+        if metadata is None:
+            try:
+                stat_signature, metadata = probe_handbook(filename)
+            except OSError:
+                return None, None
+            self.store(stat_signature, metadata)
+        return metadata
+
 def compute_file_hash(filename):
     hasher = hashlib.sha256()
     with open(filename, 'rb') as f:
@@ -216,6 +726,82 @@ def compute_file_hash(filename):
             hasher.update(chunk)
     return hasher.hexdigest()
 
+# === Скомпилированные таблицы классификации ===
+# Конфигурации выше разворачиваются один раз при импорте: диапазоны ID предметов –
+# в таблицу для bisect, префиксы категорий – в словарь. Классификация строки
+# не зависит от числа диапазонов и префиксов в конфигурации
+
+# Диапазоны ID предметов и тип, который они задают (None – строки пропускаются)
+ITEM_RANGE_TYPES = [
+    ('skip_range', None),
+    ('material_range', 'material'),
+    ('base_material_range', 'base_material'),
+    ('lightcone_range', 'lightcone')
+]
+
+# Список HandbookData для каждого типа предмета (реликвии и световые конусы добавляются отдельно)
+ITEM_TYPE_LISTS = {
+    'material': 'materials_list',
+    'base_material': 'base_materials_list',
+    'unknown': 'unknown_items_list',
+    'other': 'other_items_list'
+}
+
+def compile_range_table(config, range_types):
+    # Возвращает (начала, концы, значения), отсортированные по началу диапазона.
+    # Раньше диапазоны проверялись по очереди; поиск через bisect даёт тот же результат,
+    # только если диапазоны не пересекаются – это проверяется здесь
+    ranges = sorted((config[key][0], config[key][1], value) for key, value in range_types)
+    for (_, prev_high, _), (low, _, _) in zip(ranges, ranges[1:]):
+        if low <= prev_high:
+            raise ValueError(f"Пересекающиеся диапазоны ID в конфигурации: {ranges}")
+    return [r[0] for r in ranges], [r[1] for r in ranges], [r[2] for r in ranges]
+
+def lookup_range(table, value, default=None):
+    starts, ends, values = table
+    index = bisect_right(starts, value) - 1
+    if index >= 0 and value <= ends[index]:
+        return values[index]
+    return default
+
+def compile_prefix_map(prefix_map):
+    # Возвращает (длины префиксов по убыванию, словарь префикс -> значение).
+    # Префикс, перед которым в конфигурации уже стоит более короткий совпадающий префикс,
+    # никогда не срабатывал и отбрасывается. Для оставшихся самый длинный совпавший префикс –
+    # это первый совпавший в порядке конфигурации
+    table = {}
+    for prefix, value in prefix_map.items():
+        if not any(prefix.startswith(earlier) for earlier in table):
+            table[prefix] = value
+    return sorted({len(prefix) for prefix in table}, reverse=True), table
+
+def lookup_prefix(compiled, key, default=None):
+    lengths, table = compiled
+    for length in lengths:
+        prefix = key[:length]
+        if prefix in table:
+            return table[prefix]
+    return default
+
+ITEM_RANGE_TABLE = compile_range_table(ITEM_SORTING_CONFIG, ITEM_RANGE_TYPES)
+# Первая цифра ID реликвии -> редкость (от 2 до 5)
+RELIC_RARITY_BY_DIGIT = {
+    digit: digit - 1
+    for digit in range(ITEM_SORTING_CONFIG['relic_valid_first_digit_range'][0],
+                       ITEM_SORTING_CONFIG['relic_valid_first_digit_range'][1] + 1)
+}
+# Последняя цифра ID реликвии -> тип; при повторе цифры действует первый тип в конфигурации
+RELIC_TYPE_BY_DIGIT = {}
+for relic_type, digits in ITEM_SORTING_CONFIG['relic_type_map'].items():
+    for digit in digits:
+        RELIC_TYPE_BY_DIGIT.setdefault(digit, relic_type)
+
+ROGUE_EMPTY_PREFIXES = tuple(ROGUE_BUFF_CONFIG['empty_prefixes'])
+ROGUE_SU_CATEGORIES = compile_prefix_map(ROGUE_BUFF_CONFIG['su']['category_map'])
+# Категории SU, для которых тип и редкость определяются по цифрам ID
+ROGUE_SU_TYPED_CATEGORIES = frozenset(['basic su', 'divergent su', 'divergent su: PH'])
+ROGUE_ENTITY_PREFIXES = tuple(ROGUE_BUFF_CONFIG['from_entities']['prefixes'])
+
 # === Основные функции обработки строк ===
 
 def process_item_line(id_str, name, handbook_data, current_section):
@@ -223,193 +809,1424 @@ def process_item_line(id_str, name, handbook_data, current_section):
     if not id_str.isdigit():
         return
 
-    id_int = int(id_str)
-
     # Если название содержит маркер "null", считаем предмет неизвестным
     if ITEM_SORTING_CONFIG['unknown_marker'] in name.lower():
         item_type = 'unknown'
-    # Пропускаем диапазон, относящийся к персонажам
-    elif ITEM_SORTING_CONFIG['skip_range'][0] <= id_int <= ITEM_SORTING_CONFIG['skip_range'][1]:
-        return
-    elif ITEM_SORTING_CONFIG['material_range'][0] <= id_int <= ITEM_SORTING_CONFIG['material_range'][1]:
-        item_type = 'material'
-    elif ITEM_SORTING_CONFIG['base_material_range'][0] <= id_int <= ITEM_SORTING_CONFIG['base_material_range'][1]:
-        item_type = 'base_material'
-    elif ITEM_SORTING_CONFIG['lightcone_range'][0] <= id_int <= ITEM_SORTING_CONFIG['lightcone_range'][1]:
-        item_type = 'lightcone'
+    else:
+        id_int = int(id_str)
+        range_type = lookup_range(ITEM_RANGE_TABLE, id_int, 'other')
+        # Пропускаем диапазон, относящийся к персонажам
+        if range_type is None:
+            return
+        item_type = range_type
+
+    if item_type == 'lightcone':
         # Определяем редкость по второй цифре
         if len(id_str) < 2:
             return
-        second_digit = id_str[1]
-        rarity = ITEM_SORTING_CONFIG['lightcone_rarity_map'].get(second_digit)
-        item = Item(item_id=id_str, title=name, item_type=item_type, section=current_section, rarity=rarity)
-        handbook_data.lightcones_list.append(item)
+        rarity = ITEM_SORTING_CONFIG['lightcone_rarity_map'].get(id_str[1])
+        handbook_data.lightcones_list.append(Item(id_str, name, item_type, current_section, rarity))
         return
     # Обработка реликвий
-    elif len(id_str) == ITEM_SORTING_CONFIG['relic_valid_length'] and id_str[1] != '0':
-        first_digit = int(id_str[0])
-        low, high = ITEM_SORTING_CONFIG['relic_valid_first_digit_range']
-        if low <= first_digit <= high:
-            rarity = first_digit - 1  # Редкость от 2 до 5
-            last_digit = int(id_str[-1])
-            if last_digit in ITEM_SORTING_CONFIG['relic_type_map']['default']:
-                item_type = 'default'
-            elif last_digit in ITEM_SORTING_CONFIG['relic_type_map']['planars']:
-                item_type = 'planars'
-            else:
-                item_type = 'unknown'
-            item = Item(item_id=id_str, title=name, item_type=item_type, section=current_section, rarity=rarity)
-            handbook_data.relics_list.append(item)
+    if item_type == 'other' and len(id_str) == ITEM_SORTING_CONFIG['relic_valid_length'] and id_str[1] != '0':
+        rarity = RELIC_RARITY_BY_DIGIT.get(int(id_str[0]))
+        if rarity is not None:
+            item_type = RELIC_TYPE_BY_DIGIT.get(int(id_str[-1]), 'unknown')
+            handbook_data.relics_list.append(Item(id_str, name, item_type, current_section, rarity))
             return
-        else:
-            item_type = 'other'
-    else:
-        item_type = 'other'
 
     # Создаём объект Item и распределяем по спискам
-    item = Item(item_id=id_str, title=name, item_type=item_type, section=current_section)
-    if item_type == 'material':
-        handbook_data.materials_list.append(item)
-    elif item_type == 'base_material':
-        handbook_data.base_materials_list.append(item)
-    elif item_type == 'unknown':
-        handbook_data.unknown_items_list.append(item)
-    elif item_type == 'other':
-        handbook_data.other_items_list.append(item)
+    getattr(handbook_data, ITEM_TYPE_LISTS[item_type]).append(Item(id_str, name, item_type, current_section))
 
 def process_rogue_buff_line(id_str, name, handbook_data):
     # Если название начинается с указанных префиксов, считаем бафф неизвестным
-    if any(name.startswith(prefix) for prefix in ROGUE_BUFF_CONFIG['empty_prefixes']):
-        handbook_data.rogue_buffs_unknown.append({'id': id_str, 'name': name})
+    if name.startswith(ROGUE_EMPTY_PREFIXES):
+        handbook_data.rogue_buffs_unknown.append(Entry(id_str, name))
     # Обработка SU баффов
     elif len(id_str) == ROGUE_BUFF_CONFIG['su']['id_length'] and id_str.startswith(ROGUE_BUFF_CONFIG['su']['prefix']):
-        buff_id = id_str
-        buff_name = name
         # Определяем категорию по префиксу
-        category = 'unknown'
-        for key, cat in ROGUE_BUFF_CONFIG['su']['category_map'].items():
-            if id_str.startswith(key):
-                category = cat
-                break
+        category = lookup_prefix(ROGUE_SU_CATEGORIES, id_str, 'unknown')
 
         buff_type = None
         rarity = None
-        if category in ['basic su', 'divergent su', 'divergent su: PH']:
+        if category in ROGUE_SU_TYPED_CATEGORIES:
             # Четвертая цифра определяет тип
-            fourth_digit = id_str[3]
-            buff_type = ROGUE_BUFF_CONFIG['su']['type_map'].get(fourth_digit, 'Unknown')
+            buff_type = ROGUE_BUFF_CONFIG['su']['type_map'].get(id_str[3], 'Unknown')
             # Пятая цифра определяет редкость
-            fifth_digit = id_str[4]
-            rarity = ROGUE_BUFF_CONFIG['su']['rarity_map'].get(fifth_digit)
-        rogue_buff = RogueBuffSu(buff_id=buff_id, name=buff_name, category=category, buff_type=buff_type, rarity=rarity)
-        handbook_data.rogue_buffs_su.append(rogue_buff)
+            rarity = ROGUE_BUFF_CONFIG['su']['rarity_map'].get(id_str[4])
+        handbook_data.rogue_buffs_su.append(RogueBuffSu(id_str, name, category, buff_type, rarity))
     # Баффы еды
     elif len(id_str) == ROGUE_BUFF_CONFIG['food']['id_length'] and id_str.startswith(ROGUE_BUFF_CONFIG['food']['prefix']):
-        handbook_data.rogue_buffs_food.append({'id': id_str, 'name': name})
+        handbook_data.rogue_buffs_food.append(Entry(id_str, name))
     # Различные баффы
     elif len(id_str) == ROGUE_BUFF_CONFIG['various']['id_length'] and id_str.startswith(ROGUE_BUFF_CONFIG['various']['prefix']):
-        handbook_data.rogue_buffs_various.append({'id': id_str, 'name': name})
+        handbook_data.rogue_buffs_various.append(Entry(id_str, name))
     # Баффы от сущностей
-    elif len(id_str) == ROGUE_BUFF_CONFIG['from_entities']['id_length'] and any(id_str.startswith(pref) for pref in ROGUE_BUFF_CONFIG['from_entities']['prefixes']):
-        handbook_data.rogue_buffs_from_entities.append({'id': id_str, 'name': name})
+    elif len(id_str) == ROGUE_BUFF_CONFIG['from_entities']['id_length'] and id_str.startswith(ROGUE_ENTITY_PREFIXES):
+        handbook_data.rogue_buffs_from_entities.append(Entry(id_str, name))
     else:
-        handbook_data.rogue_buffs_other.append({'id': id_str, 'name': name})
+        handbook_data.rogue_buffs_other.append(Entry(id_str, name))
 
-# === Основная функция обработки справочника ===
+def compile_section_classifier(processor):
+    # Обработчик всего блока записей раздела. Для разделов-списков записи добавляются
+    # одним extend, без вызова обработчика на каждую строку
+    if isinstance(processor, str):
+        def classify(records, handbook_data, section):
+            getattr(handbook_data, processor).extend([Entry(id_str, name) for id_str, name in records])
+    else:
+        def classify(records, handbook_data, section):
+            for id_str, name in records:
+                processor(id_str, name, handbook_data, section)
+    return classify
 
-def process_handbook(filename, server_type, program_version=None):
-    handbook_data = HandbookData()
-    file_hash = compute_file_hash(filename)
-
-    # Определяем директорию и файлы кэша
-    cache_dir = os.path.join('cache', server_type)
-    cache_data_file = os.path.join(cache_dir, 'cache.json')
-    cache_hash_file = os.path.join(cache_dir, 'hash.txt')
-    cache_version_file = os.path.join(cache_dir, 'version.txt')
-
-    # Проверка валидности кэша
-    cache_valid = False
-    if os.path.exists(cache_data_file) and os.path.exists(cache_hash_file) and os.path.exists(cache_version_file):
-        with open(cache_hash_file, 'r') as f:
-            cached_hash = f.read().strip()
-        with open(cache_version_file, 'r') as f:
-            cached_version = f.read().strip()
-        if program_version != "beta" and cached_hash == file_hash and cached_version == (program_version or ''):
-            cache_valid = True
-
-    if cache_valid:
-        with open(cache_data_file, 'r', encoding='utf-8') as f:
-            cache = json.load(f)
-        # Восстанавливаем данные справочника
-        for key, value in cache.items():
-            if isinstance(value, list) and value and isinstance(value[0], dict):
-                if key in ['relics_list', 'lightcones_list', 'materials_list', 'base_materials_list',
-                           'unknown_items_list', 'other_items_list']:
-                    setattr(handbook_data, key, [Item.from_dict(item_dict) for item_dict in value])
-                elif key == 'rogue_buffs_su':
-                    setattr(handbook_data, key, [RogueBuffSu.from_dict(buff_dict) for buff_dict in value])
-                else:
-                    setattr(handbook_data, key, value)
-            else:
-                setattr(handbook_data, key, value)
-        return handbook_data
+# Скомпилированные обработчики разделов: server_type -> section -> classify(records, handbook_data, section)
+SECTION_CLASSIFIERS = {
+    server_type: {section: compile_section_classifier(processor)
+                  for section, processor in config.get('processors', {}).items()}
+    for server_type, config in SECTION_CONFIG.items()
+}
+
+# === Потоковое чтение справочника ===
+
+class HandbookReader:
+    # Однократное чтение справочника: одни и те же байты идут и в хэш, и в разбор строк.
+    # Если байты уже прочитаны (chunks), повторного обращения к диску нет
+    # progress – HandbookProgress, в который передаётся число прочитанных байтов
+    def __init__(self, filename, chunks=None, chunk_size=65536):
+        self.filename = filename
+        self.chunks = chunks
+        self.chunk_size = chunk_size
+        self.hasher = None
+        self.progress = None
+        # Хэш файла, посчитанный без чтения через reader (scan_handbook_sections)
+        self.file_hash = None
+
+    def iter_chunks(self):
+        # Каждый новый проход начинает хэш (и счёт прочитанных байтов) заново
+        self.hasher = hashlib.sha256()
+        if self.progress is not None:
+            self.progress.restart_file()
+        if self.chunks is not None:
+            for chunk in self.chunks:
+                self.hasher.update(chunk)
+                if self.progress is not None:
+                    self.progress.add_bytes(len(chunk))
+                yield chunk
+            return
+        with open(self.filename, 'rb') as f:
+            while chunk := f.read(self.chunk_size):
+                self.hasher.update(chunk)
+                if self.progress is not None:
+                    self.progress.add_bytes(len(chunk))
+                yield chunk
 
-    # Чтение файла и подготовка строк
-    with open(filename, 'r', encoding='utf-8') as f:
-        lines = f.readlines()
+    def iter_lines(self):
+        # UTF-8 декодируется по частям, переводы строк приводятся к "\n", как в текстовом режиме
+        decoder = io.IncrementalNewlineDecoder(codecs.getincrementaldecoder('utf-8')(), translate=True)
+        pending = ''
+        for chunk in self.iter_chunks():
+            lines = (pending + decoder.decode(chunk)).split('\n')
+            pending = lines.pop()
+            yield from lines
+        tail = pending + decoder.decode(b'', final=True)
+        if tail:
+            yield from tail.split('\n')
 
-    # Обработка заголовка в зависимости от типа сервера
-    if server_type == 'LunarCore':
-        if lines[0].startswith('# Lunar Core'):
-            lines = lines[1:]
-    elif server_type == 'DanhengServer':
-        lines = lines[1:]
+    def read_hash(self, max_buffer_size=None):
+        # Только хэш файла. Небольшие файлы остаются в памяти для последующего разбора
+        keep = max_buffer_size is not None and os.path.getsize(self.filename) <= max_buffer_size
+        chunks = []
+        for chunk in self.iter_chunks():
+            if keep:
+                chunks.append(chunk)
+        if keep:
+            self.chunks = chunks
+        return self.hexdigest()
 
+    def hexdigest(self):
+        # Хэш данных, прочитанных последним полным проходом
+        if self.hasher is None:
+            return self.file_hash
+        return self.hasher.hexdigest()
+
+def iter_handbook_records(filename, server_type, reader=None, skip_header=True):
+    # Построчно читает справочник и выдаёт кортежи (section, id, name).
+    # Файл не загружается в память целиком: хранится только текущий блок байтов.
+    # skip_header=False – reader читает не начало файла, а отдельный раздел (parse_handbook_section)
     config = SECTION_CONFIG.get(server_type, {})
     skip_sections = config.get('skip_sections', [])
-    processors = config.get('processors', {})
+    reader = reader or HandbookReader(filename)
 
     current_section = None
-    i = 0
-    while i < len(lines):
-        line = lines[i].strip()
+    for line_number, raw_line in enumerate(reader.iter_lines()):
+        # Обработка заголовка в зависимости от типа сервера
+        if line_number == 0 and skip_header:
+            if server_type == 'LunarCore' and raw_line.startswith('# Lunar Core'):
+                continue
+            if server_type == 'DanhengServer':
+                continue
+
+        line = raw_line.strip()
         if not line:
-            i += 1
             continue
         # Если строка – заголовок раздела
         if line.startswith('#'):
             # Для LunarCore заголовок начинается с "# ", для DanhengServer – с "#"
             current_section = line.lstrip('#').strip()
-            i += 1
             continue
         # Пропускаем разделы, указанные в конфигурации
         if current_section in skip_sections:
-            i += 1
             continue
         # Обрабатываем строку с раздела, если она содержит ":"
         if ':' in line:
             id_part, name_part = line.split(':', 1)
-            id_str = id_part.strip()
-            name = name_part.strip()
-            # Если для текущего раздела определён обработчик, вызываем его
+            yield current_section, id_part.strip(), name_part.strip()
+
+def build_handbook_data(records, server_type):
+    # Распределяет записи (section, id, name) по спискам HandbookData
+    handbook_data = HandbookData()
+    classifiers = SECTION_CLASSIFIERS.get(server_type, {})
+    # Подряд идущие записи одного раздела обрабатываются одним блоком
+    for section, group in groupby(records, key=itemgetter(0)):
+        # Если для раздела определён обработчик, вызываем его
+        classify = classifiers.get(section)
+        if classify:
+            classify([(id_str, name) for _, id_str, name in group], handbook_data, section)
+    return handbook_data
+
+# === Разбор по разделам ===
+
+class RepeatedSectionError(Exception):
+    # Раздел встретился в файле повторно после того, как был переиспользован из прежнего кэша
+    pass
+
+def iter_handbook_sections(filename, server_type, reader=None):
+    # Группирует записи в блоки (section, [(id, name), ...]) по границам разделов "#".
+    # Разделы без обработчика пропускаются
+    processors = SECTION_CONFIG.get(server_type, {}).get('processors', {})
+
+    current_section = None
+    records = []
+    for section, id_str, name in iter_handbook_records(filename, server_type, reader):
+        if section != current_section:
+            if records:
+                yield current_section, records
+            current_section = section
+            records = []
+        if section in processors:
+            records.append((id_str, name))
+    if records:
+        yield current_section, records
+
+def section_records_hash(records):
+    return hashlib.sha1('\n'.join(map('\t'.join, records)).encode('utf-8')).hexdigest()
+
+def merge_chunk_result(handbook_data, chunk_result):
+    for key, value in chunk_result.items():
+        getattr(handbook_data, key).extend(value)
+
+def classify_sections(handbook_data, sections, server_type):
+    classifiers = SECTION_CLASSIFIERS.get(server_type, {})
+    for section, records in sections:
+        classifiers[section](records, handbook_data, section)
+
+def parse_section_job(filename, server_type, section, spans, previous_hash=None):
+    # Выполняется в процессе-обработчике: раздел читается из файла по смещениям из
+    # HandbookSectionTable и разбирается целиком. Списки передаются родительскому процессу
+    # в формате шардов кэша (marshal кортежей): распаковать их в несколько раз быстрее,
+    # чем объекты pickle. Возвращает ({список: байты} или None, хэш записей, есть ли записи);
+    # None вместо списков – хэш совпал с previous_hash и раздел берётся из прежнего кэша
+    records = read_section_records(filename, server_type, section, spans)
+    if not records:
+        return {}, None, False
+    section_hash = section_records_hash(records)
+    if section_hash == previous_hash:
+        return None, section_hash, True
+    handbook_data = HandbookData()
+    classify_sections(handbook_data, [(section, records)], server_type)
+    serializer = CACHE_SERIALIZERS['marshal']
+    outputs = SECTION_CONFIG[server_type]['section_outputs'][section]
+    return {key: serializer.dump_section(key, getattr(handbook_data, key)) for key in outputs}, section_hash, True
+
+def classify_sections_parallel(handbook_data, table, server_type, previous_hashes, section_hashes, reused,
+                               progress=None, max_workers=None):
+    # Разделы из table (без повторяющихся) разбираются в пуле процессов, каждый процесс сам
+    # читает свой раздел из файла. Крупные разделы отправляются первыми, а результаты
+    # объединяются в порядке файла, поэтому они совпадают с последовательной обработкой
+    section_outputs = SECTION_CONFIG[server_type]['section_outputs']
+    max_workers = max_workers or PARALLEL_PARSE_CONFIG['max_workers'] or os.cpu_count() or 1
+    serializer = CACHE_SERIALIZERS['marshal']
+    spans = table.spans
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {}
+        for section in sorted(spans, key=lambda section: -spans[section][0][1]):
+            previous_hash = previous_hashes.get(section) if section in section_outputs else None
+            futures[section] = executor.submit(parse_section_job, table.filename, server_type, section,
+                                               spans[section], previous_hash)
+        for section in sorted(spans, key=lambda section: spans[section][0][0]):
+            outputs, section_hash, has_records = futures[section].result()
+            if not has_records:
+                continue
+            if progress is not None:
+                progress.add_section()
+            section_hashes[section] = section_hash
+            if outputs is None:
+                reused.append(section)
+            else:
+                for key, raw in outputs.items():
+                    getattr(handbook_data, key).extend(serializer.load_section(key, raw))
+
+def build_handbook_data_parallel(filename, server_type):
+    return parse_handbook(filename, server_type, parallel=True)
+
+def use_parallel_parse(filename):
+    if PARALLEL_PARSE_CONFIG['min_file_size'] is None or (os.cpu_count() or 1) < PARALLEL_PARSE_CONFIG['min_cpu_count']:
+        return False
+    return os.path.getsize(filename) >= PARALLEL_PARSE_CONFIG['min_file_size']
+
+def balanced_sections(table):
+    # Разделы table можно разбирать параллельно: ни один не занимает больше max_section_share файла
+    sizes = [sum(length for _, length in section_spans) for section_spans in table.spans.values()]
+    return bool(sizes) and max(sizes) <= PARALLEL_PARSE_CONFIG['max_section_share'] * sum(sizes)
+
+def parse_handbook(filename, server_type, parallel=None, reader=None, previous=None):
+    # parallel=None – режим выбирается по PARALLEL_PARSE_CONFIG.
+    # previous – данные прежней версии этого справочника: разделы, хэш которых не изменился,
+    # берутся из неё без повторной классификации.
+    # После разбора reader.hexdigest() содержит хэш прочитанного файла
+    reader = reader or HandbookReader(filename)
+    automatic = parallel is None
+    if automatic:
+        parallel = use_parallel_parse(filename)
+    section_outputs = SECTION_CONFIG.get(server_type, {}).get('section_outputs', {})
+    previous_hashes = previous.section_hashes if previous is not None else {}
+
+    handbook_data = HandbookData()
+    section_hashes = {}
+    reused = []
+
+    table = None
+    if parallel and server_type in SECTION_CONFIG:
+        # Просмотр заголовков разделов и хэш файла – в этом процессе, разбор разделов – в пуле
+        table = scan_handbook_sections(filename, server_type, reader.progress)
+        if any(len(section_spans) > 1 for section_spans in table.spans.values()):
+            # Записи повторяющегося раздела объединяются в порядке файла – только последовательно
+            table = None
+        elif automatic and not balanced_sections(table):
+            table = None
+
+    def changed_sections():
+        for section, records in iter_handbook_sections(filename, server_type, reader):
+            if reader.progress is not None:
+                reader.progress.add_section()
+            if section in section_hashes:
+                # Повторяющийся раздел: хэш не сохраняется, раздел всегда разбирается заново
+                if section in reused:
+                    raise RepeatedSectionError(section)
+                section_hashes[section] = None
+            else:
+                section_hash = section_records_hash(records)
+                section_hashes[section] = section_hash
+                if section in section_outputs and previous_hashes.get(section) == section_hash:
+                    reused.append(section)
+                    continue
+            yield section, records
+
+    try:
+        if table is not None:
+            try:
+                classify_sections_parallel(handbook_data, table, server_type, previous_hashes,
+                                           section_hashes, reused, reader.progress)
+            except (OSError, BrokenProcessPool):
+                # Пул процессов недоступен (например, ограничения окружения) – обрабатываем в одном потоке
+                return parse_handbook(filename, server_type, False, reader, previous)
+            reader.file_hash = table.file_hash
+        else:
+            # Записи читаются из файла потоково, в памяти хранится не больше одного раздела
+            classify_sections(handbook_data, changed_sections(), server_type)
+
+    except RepeatedSectionError:
+        # Прежний кэш нельзя использовать частично – разбираем справочник целиком
+        return parse_handbook(filename, server_type, parallel, reader)
+
+    if reused:
+        rebuilt = None
+
+        def load_reused(key):
+            nonlocal rebuilt
+            if rebuilt is None:
+                try:
+                    return getattr(previous, key)
+                except CACHE_LOAD_ERRORS:
+                    # Шард прежней записи повреждён – справочник разбирается целиком один раз,
+                    # остальные незагруженные разделы берутся из этого же разбора
+                    rebuilt = parse_handbook(filename, server_type, False)
+            return getattr(rebuilt, key)
+
+        # Переиспользованные разделы остаются незагруженными: при записи кэша их шарды
+        # копируются из прежней записи, а в память они попадают при первом обращении
+        for section in reused:
+            for key in section_outputs[section]:
+                delattr(handbook_data, key)
+        handbook_data._section_loader = load_reused
+
+        def load_id_index():
+            # Индекс переиспользованных разделов берётся из прежней записи
+            try:
+                return HandbookIdIndex.build(handbook_data, previous.id_index)
+            except CACHE_LOAD_ERRORS:
+                return HandbookIdIndex.build(handbook_data)
+
+        handbook_data._id_index_loader = load_id_index
+
+    handbook_data._section_hashes = section_hashes
+    return handbook_data
+
+# === Разбор разделов по требованию ===
+
+class HandbookSectionTable:
+    # Результат предварительного просмотра справочника (scan_handbook_sections):
+    # spans – {раздел: [(смещение, длина), ...]} в байтах, вместе со строкой заголовка;
+    # у повторяющегося раздела несколько фрагментов. file_hash и stat_signature –
+    # хэш и метаданные просмотренного файла
+    def __init__(self, filename, spans, file_hash, stat_signature):
+        self.filename = filename
+        self.spans = spans
+        self.file_hash = file_hash
+        self.stat_signature = stat_signature
+
+# Заголовок раздела: строка, начинающаяся с "#" (допускаются пробелы перед ним). Перевод строки
+# перед заголовком входит в шаблон – так поиск идёт по литералу и в разы быстрее, чем с "^"
+SECTION_HEADER_PATTERN = re.compile(rb'\n([ \t\f\v]*#[^\n]*)')
+FIRST_LINE_HEADER_PATTERN = re.compile(rb'[ \t\f\v]*#[^\n]*')
+
+def scan_handbook_sections(filename, server_type, progress=None):
+    # Быстрый проход по байтам файла: регулярное выражение находит только строки заголовков
+    # разделов "#", записи не декодируются и не разбираются. Файл отображается в память (mmap),
+    # хэш считается по тем же байтам; в progress сообщается ход подсчёта хэша
+    processors = SECTION_CONFIG.get(server_type, {}).get('processors', {})
+    stat_signature = file_stat_signature(filename)
+    hasher = hashlib.sha256()
+    spans = {}
+
+    with open(filename, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if not size:
+            return HandbookSectionTable(filename, spans, hasher.hexdigest(), stat_signature)
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            if progress is None:
+                hasher.update(data)
+            else:
+                # Хэш по частям, чтобы между ними сообщать о ходе чтения
+                chunk_size = 4 * 1024 * 1024
+                with memoryview(data) as view:
+                    for start in range(0, size, chunk_size):
+                        # Срезы отпускаются сразу: mmap нельзя закрыть, пока на него есть ссылки
+                        with view[start:start + chunk_size] as chunk:
+                            hasher.update(chunk)
+                            progress.add_bytes(len(chunk))
+            # Первая строка – заголовок файла, если не начинается раздел (как в iter_handbook_records)
+            headers = [match.span(1) for match in SECTION_HEADER_PATTERN.finditer(data)]
+            first_line = FIRST_LINE_HEADER_PATTERN.match(data)
+            skip_first_line = server_type == 'DanhengServer' or (
+                server_type == 'LunarCore' and data[:12] == b'# Lunar Core')
+            if first_line and not skip_first_line:
+                headers.insert(0, first_line.span())
+            current_section = None
+            start = 0
+            for header_start, header_end in headers:
+                if current_section in processors:
+                    spans.setdefault(current_section, []).append((start, header_start - start))
+                current_section = data[header_start:header_end].strip().lstrip(b'#').strip().decode('utf-8', 'replace')
+                start = header_start
             if current_section in processors:
-                processors[current_section](id_str, name, handbook_data, current_section)
-        i += 1
-
-    # Кэширование результатов
-    cache = {}
-    for key, value in handbook_data.get_data().items():
-        if isinstance(value, list) and value and isinstance(value[0], (Item, RogueBuffSu)):
-            cache[key] = [obj.to_dict() for obj in value]
+                spans.setdefault(current_section, []).append((start, size - start))
+    return HandbookSectionTable(filename, spans, hasher.hexdigest(), stat_signature)
+
+def read_section_records(filename, server_type, section, spans):
+    # Записи [(id, название)] одного раздела по его фрагментам из HandbookSectionTable
+    records = []
+    with open(filename, 'rb') as f:
+        for offset, length in spans:
+            f.seek(offset)
+            reader = HandbookReader(filename, chunks=[f.read(length)])
+            records.extend((id_str, name) for record_section, id_str, name
+                           in iter_handbook_records(filename, server_type, reader, skip_header=False)
+                           if record_section == section)
+    return records
+
+def parse_handbook_section(filename, server_type, section, spans):
+    # Разбирает один раздел по его фрагментам из HandbookSectionTable.
+    # Возвращает ({список HandbookData: записи}, хэш записей раздела)
+    records = read_section_records(filename, server_type, section, spans)
+    handbook_data = HandbookData()
+    classify_sections(handbook_data, [(section, records)], server_type)
+    # Хэш повторяющегося раздела не сохраняется (как в parse_handbook)
+    section_hash = section_records_hash(records) if len(spans) == 1 else None
+    outputs = SECTION_CONFIG[server_type]['section_outputs'][section]
+    return {key: getattr(handbook_data, key) for key in outputs}, section_hash
+
+class DeferredHandbookLoader:
+    # Разбор нового справочника по разделам после scan_handbook_sections: окно программы
+    # открывается сразу, с пустыми списками handbook_data, а разделы разбираются в рабочем
+    # потоке в порядке файла. request() переносит разделы, нужные открытой вкладке, в начало
+    # очереди. poll() вызывается из потока интерфейса: готовые разделы переносятся в
+    # handbook_data на месте (вкладки держат ссылки на те же списки) и возвращаются имена
+    # обновлённых списков. Когда разобраны все разделы, данные записываются в кэш
+    def __init__(self, filename, server_type, program_version=None, table=None):
+        self.filename = filename
+        self.server_type = server_type
+        self.program_version = program_version
+        self.table = table or scan_handbook_sections(filename, server_type)
+        self.handbook_data = HandbookData()
+        self.section_by_list = {key: section
+                                for section, keys in SECTION_CONFIG[server_type]['section_outputs'].items()
+                                for key in keys}
+        self.pending = deque(self.table.spans)
+        self.ready = deque()
+        self.section_hashes = {}
+        self.lock = threading.Lock()
+        self.stopped = False
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.future = None
+
+    def start(self):
+        self.future = self.executor.submit(self.run)
+        return self
+
+    def request(self, keys):
+        # Разделы, из которых заполняются списки keys, разбираются следующими
+        with self.lock:
+            for key in reversed(list(keys)):
+                section = self.section_by_list.get(key)
+                if section in self.pending:
+                    self.pending.remove(section)
+                    self.pending.appendleft(section)
+
+    def run(self):
+        complete = HandbookData()
+        while True:
+            with self.lock:
+                if self.stopped or not self.pending:
+                    break
+                section = self.pending.popleft()
+            outputs, section_hash = parse_handbook_section(self.filename, self.server_type, section,
+                                                           self.table.spans[section])
+            merge_chunk_result(complete, outputs)
+            with self.lock:
+                self.section_hashes[section] = section_hash
+                self.ready.append(outputs)
+        if not self.stopped:
+            complete._section_hashes = dict(self.section_hashes)
+            self.write_cache(complete)
+
+    def write_cache(self, handbook_data):
+        # Файл мог измениться после просмотра – тогда смещения разделов уже неверны,
+        # и такие данные в кэш не попадают (их заменит HandbookWatcher)
+        if self.program_version == "beta" or file_stat_signature(self.filename) != self.table.stat_signature:
+            return
+        store = HandbookCacheStore(self.server_type)
+        with store.locked():
+            if not store.has_entry(store.entry_key(self.table.file_hash, self.program_version)):
+                write_handbook_cache(store, handbook_data, self.table.file_hash, self.program_version,
+                                     self.table.stat_signature)
+
+    @property
+    def done(self):
+        return self.future is not None and self.future.done() and not self.ready
+
+    def poll(self):
+        # Исключения разбора передаются вызывающему через future.result()
+        with self.lock:
+            ready, self.ready = self.ready, deque()
+        updated = []
+        for outputs in ready:
+            for key, value in outputs.items():
+                getattr(self.handbook_data, key)[:] = value
+                updated.append(key)
+        if updated:
+            # Индекс ID строится заново по обновлённым спискам
+            self.handbook_data._id_index = None
+        if self.future.done():
+            self.future.result()
+            self.handbook_data._section_hashes = dict(self.section_hashes)
+        return updated
+
+    def wait(self):
+        # Дожидается разбора всех разделов (без интерфейса, например в замерах)
+        self.future.result()
+        self.poll()
+        return self.handbook_data
+
+    def stop(self):
+        with self.lock:
+            self.stopped = True
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+def process_handbook_deferred(filename, server_type, program_version=None, progress=None):
+    # Как process_handbook, но при промахе кэша справочник не разбирается сразу целиком.
+    # Возвращает (handbook_data, loader): loader – запущенный DeferredHandbookLoader,
+    # либо None, если данные взяты из кэша.
+    # Если файл не найден в кэше по метаданным, его хэш считает scan_handbook_sections –
+    # тот же, что нужен для поиска записи по содержимому, поэтому файл читается один раз
+    if program_version == "beta":
+        table = scan_handbook_sections(filename, server_type, progress)
+    else:
+        store = HandbookCacheStore(server_type)
+        if store.has_entries() and store.key_by_stat(file_stat_signature(filename)):
+            return process_handbook(filename, server_type, program_version, progress=progress), None
+        table = scan_handbook_sections(filename, server_type, progress)
+        key = store.entry_key(table.file_hash, program_version)
+        if store.has_entry(key):
+            with store.locked():
+                found = store.has_entry(key)
+                if found:
+                    store.use_entry(key, table.stat_signature)
+            if found:
+                handbook_data = load_cached_handbook(store, key, filename, server_type, program_version)
+                if progress is not None:
+                    progress.finish_file(filename)
+                return handbook_data, None
+    loader = DeferredHandbookLoader(filename, server_type, program_version, table).start()
+    if progress is not None:
+        progress.finish_file(filename)
+    return loader.handbook_data, loader
+
+# === Кэш справочника ===
+
+# Имя шарда с индексом ID (HandbookIdIndex)
+ID_INDEX_SHARD = 'id_index'
+
+# Файл записи кэша с контрольными суммами (CRC32) её шардов
+MANIFEST_FILE = 'manifest.json'
+
+# Временный каталог, в котором собирается новая запись кэша
+STAGING_DIR = '.staging'
+
+def get_cache_root():
+    # Каталог кэша не зависит от текущего каталога: экземпляры программы,
+    # запущенные из разных мест, пользуются одним кэшем
+    if CACHE_CONFIG['cache_dir']:
+        return CACHE_CONFIG['cache_dir']
+    if getattr(sys, 'frozen', False):
+        # Программа собрана в .exe
+        base_path = os.path.dirname(sys.executable)
+    else:
+        base_path = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(base_path, 'cache')
+
+def atomic_write(path, data):
+    # Запись через временный файл в том же каталоге и os.replace:
+    # читатель видит либо прежнее содержимое файла, либо новое целиком
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+class CacheLock:
+    # Межпроцессная блокировка каталога кэша (fcntl.flock, в Windows – msvcrt.locking).
+    # Повторный захват в том же потоке не блокируется, блокировка снимается при выходе
+    # из внешнего with
+    _held = threading.local()
+
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        self.file = None
+
+    def __enter__(self):
+        held = self._held.__dict__.setdefault('paths', {})
+        if self.path in held:
+            held[self.path] += 1
+            return self
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.file = open(self.path, 'a+b')
+        try:
+            if fcntl is not None:
+                fcntl.flock(self.file.fileno(), fcntl.LOCK_EX)
+            else:
+                self.file.seek(0)
+                while True:
+                    try:
+                        msvcrt.locking(self.file.fileno(), msvcrt.LK_LOCK, 1)
+                        break
+                    except OSError as e:
+                        # LK_LOCK сдаётся через 10 секунд ожидания (EDEADLOCK) – ждём дальше.
+                        # Остальные ошибки (например, нет доступа к файлу) ожиданием не исправить
+                        if e.errno not in (errno.EDEADLOCK, errno.EACCES):
+                            raise
+        except BaseException:
+            self.file.close()
+            self.file = None
+            raise
+        held[self.path] = 1
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        held = self._held.paths
+        held[self.path] -= 1
+        if held[self.path]:
+            return
+        del held[self.path]
+        try:
+            if fcntl is not None:
+                fcntl.flock(self.file.fileno(), fcntl.LOCK_UN)
+            else:
+                self.file.seek(0)
+                msvcrt.locking(self.file.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            self.file.close()
+            self.file = None
+
+# Тип записей для разделов, отличных от простых Entry
+SECTION_RECORD_TYPES = {
+    'relics_list': Item,
+    'lightcones_list': Item,
+    'materials_list': Item,
+    'base_materials_list': Item,
+    'unknown_items_list': Item,
+    'other_items_list': Item,
+    'rogue_buffs_su': RogueBuffSu,
+}
+
+def records_to_tuples(key, records):
+    return [record.to_tuple() for record in records]
+
+def records_from_tuples(key, rows):
+    from_tuple = SECTION_RECORD_TYPES.get(key, Entry).from_tuple
+    return [from_tuple(row) for row in rows]
+
+def records_to_dicts(key, records):
+    return [record.to_dict() for record in records]
+
+def records_from_dicts(key, rows):
+    from_dict = SECTION_RECORD_TYPES.get(key, Entry).from_dict
+    return [from_dict(row) for row in rows]
+
+class TupleCacheSerializer:
+    # Базовый класс двоичных форматов: записи раздела хранятся компактными кортежами,
+    # вместе с версией формата (CACHE_FORMAT_VERSION) и именем раздела.
+    # Сериализаторы работают с байтами, чтение и запись шардов – в HandbookShardCache
+    extension = None
+
+    def dumps(self, payload):
+        raise NotImplementedError
+
+    def loads(self, raw):
+        raise NotImplementedError
+
+    def dump_section(self, key, records):
+        return self.dumps((CACHE_FORMAT_VERSION, key, records_to_tuples(key, records)))
+
+    def load_section(self, key, raw):
+        version, stored_key, rows = self.loads(raw)
+        if version != CACHE_FORMAT_VERSION or stored_key != key:
+            raise ValueError(f"Unsupported cache shard: {key}")
+        return records_from_tuples(key, rows)
+
+    def dump_id_index(self, id_index):
+        return self.dumps((CACHE_FORMAT_VERSION, ID_INDEX_SHARD, id_index.sorted_ids))
+
+    def load_id_index(self, raw):
+        version, stored_key, data = self.loads(raw)
+        if version != CACHE_FORMAT_VERSION or stored_key != ID_INDEX_SHARD:
+            raise ValueError(f"Unsupported cache shard: {ID_INDEX_SHARD}")
+        return HandbookIdIndex(data)
+
+class MarshalCacheSerializer(TupleCacheSerializer):
+    extension = '.marshal'
+
+    def dumps(self, payload):
+        return marshal.dumps(payload)
+
+    def loads(self, raw):
+        return marshal.loads(raw)
+
+class PickleCacheSerializer(TupleCacheSerializer):
+    extension = '.pickle'
+
+    def dumps(self, payload):
+        return pickle.dumps(payload, protocol=5)
+
+    def loads(self, raw):
+        return pickle.loads(raw)
+
+class JsonCacheSerializer:
+    # Читаемый формат, в первую очередь для отладки
+    extension = '.json'
+
+    def dump_section(self, key, records):
+        shard = {'format_version': CACHE_FORMAT_VERSION, 'section': key, 'records': records_to_dicts(key, records)}
+        return json.dumps(shard, ensure_ascii=False, indent=4).encode('utf-8')
+
+    def load_section(self, key, raw):
+        shard = json.loads(raw)
+        if shard.get('format_version') != CACHE_FORMAT_VERSION or shard.get('section') != key:
+            raise ValueError(f"Unsupported cache shard: {key}")
+        return records_from_dicts(key, shard['records'])
+
+    def dump_id_index(self, id_index):
+        shard = {'format_version': CACHE_FORMAT_VERSION, 'section': ID_INDEX_SHARD, 'sorted_ids': id_index.sorted_ids}
+        return json.dumps(shard, ensure_ascii=False).encode('utf-8')
+
+    def load_id_index(self, raw):
+        shard = json.loads(raw)
+        if shard.get('format_version') != CACHE_FORMAT_VERSION or shard.get('section') != ID_INDEX_SHARD:
+            raise ValueError(f"Unsupported cache shard: {ID_INDEX_SHARD}")
+        # JSON не различает списки и кортежи – восстанавливаем кортежи
+        return HandbookIdIndex({key: tuple(value) for key, value in shard['sorted_ids'].items()})
+
+CACHE_SERIALIZERS = {
+    'marshal': MarshalCacheSerializer(),
+    'pickle': PickleCacheSerializer(),
+    'json': JsonCacheSerializer(),
+}
+
+class NoCacheCodec:
+    # Шарды хранятся как есть
+    name = 'none'
+    extension = ''
+
+    def __init__(self, level=None):
+        self.level = level
+
+    def compress(self, raw):
+        return raw
+
+    def decompress(self, raw):
+        return raw
+
+class ZlibCacheCodec:
+    name = 'zlib'
+    extension = '.zz'
+
+    def __init__(self, level=None):
+        self.level = 6 if level is None else level
+
+    def compress(self, raw):
+        return zlib.compress(raw, self.level)
+
+    def decompress(self, raw):
+        return zlib.decompress(raw)
+
+class LzmaCacheCodec:
+    # Сжимает сильнее zlib, но заметно медленнее при записи
+    name = 'lzma'
+    extension = '.xz'
+
+    def __init__(self, level=None):
+        self.level = 6 if level is None else level
+
+    def compress(self, raw):
+        return lzma.compress(raw, preset=self.level)
+
+    def decompress(self, raw):
+        return lzma.decompress(raw)
+
+# Уровень нужен только при записи: запись кэша читается кодеком, имя которого сохранено в индексе
+CACHE_CODECS = {
+    'none': NoCacheCodec,
+    'zlib': ZlibCacheCodec,
+    'lzma': LzmaCacheCodec,
+}
+
+# Ошибки, при которых файл кэша считается повреждённым и справочник обрабатывается заново
+CACHE_LOAD_ERRORS = (OSError, ValueError, EOFError, TypeError, KeyError, AttributeError, pickle.UnpicklingError,
+                     zlib.error, lzma.LZMAError)
+
+def get_cache_serializer(name=None):
+    return CACHE_SERIALIZERS[name or CACHE_CONFIG['format']]
+
+def get_cache_codec(name=None, level=None):
+    if name is None:
+        name, level = CACHE_CONFIG['compression'], CACHE_CONFIG['compression_level']
+    return CACHE_CODECS[name](level)
+
+# Формат кэша в базе SQLite (handbook_sqlite.py)
+SQLITE_CACHE_FORMAT = 'sqlite'
+CACHE_FORMATS = tuple(CACHE_SERIALIZERS) + (SQLITE_CACHE_FORMAT,)
+
+def create_shard_cache(cache_dir, format_name=None, codec=None):
+    # Хранилище разделов одной записи кэша в заданном формате
+    format_name = format_name or CACHE_CONFIG['format']
+    if format_name == SQLITE_CACHE_FORMAT:
+        # Модуль подключается только при выборе этого формата
+        from handbook_sqlite import SqliteHandbookCache
+        return SqliteHandbookCache(cache_dir)
+    return HandbookShardCache(cache_dir, CACHE_SERIALIZERS[format_name], codec)
+
+class HandbookShardCache:
+    # Кэш справочника, разбитый на отдельные файлы (шарды) – по одному на раздел HandbookData.
+    # manifest.json хранит CRC32 каждого шарда и записывается последним: шард, не совпадающий
+    # с манифестом (недописанный или изменённый), считается повреждённым.
+    # codec – сжатие шардов; контрольная сумма считается по сжатым данным
+    def __init__(self, cache_dir, serializer, codec=None):
+        self.cache_dir = cache_dir
+        self.shard_dir = os.path.join(cache_dir, 'shards')
+        self.serializer = serializer
+        self.codec = codec or NoCacheCodec()
+        self._checksums = None
+
+    def shard_path(self, key):
+        return os.path.join(self.shard_dir, key + self.serializer.extension + self.codec.extension)
+
+    def manifest_path(self):
+        return os.path.join(self.cache_dir, MANIFEST_FILE)
+
+    def exists(self):
+        return os.path.isfile(self.manifest_path())
+
+    @property
+    def checksums(self):
+        if self._checksums is None:
+            with open(self.manifest_path(), 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            if manifest.get('format_version') != CACHE_FORMAT_VERSION:
+                raise ValueError(f"Unsupported cache manifest: {self.cache_dir}")
+            self._checksums = manifest['checksums']
+        return self._checksums
+
+    def read_shard(self, key):
+        with open(self.shard_path(key), 'rb') as f:
+            raw = f.read()
+        if zlib.crc32(raw) != self.checksums[key]:
+            raise ValueError(f"Cache shard checksum mismatch: {self.shard_path(key)}")
+        return raw
+
+    def is_compatible(self, other):
+        # Шарды other можно копировать без перекодирования
+        return getattr(other, 'serializer', None) is self.serializer and self.codec.name == other.codec.name
+
+    def write(self, handbook_data, reuse_from=None):
+        # reuse_from – шарды прежней записи: незагруженные разделы копируются из неё без десериализации
+        os.makedirs(self.shard_dir, exist_ok=True)
+        checksums = {}
+        for key in HANDBOOK_SECTIONS:
+            raw = None
+            if reuse_from is not None and self.is_compatible(reuse_from) and not handbook_data.is_loaded(key):
+                try:
+                    raw = reuse_from.read_shard(key)
+                except CACHE_LOAD_ERRORS:
+                    # Шард прежней записи повреждён – раздел загружается и сохраняется заново
+                    pass
+            if raw is None:
+                raw = self.codec.compress(self.serializer.dump_section(key, getattr(handbook_data, key)))
+            checksums[key] = self.write_shard(key, raw)
+        raw = self.codec.compress(self.serializer.dump_id_index(handbook_data.id_index))
+        checksums[ID_INDEX_SHARD] = self.write_shard(ID_INDEX_SHARD, raw)
+        atomic_write(self.manifest_path(), json.dumps({'format_version': CACHE_FORMAT_VERSION,
+                                                       'checksums': checksums}).encode('utf-8'))
+        self._checksums = checksums
+
+    def write_shard(self, key, raw):
+        with open(self.shard_path(key), 'wb') as f:
+            f.write(raw)
+        return zlib.crc32(raw)
+
+    def load_section(self, key):
+        return self.serializer.load_section(key, self.codec.decompress(self.read_shard(key)))
+
+    def load_id_index(self):
+        return self.serializer.load_id_index(self.codec.decompress(self.read_shard(ID_INDEX_SHARD)))
+
+def export_handbook_json(handbook_data, path):
+    # Отладочная выгрузка данных справочника в один читаемый JSON
+    sections = {key: records_to_dicts(key, value) for key, value in handbook_data.get_data().items()}
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'format_version': CACHE_FORMAT_VERSION, 'sections': sections}, f, ensure_ascii=False, indent=4)
+
+class HandbookCacheStore:
+    # Хранилище кэша одного типа сервера. Каждая запись лежит в entries/<key>, где key
+    # вычисляется из хэша справочника и версии программы, поэтому несколько справочников
+    # (например, разных версий игры) кэшируются одновременно.
+    # index.json хранит:
+    #   entries – метаданные записей (хэш, версия, формат, размер, время последнего использования);
+    #   files   – (size, mtime_ns, inode) каждого известного файла и ключ его записи.
+    # Несколько экземпляров программы могут работать с одним хранилищем: все изменения
+    # выполняются под блокировкой (locked), файлы заменяются атомарно
+    def __init__(self, server_type):
+        self.cache_dir = os.path.join(get_cache_root(), server_type)
+        self.entries_dir = os.path.join(self.cache_dir, 'entries')
+        self.index_file = os.path.join(self.cache_dir, 'index.json')
+        self.lock_file = os.path.join(self.cache_dir, 'cache.lock')
+        self.index = self.load_index()
+
+    def load_index(self):
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+            if isinstance(index.get('entries'), dict) and isinstance(index.get('files'), dict):
+                return index
+        except (OSError, ValueError, AttributeError):
+            pass
+        return {'entries': {}, 'files': {}}
+
+    def save_index(self):
+        atomic_write(self.index_file, json.dumps(self.index, ensure_ascii=False, indent=4).encode('utf-8'))
+
+    @contextmanager
+    def locked(self):
+        # Индекс перечитывается под блокировкой, изменяется и сохраняется при выходе,
+        # поэтому изменения, сделанные другим экземпляром программы, не теряются
+        with CacheLock(self.lock_file):
+            self.index = self.load_index()
+            yield self
+            self.save_index()
+
+    @staticmethod
+    def entry_key(file_hash, program_version):
+        return hashlib.sha256(f"{file_hash}\0{program_version or ''}".encode('utf-8')).hexdigest()[:40]
+
+    def entry_dir(self, key):
+        return os.path.join(self.entries_dir, key)
+
+    def has_entries(self):
+        return bool(self.index['entries'])
+
+    def has_entry(self, key):
+        entry = self.index['entries'].get(key)
+        return (entry is not None and entry.get('format') in CACHE_FORMATS
+                and entry.get('compression', 'none') in CACHE_CODECS
+                and os.path.isfile(os.path.join(self.entry_dir(key), MANIFEST_FILE)))
+
+    def entry_shards(self, key):
+        # Шарды читаются тем форматом и тем сжатием, с которыми запись была создана
+        entry = self.index['entries'][key]
+        codec = get_cache_codec(entry.get('compression', 'none'))
+        return create_shard_cache(self.entry_dir(key), entry['format'], codec)
+
+    def key_by_stat(self, stat_signature):
+        known = self.index['files'].get(stat_signature['path'])
+        if known and known.get('stat') == stat_signature and self.has_entry(known.get('key')):
+            return known['key']
+        return None
+
+    def entry_hash(self, path):
+        # Хэш справочника, с которым файл был сопоставлен последний раз
+        known = self.index['files'].get(os.path.abspath(path))
+        entry = known and self.index['entries'].get(known.get('key'))
+        return entry['hash'] if entry else None
+
+    def remember_file(self, stat_signature, key):
+        self.index['files'][stat_signature['path']] = {'stat': stat_signature, 'key': key}
+
+    def forget_file(self, path):
+        # Следующая проверка файла будет выполнена по полному хэшу
+        with self.locked():
+            self.index['files'].pop(os.path.abspath(path), None)
+
+    def base_key(self, path, program_version):
+        # Запись, из которой можно переиспользовать неизменившиеся разделы: прежняя запись
+        # этого же файла, иначе самая свежая запись той же версии программы
+        entries = self.index['entries']
+        candidates = [key for key, entry in entries.items()
+                      if entry.get('program_version') == (program_version or '') and entry.get('section_hashes')
+                      and self.has_entry(key)]
+        if not candidates:
+            return None
+        known = self.index['files'].get(os.path.abspath(path))
+        if known and known.get('key') in candidates:
+            return known['key']
+        return max(candidates, key=lambda key: entries[key].get('last_used', 0))
+
+    def load_entry(self, key, section_loader=None):
+        # Данные записи с ленивой загрузкой разделов из шардов
+        shards = self.entry_shards(key)
+        handbook_data = HandbookData.from_loader(section_loader or shards.load_section)
+        handbook_data._section_hashes = self.index['entries'][key].get('section_hashes') or {}
+
+        def load_id_index():
+            try:
+                return shards.load_id_index()
+            except CACHE_LOAD_ERRORS:
+                # Индекса нет или он повреждён – строим заново по разделам
+                return HandbookIdIndex.build(handbook_data)
+
+        handbook_data._id_index_loader = load_id_index
+        # Записи в формате sqlite ищутся по индексу FTS5 (HandbookData.search)
+        handbook_data._search_backend = shards if hasattr(shards, 'search') else None
+        return handbook_data
+
+    def touch(self, key):
+        # Запись могла быть удалена другим экземпляром программы после проверки has_entry
+        entry = self.index['entries'].get(key)
+        if entry is not None:
+            entry['last_used'] = time.time()
+        return entry is not None
+
+    def use_entry(self, key, stat_signature):
+        # Отмечает использование записи и сопоставляет с ней файл (под блокировкой)
+        if self.touch(key):
+            self.remember_file(stat_signature, key)
+
+    def write_entry(self, key, handbook_data, file_hash, program_version, reuse_key=None):
+        # Вызывается под блокировкой. Запись собирается во временном каталоге и затем
+        # заменяет прежнюю целиком: после сбоя на диске не остаётся недописанной записи
+        if reuse_key == key:
+            reuse_key = None
+        staging_dir = os.path.join(self.entries_dir, STAGING_DIR)
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        shards = create_shard_cache(staging_dir, codec=get_cache_codec())
+        shards.write(handbook_data, self.entry_shards(reuse_key) if reuse_key else None)
+        if CACHE_CONFIG['debug_json_export']:
+            export_handbook_json(handbook_data, os.path.join(staging_dir, 'cache.json'))
+        entry_dir = self.entry_dir(key)
+        shutil.rmtree(entry_dir, ignore_errors=True)
+        os.replace(staging_dir, entry_dir)
+        self.index['entries'][key] = {
+            'hash': file_hash,
+            'program_version': program_version or '',
+            'format': CACHE_CONFIG['format'],
+            'compression': shards.codec.name,
+            'size': directory_size(entry_dir),
+            'last_used': time.time(),
+            'section_hashes': handbook_data.section_hashes
+        }
+        # Прежняя запись не удаляется: из неё ещё могут загружаться переиспользованные разделы
+        self.evict(keep=(key, reuse_key))
+
+    def evict(self, keep=()):
+        # LRU: удаляем самые давно использованные записи, пока не уложимся в ограничения
+        entries = self.index['entries']
+        by_age = sorted((key for key in entries if key not in keep), key=lambda key: entries[key].get('last_used', 0))
+        total_size = sum(entry.get('size', 0) for entry in entries.values())
+        while by_age and (len(entries) > CACHE_CONFIG['max_entries'] or total_size > CACHE_CONFIG['max_size']):
+            key = by_age.pop(0)
+            total_size -= entries.pop(key).get('size', 0)
+            shutil.rmtree(self.entry_dir(key), ignore_errors=True)
+        # Файлы, ссылающиеся на удалённые записи, больше не нужны
+        self.index['files'] = {path: known for path, known in self.index['files'].items() if known.get('key') in entries}
+
+def directory_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            total += os.path.getsize(os.path.join(root, name))
+    return total
+
+# === Основная функция обработки справочника ===
+
+def find_cache_entry(store, reader, stat_signature, program_version):
+    # Поиск записи в кэше: сначала по метаданным файла, затем по полному хэшу.
+    # Возвращает (key, validated_by_stat) либо (None, False)
+    if not store.has_entries():
+        return None, False
+    key = store.key_by_stat(stat_signature)
+    if key:
+        return key, True
+    if reader.hasher is None:
+        # Байты, прочитанные для хэша, остаются в reader и при промахе разбираются без повторного чтения
+        reader.read_hash(CACHE_CONFIG['max_hash_buffer_size'])
+    key = store.entry_key(reader.hexdigest(), program_version)
+    return (key if store.has_entry(key) else None), False
+
+def process_handbook(filename, server_type, program_version=None, parallel=None, reader=None, progress=None):
+    # reader – HandbookReader, которым файл уже прочитан для хэша (см. find_cache_entry).
+    # progress – HandbookProgress, в который сообщается ход разбора
+    store = HandbookCacheStore(server_type)
+    stat_signature = file_stat_signature(filename)
+    reader = reader or HandbookReader(filename)
+
+    key = None
+    validated_by_stat = False
+    if program_version != "beta":
+        key, validated_by_stat = find_cache_entry(store, reader, stat_signature, program_version)
+
+    with store.locked():
+        if not key and program_version != "beta":
+            # Пока ожидали блокировку, этот справочник мог обработать другой экземпляр программы
+            key, validated_by_stat = find_cache_entry(store, reader, stat_signature, program_version)
+        if key:
+            store.use_entry(key, stat_signature)
         else:
-            cache[key] = value
+            # Неизменившиеся разделы берутся из прежней записи кэша, остальные разбираются заново.
+            # Разбор выполняется под блокировкой, чтобы другой экземпляр дождался готовой записи
+            previous = None
+            base_key = store.base_key(filename, program_version) if program_version != "beta" else None
+            if base_key:
+                previous = store.load_entry(base_key)
 
-    os.makedirs(cache_dir, exist_ok=True)
-    with open(cache_data_file, 'w', encoding='utf-8') as f:
-        json.dump(cache, f, ensure_ascii=False, indent=4)
-    with open(cache_hash_file, 'w') as f:
-        f.write(file_hash)
-    with open(cache_version_file, 'w') as f:
-        f.write(program_version or '')
+            # Хэш считается в том же проходе по файлу, что и разбор строк
+            reader.progress = progress
+            handbook_data = parse_handbook(filename, server_type, parallel, reader, previous)
+            write_handbook_cache(store, handbook_data, reader.hexdigest(), program_version, stat_signature, base_key)
+            if progress is not None:
+                progress.finish_file(filename)
+            return handbook_data
 
+    handbook_data = load_cached_handbook(store, key, filename, server_type, program_version, parallel)
+    handbook_data._validated_by_stat = validated_by_stat
+    if progress is not None:
+        progress.finish_file(filename)
     return handbook_data
+
+def load_cached_handbook(store, key, filename, server_type, program_version=None, parallel=None):
+    # HandbookData записи кэша key. Разделы загружаются из шардов по мере обращения к ним
+    shards = store.entry_shards(key)
+    rebuilt = None
+
+    def load_section(section_key):
+        nonlocal rebuilt
+        if rebuilt is None:
+            try:
+                return shards.load_section(section_key)
+            except CACHE_LOAD_ERRORS:
+                # Шард повреждён или записан другой версией формата – обрабатываем файл заново
+                rebuild_reader = HandbookReader(filename)
+                rebuilt = parse_handbook(filename, server_type, parallel, rebuild_reader)
+                rebuild_store = HandbookCacheStore(server_type)
+                with rebuild_store.locked():
+                    write_handbook_cache(rebuild_store, rebuilt, rebuild_reader.hexdigest(),
+                                         program_version, file_stat_signature(filename))
+        return getattr(rebuilt, section_key)
+
+    return store.load_entry(key, load_section)
+
+def write_handbook_cache(store, handbook_data, file_hash, program_version, stat_signature, reuse_key=None):
+    # Вызывается под блокировкой store.locked(), индекс сохраняется при её снятии
+    key = store.entry_key(file_hash, program_version)
+    store.write_entry(key, handbook_data, file_hash, program_version, reuse_key)
+    store.remember_file(stat_signature, key)
+
+# === Несколько языковых версий справочника ===
+
+def merge_handbook_languages(primary, variants):
+    # Названия записей из других языковых версий добавляются к записям primary как aliases.
+    # Записи сопоставляются по ID внутри каждого раздела слиянием отсортированных
+    # списков индекса – один проход на раздел
+    primary_index = primary.id_index
+    for variant in variants:
+        variant_index = variant.id_index
+        for key in HANDBOOK_SECTIONS:
+            primary_sorted = primary_index.sorted_ids[key]
+            variant_sorted = variant_index.sorted_ids[key]
+            if not primary_sorted[0] or not variant_sorted[0]:
+                continue
+            records = getattr(primary, key)
+            variant_records = getattr(variant, key)
+            for position, variant_position in join_sorted_ids(primary_sorted, variant_sorted):
+                record = records[position]
+                name = record_name(variant_records[variant_position])
+                if name != record_name(record) and name not in record.aliases:
+                    record.aliases += (name,)
+    return primary
+
+def process_handbooks(filenames, server_type, program_version=None, parallel=None, progress=None):
+    # Несколько языковых версий одного справочника: первая – основная (её названия
+    # отображаются), названия из остальных становятся aliases и участвуют в поиске.
+    # Объединённый результат кэшируется отдельной записью с ключом по хэшам всех файлов
+    if len(filenames) == 1:
+        return process_handbook(filenames[0], server_type, program_version, parallel, progress=progress)
+
+    parts = [process_handbook(filename, server_type, program_version, parallel, progress=progress)
+             for filename in filenames]
+    validated_by_stat = all(part.validated_by_stat for part in parts)
+    if program_version == "beta":
+        return merge_handbook_languages(parts[0], parts[1:])
+
+    # После process_handbook хэш каждого файла уже есть в индексе кэша
+    store = HandbookCacheStore(server_type)
+    file_hashes = [store.entry_hash(filename) for filename in filenames]
+    merged_hash = hashlib.sha256('\0'.join(['merged'] + file_hashes).encode('utf-8')).hexdigest()
+    key = store.entry_key(merged_hash, program_version)
+
+    if store.has_entry(key):
+        with store.locked():
+            store.touch(key)
+        shards = store.entry_shards(key)
+        rebuilt = None
+
+        def load_section(section_key):
+            nonlocal rebuilt
+            if rebuilt is None:
+                try:
+                    return shards.load_section(section_key)
+                except CACHE_LOAD_ERRORS:
+                    # Шард повреждён – объединяем языковые версии заново
+                    rebuilt = merge_handbook_languages(parts[0], parts[1:])
+            return getattr(rebuilt, section_key)
+
+        handbook_data = store.load_entry(key, load_section)
+    else:
+        handbook_data = merge_handbook_languages(parts[0], parts[1:])
+        # У объединённой записи нет хэшей разделов: её шарды содержат aliases,
+        # поэтому для переиспользования при разборе одного файла она не подходит
+        handbook_data._section_hashes = {}
+        with store.locked():
+            # Другой экземпляр программы мог записать это объединение, пока мы его строили
+            if not store.has_entry(key):
+                store.write_entry(key, handbook_data, merged_hash, program_version)
+
+    handbook_data._validated_by_stat = validated_by_stat
+    return handbook_data
+
+# === Асинхронная обработка ===
+
+class HandbookProgress:
+    # Ход обработки справочников: callback(bytes_done, total_bytes, sections_done) вызывается
+    # не чаще одного раза за interval секунд. Если файл разбирается повторно (например, после
+    # сбоя пула процессов), его байты и разделы считаются заново. Файл, взятый из кэша,
+    # засчитывается целиком
+    def __init__(self, callback, filenames, interval=0.1):
+        self.callback = callback
+        self.sizes = {filename: os.path.getsize(filename) for filename in filenames}
+        self.total_bytes = sum(self.sizes.values())
+        self.interval = interval
+        self.finished_bytes = 0
+        self.finished_sections = 0
+        self.file_bytes = 0
+        self.file_sections = 0
+        self.last_report = 0
+
+    def restart_file(self):
+        self.file_bytes = 0
+        self.file_sections = 0
+
+    def add_bytes(self, count):
+        self.file_bytes += count
+        self.report()
+
+    def add_section(self):
+        self.file_sections += 1
+        self.report()
+
+    def finish_file(self, filename):
+        self.finished_bytes += self.sizes.get(filename, 0)
+        self.finished_sections += self.file_sections
+        self.restart_file()
+        self.report(force=True)
+
+    def report(self, force=False):
+        now = time.monotonic()
+        if force or now - self.last_report >= self.interval:
+            self.last_report = now
+            bytes_done = min(self.finished_bytes + self.file_bytes, self.total_bytes)
+            self.callback(bytes_done, self.total_bytes, self.finished_sections + self.file_sections)
+
+def process_handbooks_async(filenames, server_type, on_progress, on_done, program_version=None, deferred=False):
+    # Обработка справочников в рабочем потоке. on_progress(bytes_done, total_bytes, sections_done)
+    # и on_done(future) вызываются из рабочего потока – интерфейс сам передаёт их в свой поток
+    # (root.after). future.result() возвращает (handbook_data, loader) или исключение обработки.
+    # loader – DeferredHandbookLoader, если deferred=True и единственный справочник ещё не в кэше:
+    # тогда разделы дозаполняются после on_done. Иначе loader равен None, а все разделы уже загружены
+    future = Future()
+
+    def run():
+        progress = HandbookProgress(on_progress, filenames)
+        if deferred and len(filenames) == 1:
+            handbook_data, loader = process_handbook_deferred(filenames[0], server_type, program_version, progress)
+            if loader is not None:
+                return handbook_data, loader
+        else:
+            handbook_data = process_handbooks(filenames, server_type, program_version, progress=progress)
+        # Разделы из кэша тоже загружаются здесь, чтобы поток интерфейса не обращался к диску
+        return handbook_data.load_all(), None
+
+    def worker():
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(run())
+        except BaseException as e:
+            future.set_exception(e)
+
+    future.add_done_callback(on_done)
+    # Поток-демон не задерживает выход из программы во время разбора
+    threading.Thread(target=worker, daemon=True).start()
+    return future
+
+def process_handbook_async(path, server_type, on_progress, on_done, program_version=None, deferred=False):
+    return process_handbooks_async([path], server_type, on_progress, on_done, program_version, deferred)
+
+# === Отслеживание изменений справочника ===
+
+class HandbookWatcher:
+    # Следит за файлами справочника по метаданным (размер, mtime, inode) и при изменении
+    # разбирает их заново в рабочем потоке. poll() периодически вызывается из потока
+    # интерфейса и возвращает новые, полностью загруженные HandbookData, когда разбор завершён.
+    # Файл разбирается, только когда его метаданные не менялись между двумя опросами –
+    # сервер может ещё дописывать справочник
+    def __init__(self, filenames, server_type, program_version=None):
+        self.filenames = list(filenames)
+        self.server_type = server_type
+        self.program_version = program_version
+        self.signatures = self.read_signatures()
+        self.candidate = None
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.future = None
+
+    def read_signatures(self):
+        signatures = []
+        for filename in self.filenames:
+            try:
+                signatures.append(file_stat_signature(filename))
+            except OSError:
+                signatures.append(None)
+        return signatures
+
+    def request_reload(self):
+        # Разобрать справочник заново при следующем опросе, даже если метаданные не изменились
+        self.signatures = None
+        self.candidate = None
+
+    def reload(self):
+        handbook_data = process_handbooks(self.filenames, self.server_type, self.program_version)
+        return handbook_data.load_all()
+
+    def poll(self):
+        # Исключения разбора передаются вызывающему через future.result()
+        if self.future is not None:
+            if not self.future.done():
+                return None
+            future, self.future = self.future, None
+            return future.result()
+
+        signatures = self.read_signatures()
+        if None in signatures or signatures == self.signatures:
+            self.candidate = None
+            return None
+        if signatures != self.candidate:
+            self.candidate = signatures
+            return None
+        self.signatures = signatures
+        self.candidate = None
+        self.future = self.executor.submit(self.reload)
+        return None
+
+    def stop(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+def verify_handbook_cache(filename, server_type):
+    # Полная проверка кэша по хэшу. При расхождении метаданные файла забываются,
+    # чтобы следующий запуск пересчитал хэш и обработал справочник заново
+    store = HandbookCacheStore(server_type)
+    if compute_file_hash(filename) == store.entry_hash(filename):
+        return True
+    store.forget_file(filename)
+    return False
+
+def start_cache_verification(filename, server_type, on_mismatch):
+    # Фоновая перепроверка кэша, принятого по метаданным файла.
+    # on_mismatch вызывается из фонового потока: обращаться из него к Tk нельзя
+    def worker():
+        try:
+            valid = verify_handbook_cache(filename, server_type)
+        except OSError:
+            return
+        if not valid:
+            on_mismatch()
+
+    thread = threading.Thread(target=worker, daemon=True)
+    thread.start()
+    return thread
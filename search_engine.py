@@ -0,0 +1,405 @@
+# search_engine.py
+# Поиск подстроки в списках записей справочника (Entry, Item, RogueBuffSu) по инвертированному
+# индексу триграмм: для каждой триграммы хранятся позиции записей, в тексте которых она есть.
+# Запрос из трёх и более символов сводится к пересечению списков позиций его триграмм
+# и проверке оставшихся кандидатов; запросы короче трёх символов проверяются перебором.
+# Индексы лежат в реестре по спискам, которые показывают вкладки. Они строятся в фоновом потоке
+# после загрузки справочника (start_search_index_build) либо при первом поиске по списку.
+# Пока пользователь набирает запрос, каждый следующий запрос содержит предыдущий, и его
+# совпадения выбираются из совпадений предыдущего (SearchIndex.narrow_search); при стирании
+# символов результат берётся из стека прежних запросов.
+# Нечёткий режим (SEARCH_CONFIG['fuzzy'], включается в настройках) возвращает не все совпадения,
+# а лучшие fuzzy_limit записей: сначала точные совпадения, затем названия, близкие к запросу
+# по общим триграммам и расстоянию редактирования слов (опечатки вроде "kafak" вместо "kafka").
+# Фильтры вкладок (тип, редкость, категория) передаются как predicate и применяются до отбора
+# лучших записей, иначе отфильтрованные записи занимали бы места в fuzzy_limit
+
+import heapq
+import threading
+from array import array
+from bisect import bisect_right
+from collections import Counter, OrderedDict, defaultdict
+from itertools import accumulate, islice
+
+SEARCH_CONFIG = {
+    # Сколько индексов держать в реестре (по одному на список записей). При превышении
+    # удаляются давно не использованные, например списки прежнего справочника
+    'max_indexes': 64,
+    # Пересечение списков позиций прекращается, когда кандидатов остаётся не больше этого числа:
+    # проверить их подстрокой быстрее, чем пересекать дальше
+    'verify_threshold': 256,
+    # Сколько прежних запросов (с их совпадениями) хранится для каждого списка
+    'history_size': 8,
+    # Нечёткий поиск с ранжированием вместо точного поиска подстроки во всех полях поиска
+    'fuzzy': False,
+    # Сколько лучших записей возвращает нечёткий поиск
+    'fuzzy_limit': 100,
+    # Сколько названий с наибольшим числом общих с запросом триграмм сравнивается по словам
+    'fuzzy_pool': 64,
+    # Названия с оценкой ниже этой (от 0 до 1) в результат не попадают
+    'fuzzy_min_score': 0.5,
+    # Сколько позиций из списков триграмм запроса подсчитывается при отборе кандидатов. Самые
+    # частые триграммы ("sta", "ion") почти ничего не отсекают, поэтому берутся самые редкие
+    'fuzzy_max_postings': 30000,
+}
+
+NGRAM_SIZE = 3
+# Разделитель ID в общей строке ID списка: в ID и в запросе из поля ввода его не бывает
+ID_SEPARATOR = '\n'
+
+def text_ngrams(text):
+    return {text[i:i + NGRAM_SIZE] for i in range(len(text) - NGRAM_SIZE + 1)}
+
+def key_ngrams(key):
+    # Триграммы search_key и, как в pg_trgm, триграммы начала и конца каждой строки с пробелом
+    # (" li", "ht "): у короткого слова с опечаткой в середине ("lipht") общими с исходным
+    # словом остаются только они
+    ngrams = text_ngrams(' ' + key + ' ')
+    if '\n' in key:
+        for line in key.split('\n'):
+            ngrams |= text_ngrams(' ' + line[:2])
+            ngrams |= text_ngrams(line[-2:] + ' ')
+    return ngrams
+
+def edit_distance(first, second, max_distance):
+    # Расстояние Дамерау – Левенштейна (перестановка соседних букв – одна правка, как в "kafak").
+    # Если оно больше max_distance, возвращает max_distance + 1, не досчитывая
+    if abs(len(first) - len(second)) > max_distance:
+        return max_distance + 1
+    before_previous = None
+    previous = list(range(len(second) + 1))
+    for i, first_char in enumerate(first, 1):
+        current = [i]
+        for j, second_char in enumerate(second, 1):
+            distance = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (first_char != second_char))
+            if (i > 1 and j > 1 and first_char == second[j - 2] and first[i - 2] == second_char
+                    and before_previous[j - 2] + 1 < distance):
+                distance = before_previous[j - 2] + 1
+            current.append(distance)
+        if min(current) > max_distance:
+            return max_distance + 1
+        before_previous, previous = previous, current
+    return previous[-1]
+
+def word_similarity(first, second):
+    # 1 для одинаковых слов, 0 – если отличается больше половины букв
+    length = max(len(first), len(second))
+    max_distance = length // 2
+    distance = edit_distance(first, second, max_distance)
+    return 0.0 if distance > max_distance else 1 - distance / length
+
+def words_ngrams(words):
+    return {ngram for word in words for ngram in text_ngrams(' ' + word + ' ')}
+
+def fuzzy_score(tokens, query_ngrams, key, similarities):
+    # Оценка названия key (от 0 до 1) для запроса из слов tokens – лучшая из оценок названия
+    # и его переводов (строк search_key)
+    return max(name_score(tokens, query_ngrams, name, similarities) for name in key.split('\n'))
+
+def name_score(tokens, query_ngrams, name, similarities):
+    # Две трети оценки – сходство слов: для каждого слова запроса берётся самое похожее слово
+    # названия (входящее в название целиком – 1). Треть – коэффициент Дайса по триграммам слов
+    # запроса и названия: лишние слова в названии его снижают, поэтому из названий с одинаковым
+    # сходством слов выше короткие. similarities – общий для одного запроса кэш сходства пар слов
+    words = name.split()
+    total = 0
+    for token in tokens:
+        if token in name:
+            total += 1
+            continue
+        best = 0
+        for word in words:
+            similarity = similarities.get((token, word))
+            if similarity is None:
+                similarity = similarities[token, word] = word_similarity(token, word)
+            if similarity > best:
+                best = similarity
+        total += best
+    name_ngrams = words_ngrams(words)
+    dice = 2 * len(query_ngrams & name_ngrams) / (len(query_ngrams) + len(name_ngrams))
+    return (2 * total / len(tokens) + dice) / 3
+
+class SearchIndex:
+    # Индекс одного списка записей. Триграммы строятся по различным search_key (название
+    # с переводами в нижнем регистре): одинаковые названия у разных записей встречаются часто,
+    # и списки позиций хранят номера названий, а не записей. ID уникальны и состоят из цифр –
+    # индекс триграмм по ним был бы размером со сам список, поэтому ID собраны в одну строку,
+    # по которой ищет str.find
+    def __init__(self, records):
+        # Признаки содержимого запоминаются до чтения списка: если его заменят во время
+        # построения (в другом потоке), matches() это обнаружит
+        self.records = records
+        self.size = len(records)
+        self.first = records[0] if records else None
+        self.last = records[-1] if records else None
+
+        search_keys = [record.search_key for record in records]
+        self.keys = list(dict.fromkeys(search_keys))
+        if len(self.keys) == len(search_keys):
+            # Все названия различны – номер названия совпадает с позицией записи
+            self.key_positions = None
+            self.position_keys = None
+        else:
+            key_numbers = {key: number for number, key in enumerate(self.keys)}
+            # Номер названия каждой записи и позиции записей каждого названия
+            self.position_keys = array('I', map(key_numbers.__getitem__, search_keys))
+            key_positions = [[] for _ in self.keys]
+            for position, number in enumerate(self.position_keys):
+                key_positions[number].append(position)
+            self.key_positions = key_positions
+
+        postings = defaultdict(list)
+        for number, key in enumerate(self.keys):
+            for ngram in key_ngrams(key):
+                postings[ngram].append(number)
+        self.postings = {ngram: array('I', posting) for ngram, posting in postings.items()}
+
+        ids = [record.id for record in records]
+        self.ids = ID_SEPARATOR.join(ids)
+        # Смещение ID каждой записи в self.ids (и конец строки последним элементом)
+        self.id_offsets = array('I', accumulate((len(entry_id) + 1 for entry_id in ids), initial=0))
+
+        # Стеки прежних запросов [(text, позиции совпадений)] для поиска с ID и без: каждый
+        # запрос в стеке содержит запрос под ним (например, "k", "ka", "kaf")
+        self.history = {True: [], False: []}
+
+    def matches(self, records):
+        # Индекс построен по текущему содержимому records. Списки справочника заменяются
+        # только целиком, поэтому достаточно сравнить длину и крайние записи
+        return (records is self.records and len(records) == self.size
+                and (not records or (records[0] is self.first and records[-1] is self.last)))
+
+    def key_candidates(self, text):
+        # Номера названий, которые могут содержать text
+        if len(text) < NGRAM_SIZE:
+            return range(len(self.keys))
+        # Начинаем с самого короткого списка позиций
+        postings = sorted((self.postings.get(ngram, ()) for ngram in text_ngrams(text)), key=len)
+        if not postings[0]:
+            return ()
+        candidates = set(postings[0])
+        threshold = SEARCH_CONFIG['verify_threshold']
+        for posting in postings[1:]:
+            if len(candidates) <= threshold:
+                break
+            candidates.intersection_update(posting)
+        return candidates
+
+    def id_matches(self, text):
+        # Позиции записей, в ID которых есть text
+        if len(text) < NGRAM_SIZE:
+            # Короткий запрос находится почти в каждом ID: проверить все ID подряд быстрее
+            return (position for position, record in enumerate(self.records) if text in record.id)
+        return self.id_find(text)
+
+    def id_find(self, text):
+        # Поиск по общей строке ID: после совпадения поиск продолжается со следующего ID
+        ids = self.ids
+        offsets = self.id_offsets
+        start = ids.find(text)
+        while start != -1:
+            position = bisect_right(offsets, start) - 1
+            yield position
+            start = ids.find(text, offsets[position + 1])
+
+    def key_positions_of(self, numbers, accepted=None):
+        # Позиции записей с названиями numbers, по порядку numbers.
+        # accepted – отметки записей, прошедших фильтр (None – все записи)
+        if self.key_positions is None:
+            positions = numbers
+        else:
+            key_positions = self.key_positions
+            positions = (position for number in numbers for position in key_positions[number])
+        if accepted is None:
+            return list(positions)
+        return [position for position in positions if accepted[position]]
+
+    def accepted_keys(self, numbers, accepted):
+        # Названия numbers, у которых есть хотя бы одна запись, прошедшая фильтр
+        if self.key_positions is None:
+            return [number for number in numbers if accepted[number]]
+        key_positions = self.key_positions
+        return [number for number in numbers if any(accepted[position] for position in key_positions[number])]
+
+    def search(self, text, match_id=True):
+        # Позиции (по возрастанию) записей, в названии которых (или, при match_id, в ID) есть text.
+        # text должен быть в нижнем регистре
+        if len(text) < NGRAM_SIZE and self.key_positions is None:
+            # Без триграмм и без повторов названий индексу нечего сократить: обычный перебор
+            # записей быстрее, чем перебор названий и отдельный поиск по строке ID
+            return [position for position, record in enumerate(self.records)
+                    if text in record.search_key or (match_id and text in record.id)]
+        keys = self.keys
+        numbers = [number for number in self.key_candidates(text) if text in keys[number]]
+        positions = self.key_positions_of(numbers)
+        if match_id and ID_SEPARATOR not in text:
+            positions = set(positions)
+            positions.update(self.id_matches(text))
+        return sorted(positions)
+
+    def narrow_search(self, text, match_id=True):
+        # То же, что search, но по стеку прежних запросов. Запросы, не входящие в text, снимаются
+        # со стека (при стирании символов так находится прежний результат). Если в text входит
+        # запрос на вершине, проверяются только его совпадения: O(совпадений) вместо O(N)
+        history = self.history[match_id]
+        while history and history[-1][0] not in text:
+            history.pop()
+        if history:
+            previous_text, previous_positions = history[-1]
+            if previous_text == text:
+                return previous_positions
+            # Названия берутся из self.keys: search_key записи каждый раз собирается заново
+            records = self.records
+            keys = self.keys
+            if self.position_keys is None:
+                positions = [position for position in previous_positions
+                             if text in keys[position] or (match_id and text in records[position].id)]
+            else:
+                position_keys = self.position_keys
+                positions = [position for position in previous_positions
+                             if text in keys[position_keys[position]] or (match_id and text in records[position].id)]
+        else:
+            positions = self.search(text, match_id)
+        history.append((text, positions))
+        if len(history) > SEARCH_CONFIG['history_size']:
+            del history[0]
+        return positions
+
+    def fuzzy_search(self, text, limit, match_id=True, predicate=None):
+        # Позиции не более чем limit записей, от лучшего совпадения к худшему: записи, в ID которых
+        # есть text, затем названия, содержащие text (начинающиеся с него и короткие – выше),
+        # затем похожие названия (fuzzy_candidates). text должен быть в нижнем регистре.
+        # Записи, для которых predicate ложен, не рассматриваются
+        accepted = None if predicate is None else [bool(predicate(record)) for record in self.records]
+        if len(text) < NGRAM_SIZE:
+            # По одной-двум буквам похожесть не оценить: первые limit точных совпадений
+            return list(islice((position for position, record in enumerate(self.records)
+                                if (accepted is None or accepted[position])
+                                and (text in record.search_key or (match_id and text in record.id))), limit))
+        keys = self.keys
+        numbers = [number for number in self.key_candidates(text) if text in keys[number]]
+        candidates = numbers if accepted is None else self.accepted_keys(numbers, accepted)
+        ranked = heapq.nsmallest(limit, candidates, key=lambda number: (not keys[number].startswith(text),
+                                                                        len(keys[number]), number))
+        positions = []
+        if match_id and ID_SEPARATOR not in text:
+            id_positions = self.id_find(text)
+            if accepted is not None:
+                id_positions = (position for position in id_positions if accepted[position])
+            positions.extend(islice(id_positions, limit))
+        positions.extend(self.key_positions_of(ranked, accepted))
+        positions = list(dict.fromkeys(positions))
+        if len(positions) < limit:
+            similar = self.fuzzy_candidates(text, limit - len(positions), set(numbers), accepted)
+            positions.extend(self.key_positions_of(similar, accepted))
+        return positions[:limit]
+
+    def fuzzy_candidates(self, text, count, exclude, accepted=None):
+        # Номера не более чем count названий (кроме exclude и названий без записей, прошедших
+        # фильтр accepted), похожих на text, по убыванию оценки.
+        # Кандидаты – fuzzy_pool названий с наибольшим числом общих с запросом триграмм (при
+        # равенстве – более короткие), отобранные кучей без сортировки всех названий; их оценивает fuzzy_score
+        tokens = text.split()
+        query_ngrams = words_ngrams(tokens)
+        postings = sorted((self.postings[ngram] for ngram in query_ngrams if ngram in self.postings), key=len)
+        if not postings:
+            return []
+        counts = Counter(postings[0])
+        budget = SEARCH_CONFIG['fuzzy_max_postings'] - len(postings[0])
+        for posting in postings[1:]:
+            budget -= len(posting)
+            if budget < 0:
+                break
+            counts.update(posting)
+        for number in exclude:
+            counts.pop(number, None)
+        if accepted is not None:
+            for number in set(counts).difference(self.accepted_keys(counts, accepted)):
+                del counts[number]
+
+        keys = self.keys
+        pool_size = SEARCH_CONFIG['fuzzy_pool']
+        if len(counts) > pool_size:
+            # Порог – число общих триграмм у pool_size-го названия. Различных значений не больше,
+            # чем триграмм в запросе, поэтому порог находится подсчётом значений, а не кучей
+            remaining = pool_size
+            for threshold, keys_count in sorted(Counter(counts.values()).items(), reverse=True):
+                remaining -= keys_count
+                if remaining <= 0:
+                    break
+            pool = [number for number, common in counts.items() if common >= threshold]
+            if len(pool) > pool_size:
+                # Названий на пороге бывает намного больше pool_size (одинаковые слова
+                # в разных сочетаниях): среди них выбираются короткие
+                pool = heapq.nsmallest(pool_size, pool, key=lambda number: (-counts[number], len(keys[number])))
+        else:
+            pool = counts
+        min_score = SEARCH_CONFIG['fuzzy_min_score']
+        similarities = {}
+        scored = []
+        for number in pool:
+            score = fuzzy_score(tokens, query_ngrams, keys[number], similarities)
+            if score >= min_score:
+                scored.append((score, -number))
+        return [-number for _, number in heapq.nlargest(count, scored)]
+
+# Реестр индексов: id списка -> SearchIndex. Индекс держит ссылку на свой список,
+# поэтому id не может достаться другому списку, пока индекс в реестре
+_search_indexes = OrderedDict()
+_registry_lock = threading.Lock()
+
+def register_search_index(records, index):
+    with _registry_lock:
+        _search_indexes[id(records)] = index
+        _search_indexes.move_to_end(id(records))
+        while len(_search_indexes) > SEARCH_CONFIG['max_indexes']:
+            _search_indexes.popitem(last=False)
+
+def get_search_index(records):
+    # Индекс списка records; строится заново, если его нет или содержимое списка заменено
+    with _registry_lock:
+        index = _search_indexes.get(id(records))
+        if index is not None:
+            _search_indexes.move_to_end(id(records))
+    if index is None or not index.matches(records):
+        index = SearchIndex(records)
+        register_search_index(records, index)
+    return index
+
+def invalidate_search_index(records):
+    # Содержимое records изменено не целиком (matches() этого может не заметить)
+    with _registry_lock:
+        _search_indexes.pop(id(records), None)
+
+def build_search_indexes(record_lists):
+    # Строит индексы непустых списков заранее, чтобы первый поиск не ждал построения
+    for records in record_lists:
+        if records:
+            get_search_index(records)
+
+def start_search_index_build(record_lists):
+    # build_search_indexes в фоновом потоке: поток интерфейса тем временем создаёт вкладки,
+    # а если поиск по списку начнётся раньше, индекс этого списка построится при поиске
+    thread = threading.Thread(target=build_search_indexes, args=(list(record_lists),), daemon=True)
+    thread.start()
+    return thread
+
+def search_records(records, text, match_id=True, fuzzy=None, predicate=None):
+    # Записи records в исходном порядке, в названии (с переводами) или, при match_id, в ID
+    # которых встречается text без учёта регистра. В нечётком режиме (fuzzy, по умолчанию
+    # SEARCH_CONFIG['fuzzy']) – лучшие fuzzy_limit записей в порядке убывания сходства.
+    # predicate(запись) – фильтр вкладки: в результат попадают только записи, для которых он
+    # истинен, и лучшие записи нечёткого режима выбираются уже среди них
+    text = text.lower()
+    if not text:
+        return records if predicate is None else [record for record in records if predicate(record)]
+    index = get_search_index(records)
+    if fuzzy is None:
+        fuzzy = SEARCH_CONFIG['fuzzy']
+    if fuzzy:
+        positions = index.fuzzy_search(text, SEARCH_CONFIG['fuzzy_limit'], match_id, predicate)
+    else:
+        positions = index.narrow_search(text, match_id)
+        if predicate is not None:
+            return [records[position] for position in positions if predicate(records[position])]
+    return [records[position] for position in positions]
@@ -0,0 +1,112 @@
+# search_scheduler.py
+# Общий для всех вкладок планировщик поиска. Поле поиска вызывает обновление списка не при
+# каждом нажатии клавиши, а через SEARCH_SCHEDULER_CONFIG['delay'] мс после последнего
+# (after/after_cancel): быстрый набор не копит очередь перестроений, а запрос читается из поля
+# в момент обновления, так что устаревшие запросы просто не выполняются.
+# Заполнение списка (fill_listbox) идёт частями не дольше frame_budget за раз, между частями
+# Tk успевает перерисовать окно и обработать ввод; новое заполнение того же списка отменяет
+# незаконченное прежнее. Для каждого списка запоминаются показанные в нём записи, и выбранная
+# строка сопоставляется с записью по номеру (selected_record), а не разбором текста строки
+
+import time
+import tkinter as tk
+from itertools import islice
+
+SEARCH_SCHEDULER_CONFIG = {
+    # Пауза после последнего нажатия клавиши перед обновлением списка, мс
+    'delay': 100,
+    # Сколько времени можно заполнять список за один вызов, прежде чем вернуть управление Tk, с
+    'frame_budget': 0.008,
+    # Сколько строк вставляется в список за одно обращение к Tk
+    'chunk_size': 250,
+}
+
+class SearchScheduler:
+    # Отложенные вызовы регистрируются в окне верхнего уровня: вкладки с полями поиска
+    # уничтожаются при смене справочника, и отменить вызов через их виджеты уже нельзя
+    def __init__(self):
+        # update -> (окно, id отложенного вызова)
+        self.pending = {}
+        # путь списка -> (окно, id вызова, который продолжит заполнение)
+        self.fills = {}
+        # путь списка -> записи в порядке строк списка
+        self.records = {}
+
+    def schedule(self, widget, update):
+        # Вызвать update через delay мс; повторный вызов с тем же update до этого переносит срок.
+        # update должен быть одним и тем же объектом для одного поля поиска
+        self.cancel(update)
+        window = widget.winfo_toplevel()
+        after_id = window.after(SEARCH_SCHEDULER_CONFIG['delay'], self.run, widget, update)
+        self.pending[update] = (window, after_id)
+
+    def run(self, widget, update):
+        self.pending.pop(update, None)
+        # Вкладка могла быть пересоздана (например, переключателем в Spawn)
+        if widget.winfo_exists():
+            update()
+
+    def cancel(self, update):
+        pending = self.pending.pop(update, None)
+        if pending is not None:
+            window, after_id = pending
+            window.after_cancel(after_id)
+
+    def fill_listbox(self, listbox, records, format_line, on_done=None):
+        # Очищает listbox и вставляет в него по строке format_line(запись) для каждой из records
+        # (строки форматируются по мере вставки). Первая часть вставляется сразу, остальные –
+        # в следующих вызовах after. on_done вызывается, когда вставлены все строки
+        self.cancel_fill(listbox)
+        listbox.delete(0, tk.END)
+        if not isinstance(records, list):
+            records = list(records)
+        self.records[str(listbox)] = records
+        self.fill_step(listbox, map(format_line, records), on_done)
+
+    def record_at(self, listbox, index):
+        records = self.records.get(str(listbox), [])
+        return records[index] if 0 <= index < len(records) else None
+
+    def selected_record(self, listbox):
+        # Запись первой выбранной строки списка или None
+        selected_indices = listbox.curselection()
+        if not selected_indices:
+            return None
+        return self.record_at(listbox, selected_indices[0])
+
+    def fill_step(self, listbox, lines, on_done):
+        key = str(listbox)
+        self.fills.pop(key, None)
+        if not listbox.winfo_exists():
+            return
+        chunk_size = SEARCH_SCHEDULER_CONFIG['chunk_size']
+        deadline = time.perf_counter() + SEARCH_SCHEDULER_CONFIG['frame_budget']
+        while True:
+            chunk = list(islice(lines, chunk_size))
+            if chunk:
+                listbox.insert(tk.END, *chunk)
+            if len(chunk) < chunk_size:
+                if on_done is not None:
+                    on_done()
+                return
+            if time.perf_counter() >= deadline:
+                break
+        # after, а не after_idle: между частями должны выполниться перерисовка и ввод
+        window = listbox.winfo_toplevel()
+        self.fills[key] = (window, window.after(1, self.fill_step, listbox, lines, on_done))
+
+    def cancel_fill(self, listbox):
+        fill = self.fills.pop(str(listbox), None)
+        if fill is not None:
+            window, after_id = fill
+            window.after_cancel(after_id)
+
+    def cancel_all(self):
+        # Перед уничтожением вкладок (смена справочника или настроек)
+        for window, after_id in list(self.pending.values()) + list(self.fills.values()):
+            window.after_cancel(after_id)
+        self.pending.clear()
+        self.fills.clear()
+        self.records.clear()
+
+search_scheduler = SearchScheduler()
@@ -6,8 +6,9 @@ import os
 import json
 import locale as pylocale
 import sys
+from concurrent.futures import ThreadPoolExecutor
 
-from process_handbook import identify_handbook  # Import the identify_handbook function
+from process_handbook import HandbookMetadataCache, probe_handbook
 
 def get_path():
     if getattr(sys, 'frozen', False) and hasattr(sys, '_MEIPASS'):
@@ -24,9 +25,16 @@ class SettingsWindow:
         self.settings_file = settings_file
         self.load_settings()
 
+        # Server type and version of known files; unknown files are probed in a thread pool
+        self.metadata_cache = HandbookMetadataCache()
+        self.probe_executor = ThreadPoolExecutor(max_workers=min(8, (os.cpu_count() or 1) + 4))
+        self.pending_probes = {}
+        self.valid_handbooks = []
+
         self.window = tk.Toplevel(self.master)
         self.window.title(self.localization.get('settings_title', 'Settings'))
         self.window.grab_set()  # Make the settings window modal
+        self.window.bind('<Destroy>', self.on_destroy)
 
         self.create_widgets()
 
@@ -40,7 +48,8 @@ class SettingsWindow:
             self.settings = {
                 'language': pylocale.getdefaultlocale()[0][:2] if pylocale.getdefaultlocale()[0] else 'en',
                 'handbook_paths': [],
-                'selected_handbook': ''
+                'selected_handbook': '',
+                'extra_handbooks': []
             }
 
         # Load localization for the settings window
@@ -118,6 +127,28 @@ class SettingsWindow:
         # Display info for selected Handbook
         self.display_handbook_info(self.handbook_var.get())
 
+        # Other language variants of the selected Handbook (same server and version)
+        extra_label = ttk.Label(frame, text=self.localization.get('extra_handbooks_label', 'Additional languages:'))
+        extra_label.pack(anchor=tk.W, pady=(10, 0))
+
+        extra_frame = ttk.Frame(frame)
+        extra_frame.pack(fill=tk.X)
+        self.extra_listbox = tk.Listbox(extra_frame, height=3, exportselection=False)
+        self.extra_listbox.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        extra_buttons = ttk.Frame(extra_frame)
+        extra_buttons.pack(side=tk.LEFT, padx=(5, 0))
+        add_extra_button = ttk.Button(extra_buttons, text=self.localization.get('add_button', 'Add'), command=self.add_extra_handbook)
+        add_extra_button.pack(fill=tk.X)
+        remove_extra_button = ttk.Button(extra_buttons, text=self.localization.get('remove_button', 'Remove'), command=self.remove_extra_handbook)
+        remove_extra_button.pack(fill=tk.X)
+        for path in self.settings.get('extra_handbooks', []):
+            self.extra_listbox.insert(tk.END, path)
+
+        # Fuzzy search mode for all search boxes
+        self.fuzzy_search_var = tk.BooleanVar(value=self.settings.get('fuzzy_search', False))
+        fuzzy_search_check = ttk.Checkbutton(frame, text=self.localization.get('fuzzy_search_label', 'Fuzzy search (ranked, tolerates typos)'), variable=self.fuzzy_search_var)
+        fuzzy_search_check.pack(anchor=tk.W, pady=(10, 0))
+
         # Buttons
         buttons_frame = ttk.Frame(frame)
         buttons_frame.pack(pady=(10, 0))
@@ -137,42 +168,73 @@ class SettingsWindow:
         return languages
 
     def update_handbook_list(self):
-        # Get list of Handbook files in the root directory
-        root_handbooks = []
-        for file in os.listdir():
-            if file.endswith('.txt'):
-                full_path = os.path.abspath(file)
-                server_type, handbook_version = identify_handbook(full_path)
-                if server_type:
-                    root_handbooks.append(full_path)
-
-        # Combine with previously selected handbooks
-        all_handbooks = set(root_handbooks + self.settings.get('handbook_paths', []))
-
-        # Verify that the handbooks are valid
-        valid_handbooks = []
-        for path in all_handbooks:
-            if os.path.exists(path):
-                server_type, handbook_version = identify_handbook(path)
-                if server_type:
-                    valid_handbooks.append(path)
-
-        # Update the settings with valid handbooks
-        self.settings['handbook_paths'] = valid_handbooks
+        # Handbook files in the root directory and previously selected handbooks.
+        # Files already in the metadata cache are shown at once, the rest are probed in the background
+        root_handbooks = [os.path.abspath(file) for file in os.listdir() if file.endswith('.txt')]
+        candidates = dict.fromkeys(root_handbooks + self.settings.get('handbook_paths', []))
+
+        self.valid_handbooks = []
+        for path in candidates:
+            if path in self.pending_probes.values() or not os.path.exists(path):
+                continue
+            metadata = self.metadata_cache.lookup(path)
+            if metadata is None:
+                self.pending_probes[self.probe_executor.submit(probe_handbook, path)] = path
+            elif metadata[0]:
+                self.valid_handbooks.append(path)
+
+        self.refresh_handbook_combobox()
+        if self.pending_probes:
+            self.window.after(50, self.poll_probes)
+        else:
+            self.metadata_cache.save()
+
+    def poll_probes(self):
+        # Collect finished probes in the Tk thread; the cache and widgets are only touched here
+        if not self.window.winfo_exists():
+            return
+        for future in [future for future in self.pending_probes if future.done()]:
+            path = self.pending_probes.pop(future)
+            try:
+                stat_signature, metadata = future.result()
+            except OSError:
+                continue
+            self.metadata_cache.store(stat_signature, metadata)
+            if metadata[0] and path not in self.valid_handbooks:
+                self.valid_handbooks.append(path)
+
+        self.refresh_handbook_combobox()
+        if self.pending_probes:
+            self.window.after(50, self.poll_probes)
+        else:
+            self.metadata_cache.save()
 
+    def refresh_handbook_combobox(self):
         # Update the Combobox values
-        self.handbook_combobox['values'] = valid_handbooks
+        self.handbook_combobox['values'] = self.valid_handbooks
 
-        # Set the selected Handbook
+        # Set the selected Handbook; while probes are running the selection may still become valid
         selected_handbook = self.settings.get('selected_handbook', '')
-        if selected_handbook in valid_handbooks:
+        if selected_handbook in self.valid_handbooks:
             self.handbook_var.set(selected_handbook)
-        elif valid_handbooks:
-            self.handbook_var.set(valid_handbooks[0])
-            self.settings['selected_handbook'] = valid_handbooks[0]
+        elif self.pending_probes:
+            return
+        elif self.valid_handbooks:
+            self.handbook_var.set(self.valid_handbooks[0])
+            self.settings['selected_handbook'] = self.valid_handbooks[0]
         else:
             self.handbook_var.set('')
 
+        if not self.pending_probes:
+            # Update the settings with valid handbooks
+            self.settings['handbook_paths'] = list(self.valid_handbooks)
+        self.display_handbook_info(self.handbook_var.get())
+
+    def on_destroy(self, event):
+        if event.widget is self.window:
+            self.probe_executor.shutdown(wait=False, cancel_futures=True)
+            self.metadata_cache.save()
+
     def on_handbook_selected(self, event):
         selected_handbook = self.handbook_var.get()
         self.display_handbook_info(selected_handbook)
@@ -180,7 +242,7 @@ class SettingsWindow:
 
     def display_handbook_info(self, handbook_path):
         if handbook_path and os.path.exists(handbook_path):
-            server_type, handbook_version = identify_handbook(handbook_path)
+            server_type, handbook_version = self.metadata_cache.identify(handbook_path)
             if server_type:
                 info_text = f"Type: {server_type}, Version: {handbook_version}"
                 self.handbook_info_label.config(text=info_text)
@@ -197,7 +259,7 @@ class SettingsWindow:
         )
         if filename:
             # Verify that it's a valid Handbook
-            server_type, handbook_version = identify_handbook(filename)
+            server_type, handbook_version = self.metadata_cache.identify(filename)
             if server_type:
                 # Add to the list if not already there
                 if filename not in self.settings.get('handbook_paths', []):
@@ -211,9 +273,36 @@ class SettingsWindow:
                 messagebox.showwarning(self.localization.get('invalid_handbook_title', 'Invalid Handbook'),
                                        self.localization.get('invalid_handbook_message', 'The selected file is not a valid Handbook.'))
 
+    def add_extra_handbook(self):
+        filename = filedialog.askopenfilename(
+            title=self.localization.get('select_handbook_title', 'Select Handbook File'),
+            filetypes=((self.localization.get('text_files', 'Text Files'), "*.txt"),
+                       (self.localization.get('all_files', 'All Files'), "*.*"))
+        )
+        if not filename:
+            return
+        # A language variant must come from the same server build as the selected Handbook
+        selected_handbook = self.handbook_var.get()
+        if not selected_handbook or self.metadata_cache.identify(filename) != self.metadata_cache.identify(selected_handbook):
+            messagebox.showwarning(self.localization.get('invalid_handbook_title', 'Invalid Handbook'),
+                                   self.localization.get('extra_handbook_mismatch', 'The file must be the same Handbook version as the selected one.'))
+            return
+        extra_handbooks = self.settings.setdefault('extra_handbooks', [])
+        if filename != selected_handbook and filename not in extra_handbooks:
+            extra_handbooks.append(filename)
+            self.extra_listbox.insert(tk.END, filename)
+
+    def remove_extra_handbook(self):
+        selection = self.extra_listbox.curselection()
+        if selection:
+            index = selection[0]
+            self.extra_listbox.delete(index)
+            del self.settings.setdefault('extra_handbooks', [])[index]
+
     def save_settings(self):
         # Update settings
         self.settings['language'] = self.language_var.get()
+        self.settings['fuzzy_search'] = self.fuzzy_search_var.get()
         selected_handbook = self.handbook_var.get()
         if selected_handbook and os.path.exists(selected_handbook):
             self.settings['selected_handbook'] = selected_handbook
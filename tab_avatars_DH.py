@@ -2,6 +2,9 @@ import tkinter as tk
 from tkinter import ttk
 from tkinter import VERTICAL, RIGHT, LEFT, Y, StringVar, messagebox
 
+from search_engine import search_records
+from search_scheduler import search_scheduler
+
 class AvatarsTab:
     def __init__(self, notebook, avatars_list, command_manager, localization):
         self.notebook = notebook
@@ -12,6 +15,9 @@ class AvatarsTab:
         self.frame = tk.Frame(notebook)
         self.init_tab()
 
+    def refresh(self):
+        self.update_dangheng_avatar_list(self.search_var.get())
+
     def init_tab(self):
         self.init_dangheng_ui()
 
@@ -45,12 +51,12 @@ class AvatarsTab:
         all_checkbox.pack()
 
         # Поисковая строка
-        search_var = StringVar()
+        self.search_var = StringVar()
         search_label = tk.Label(parent_frame, text=self.localization.get("Search", "Search"))
         search_label.pack()
-        search_entry = tk.Entry(parent_frame, textvariable=search_var)
+        search_entry = tk.Entry(parent_frame, textvariable=self.search_var)
         search_entry.pack()
-        search_var.trace('w', lambda *args: self.update_dangheng_avatar_list(search_var.get()))
+        self.search_var.trace('w', lambda *args: search_scheduler.schedule(search_entry, self.refresh))
 
         # Список аватаров
         avatar_frame = tk.Frame(parent_frame)
@@ -71,24 +77,12 @@ class AvatarsTab:
         self.update_dangheng_avatar_list('')
 
     def update_dangheng_avatar_list(self, search_text):
-        search_text = search_text.lower()
-        self.avatar_listbox.delete(0, tk.END)
-        for entry in self.avatars_list:
-            display_text = f"{entry['name']} ({entry['id']})"
-            if search_text in entry['name'].lower() or search_text in entry['id']:
-                self.avatar_listbox.insert(tk.END, display_text)
+        avatars = search_records(self.avatars_list, search_text)
+        search_scheduler.fill_listbox(self.avatar_listbox, avatars, lambda entry: f"{entry['name']} ({entry['id']})")
 
     def on_avatar_select(self, event):
-        selected_indices = self.avatar_listbox.curselection()
-        if selected_indices:
-            index = selected_indices[0]
-            selected_avatar = self.avatar_listbox.get(index)
-            if '(' in selected_avatar and ')' in selected_avatar:
-                self.selected_avatar_id = selected_avatar.split('(')[-1].split(')')[0]
-            else:
-                self.selected_avatar_id = None
-        else:
-            self.selected_avatar_id = None
+        selected_avatar = search_scheduler.selected_record(self.avatar_listbox)
+        self.selected_avatar_id = selected_avatar['id'] if selected_avatar is not None else None
 
         # Снимаем отметку с "All", если выбран отдельный аватар
         self.all_var.set(False)
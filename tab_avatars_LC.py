@@ -2,6 +2,9 @@ import tkinter as tk
 from tkinter import ttk
 from tkinter import VERTICAL, RIGHT, LEFT, Y, StringVar, messagebox
 
+from search_engine import search_records
+from search_scheduler import search_scheduler
+
 class AvatarsTab:
     def __init__(self, notebook, avatars_list, command_manager, localization):
         self.notebook = notebook
@@ -10,8 +13,13 @@ class AvatarsTab:
         self.localization = localization
 
         self.frame = ttk.Frame(notebook)
+        self.update_list = None
         self.init_tab()
 
+    def refresh(self):
+        if self.update_list:
+            self.update_list()
+
     def init_tab(self):
         self.init_lunarcore_ui()
 
@@ -59,7 +67,7 @@ class AvatarsTab:
         search_label.pack()
         search_entry = tk.Entry(parent_frame, textvariable=search_var)
         search_entry.pack()
-        search_var.trace('w', lambda *args: update_avatar_list())
+        search_var.trace('w', lambda *args: search_scheduler.schedule(search_entry, update_avatar_list))
 
         # Список аватаров
         avatar_frame = tk.Frame(parent_frame)
@@ -93,26 +101,14 @@ class AvatarsTab:
 
         # Обновление списка аватаров в зависимости от поиска
         def update_avatar_list():
-            search_text = search_var.get().lower()
-            avatar_listbox.delete(0, tk.END)
-            for entry in self.avatars_list:
-                display_text = f"{entry['name']} ({entry['id']})"
-                if search_text in entry['name'].lower() or search_text in entry['id']:
-                    avatar_listbox.insert(tk.END, display_text)
+            avatars = search_records(self.avatars_list, search_var.get())
+            search_scheduler.fill_listbox(avatar_listbox, avatars, lambda entry: f"{entry['name']} ({entry['id']})")
 
         # Обработка выбора аватара
         def on_avatar_select(event):
             nonlocal selected_avatar_id
-            selected_indices = avatar_listbox.curselection()
-            if selected_indices:
-                index = selected_indices[0]
-                selected_avatar = avatar_listbox.get(index)
-                if '(' in selected_avatar and ')' in selected_avatar:
-                    selected_avatar_id = selected_avatar.split('(')[-1].split(')')[0]
-                else:
-                    selected_avatar_id = None
-            else:
-                selected_avatar_id = None
+            selected_avatar = search_scheduler.selected_record(avatar_listbox)
+            selected_avatar_id = selected_avatar['id'] if selected_avatar is not None else None
 
         avatar_listbox.bind('<<ListboxSelect>>', on_avatar_select)
 
@@ -151,6 +147,7 @@ class AvatarsTab:
             else:
                 self.command_manager.update_command('')
 
+        self.update_list = update_avatar_list
         update_avatar_list()
 
     def create_lunarcore_properties_section(self, parent_frame):
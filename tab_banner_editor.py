@@ -5,10 +5,12 @@ from datetime import datetime
 import threading  # Для оптимизации загрузки файла
 
 class BannerEditorTab:
-    def __init__(self, parent, lightcones_list, avatars_list, localization):
+    def __init__(self, parent, lightcones_list, avatars_list, localization, handbook):
         self.frame = tk.Frame(parent)
         self.lightcones_list = lightcones_list
         self.avatars_list = avatars_list
+        # Данные справочника: поиск записей по ID через индекс (handbook.find)
+        self.handbook = handbook
         self.localization = localization
         self.banners = []  # Список баннеров (список словарей)
         self.current_banner_index = None
@@ -86,25 +88,12 @@ class BannerEditorTab:
         self.available_notebook.add(self.lightcones_tab, text=self.localization['available_lightcones'])
         self.available_lightcones_lb = tk.Listbox(self.lightcones_tab)
         self.available_lightcones_lb.pack(fill=tk.BOTH, expand=True)
-        for item in self.lightcones_list:
-            if isinstance(item, dict):
-                display = f"{item.get('id', '')}: {item.get('title', '')}"
-            elif hasattr(item, 'id') and hasattr(item, 'title'):
-                display = f"{item.id}: {item.title}"
-            else:
-                display = str(item)
-            self.available_lightcones_lb.insert(tk.END, display)
         # Вкладка "Available Avatars"
         self.avatars_tab = tk.Frame(self.available_notebook)
         self.available_notebook.add(self.avatars_tab, text=self.localization['available_avatars'])
         self.available_avatars_lb = tk.Listbox(self.avatars_tab)
         self.available_avatars_lb.pack(fill=tk.BOTH, expand=True)
-        for item in self.avatars_list:
-            if isinstance(item, dict):
-                display = f"{item.get('id', '')}: {item.get('name', '')}"
-            else:
-                display = str(item)
-            self.available_avatars_lb.insert(tk.END, display)
+        self.fill_available_lists()
 
         # --- Кнопки для добавления выбранного элемента в бонусный список ---
         add_btn_frame = tk.Frame(right_frame)
@@ -133,6 +122,34 @@ class BannerEditorTab:
         except Exception:
             return 0
 
+    def fill_available_lists(self):
+        self.available_lightcones_lb.delete(0, tk.END)
+        for item in self.lightcones_list:
+            if isinstance(item, dict):
+                display = f"{item.get('id', '')}: {item.get('title', '')}"
+            elif hasattr(item, 'id') and hasattr(item, 'title'):
+                display = f"{item.id}: {item.title}"
+            else:
+                display = str(item)
+            self.available_lightcones_lb.insert(tk.END, display)
+        self.available_avatars_lb.delete(0, tk.END)
+        for item in self.avatars_list:
+            if isinstance(item, dict):
+                display = f"{item.get('id', '')}: {item.get('name', '')}"
+            elif hasattr(item, 'id') and hasattr(item, 'name'):
+                display = f"{item.id}: {item.name}"
+            else:
+                display = str(item)
+            self.available_avatars_lb.insert(tk.END, display)
+
+    def refresh(self):
+        # Справочник обновлён: перерисовываем списки и названия в баннерах, выбранный баннер сохраняется
+        self.fill_available_lists()
+        self.refresh_banner_list()
+        if self.current_banner_index is not None and self.current_banner_index < len(self.banners):
+            self.banner_listbox.selection_set(self.current_banner_index)
+            self.refresh_current_rate_listboxes(self.banners[self.current_banner_index])
+
     def on_banner_select(self, event):
         selection = self.banner_listbox.curselection()
         if selection:
@@ -199,8 +216,8 @@ class BannerEditorTab:
         Возвращает название элемента:
           - Если item является словарём, возвращает 'title' или 'name'
           - Если item – объект с атрибутами, пытается вернуть item.title или item.name
-          - Если item – число или строка, выполняется поиск по lightcones_list (для id длиной 5)
-            или avatars_list (для id длиной 4)
+          - Если item – число или строка, запись ищется по ID в индексе справочника:
+            среди lightcones_list (для id длиной 5) или avatars_list (для id длиной 4)
         """
         # Если item – словарь
         if isinstance(item, dict):
@@ -217,17 +234,13 @@ class BannerEditorTab:
         # Рассматриваем item как id (число или строку)
         item_id_str = str(item)
         if len(item_id_str) == 5:  # Предполагаем, что это lightcone (оружие)
-            for obj in self.lightcones_list:
-                if isinstance(obj, dict) and str(obj.get('id', '')) == item_id_str:
-                    return obj.get('title', item_id_str)
-                elif hasattr(obj, 'id') and str(obj.id) == item_id_str and hasattr(obj, 'title'):
-                    return obj.title
+            lightcone = self.handbook.find(item_id_str, 'lightcones_list')
+            if lightcone is not None:
+                return lightcone.title
         elif len(item_id_str) == 4:  # Персонаж (avatar)
-            for obj in self.avatars_list:
-                if isinstance(obj, dict) and str(obj.get('id', '')) == item_id_str:
-                    return obj.get('name', item_id_str)
-                elif hasattr(obj, 'id') and str(obj.id) == item_id_str and hasattr(obj, 'name'):
-                    return obj.name
+            avatar = self.handbook.find(item_id_str, 'avatars_list')
+            if avatar is not None:
+                return avatar.name
         return item_id_str
 
     def format_banner_display(self, banner):
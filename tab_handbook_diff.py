@@ -0,0 +1,162 @@
+import tkinter as tk
+from tkinter import ttk, messagebox, filedialog
+import threading
+from collections import deque
+
+from handbook_diff import diff_handbooks, load_handbook
+
+# Как часто проверяется, закончилось ли сравнение в фоновом потоке, мс
+RESULT_POLL_INTERVAL = 100
+
+class HandbookDiffTab:
+    # Сравнение текущего справочника с другой (обычно предыдущей) версией.
+    # Данные вкладок изменяются в потоке Tk (фоновая загрузка, подмена при изменении файла),
+    # поэтому фоновый поток сравнивает не их, а заново загруженный из кэша текущий справочник
+    def __init__(self, notebook, handbook_filename, server_type, program_version, localization):
+        self.notebook = notebook
+        self.handbook_filename = handbook_filename
+        self.server_type = server_type
+        self.program_version = program_version
+        self.localization = localization
+        self.result = {}
+        # Узлы разделов, строки которых ещё не добавлены в дерево
+        self.pending_nodes = {}
+        # Пока справочник разбирается в фоне, его кэша ещё нет и сравнение недоступно
+        self.handbook_loading = False
+        # Очередь, в которую фоновый поток кладёт результат сравнения; None – сравнение не идёт
+        self.results = None
+
+        self.frame = tk.Frame(notebook)
+        self.create_widgets()
+
+    def create_widgets(self):
+        top_frame = tk.Frame(self.frame)
+        top_frame.pack(fill=tk.X, padx=5, pady=5)
+
+        tk.Label(top_frame, text=self.localization.get('old_handbook', 'Old handbook:')).pack(side=tk.LEFT)
+        self.old_path_var = tk.StringVar(value=self.localization.get('none_selected', 'No handbook selected'))
+        tk.Label(top_frame, textvariable=self.old_path_var, anchor=tk.W).pack(side=tk.LEFT, fill=tk.X, expand=True)
+        self.select_button = tk.Button(top_frame, text=self.localization.get('select_old', 'Compare with...'),
+                                       command=self.select_old_handbook)
+        self.select_button.pack(side=tk.RIGHT)
+
+        self.summary_var = tk.StringVar()
+        tk.Label(self.frame, textvariable=self.summary_var, anchor=tk.W).pack(fill=tk.X, padx=5)
+
+        # Дерево: раздел -> строки изменений. Строки раздела добавляются при его раскрытии
+        tree_frame = tk.Frame(self.frame)
+        tree_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        columns = ('id', 'old_name', 'new_name')
+        self.tree = ttk.Treeview(tree_frame, columns=columns)
+        self.tree.heading('#0', text=self.localization.get('column_change', 'Change'))
+        self.tree.heading('id', text=self.localization.get('column_id', 'ID'))
+        self.tree.heading('old_name', text=self.localization.get('column_old_name', 'Old name'))
+        self.tree.heading('new_name', text=self.localization.get('column_new_name', 'New name'))
+        self.tree.column('#0', width=220)
+        self.tree.column('id', width=100)
+        scrollbar = tk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=self.tree.yview)
+        self.tree.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.tree.bind('<<TreeviewOpen>>', self.on_node_open)
+
+    def select_old_handbook(self):
+        filename = filedialog.askopenfilename(
+            title=self.localization.get('select_title', 'Select Handbook File'),
+            filetypes=((self.localization.get('text_files', 'Text Files'), "*.txt"),
+                       (self.localization.get('all_files', 'All Files'), "*.*"))
+        )
+        if filename and not self.handbook_loading and self.results is None:
+            self.old_path_var.set(filename)
+            self.summary_var.set(self.localization.get('comparing', 'Comparing...'))
+            # Разбор другого справочника может занять время – выполняем в фоне.
+            # К Tk обращаться из потока нельзя: результат забирается из очереди через after
+            results = self.results = deque()
+            self.update_select_button()
+            threading.Thread(target=self.compare, args=(filename, results), daemon=True).start()
+            self.schedule_poll(results)
+
+    def schedule_poll(self, results):
+        # Вызов регистрируется в окне верхнего уровня: вкладка может быть уничтожена
+        # при смене справочника раньше, чем закончится сравнение
+        self.frame.winfo_toplevel().after(RESULT_POLL_INTERVAL, self.poll_result, results)
+
+    def set_handbook_loading(self, loading):
+        self.handbook_loading = loading
+        if loading:
+            self.summary_var.set(self.localization.get('waiting_for_handbook', 'Available once the handbook is loaded'))
+        elif self.results is None:
+            self.summary_var.set('')
+        self.update_select_button()
+
+    def update_select_button(self):
+        busy = self.handbook_loading or self.results is not None
+        self.select_button.config(state=tk.DISABLED if busy else tk.NORMAL)
+
+    def compare(self, filename, results):
+        # Выполняется в фоновом потоке
+        try:
+            old_data, old_type = load_handbook(filename, program_version=self.program_version)
+            if old_type != self.server_type:
+                raise ValueError(self.localization.get('server_mismatch', 'The handbook belongs to another server type.'))
+            new_data, _ = load_handbook(self.handbook_filename, self.server_type, self.program_version)
+            results.append(('result', diff_handbooks(old_data, new_data, self.server_type)))
+        except Exception as e:
+            results.append(('error', str(e)))
+
+    def poll_result(self, results):
+        if results is not self.results or not self.frame.winfo_exists():
+            return
+        if not results:
+            self.schedule_poll(results)
+            return
+        kind, value = results.popleft()
+        self.results = None
+        self.update_select_button()
+        if kind == 'result':
+            self.show_result(value)
+        else:
+            self.show_error(value)
+
+    def show_error(self, message):
+        self.summary_var.set('')
+        messagebox.showerror(self.localization.get('error_title', 'Error'), message)
+
+    def show_result(self, result):
+        self.result = result
+        self.pending_nodes = {}
+        self.tree.delete(*self.tree.get_children())
+
+        if not result:
+            self.summary_var.set(self.localization.get('no_changes', 'No changes'))
+            return
+
+        added = sum(len(diff.added) for diff in result.values())
+        removed = sum(len(diff.removed) for diff in result.values())
+        renamed = sum(len(diff.renamed) for diff in result.values())
+        self.summary_var.set(self.localization.get('summary', '{sections} changed sections: +{added} -{removed} ~{renamed}')
+                             .format(sections=len(result), added=added, removed=removed, renamed=renamed))
+
+        for key, diff in result.items():
+            text = f"{key}  +{len(diff.added)} -{len(diff.removed)} ~{len(diff.renamed)}"
+            node = self.tree.insert('', tk.END, text=text, open=False)
+            # Пустой дочерний узел, чтобы раздел можно было раскрыть
+            self.tree.insert(node, tk.END, text='')
+            self.pending_nodes[node] = key
+
+    def on_node_open(self, event):
+        node = self.tree.focus()
+        key = self.pending_nodes.pop(node, None)
+        if key is None:
+            return
+        self.tree.delete(*self.tree.get_children(node))
+        diff = self.result[key]
+        added_text = self.localization.get('added', 'Added')
+        removed_text = self.localization.get('removed', 'Removed')
+        renamed_text = self.localization.get('renamed', 'Renamed')
+        for entry_id, name in diff.added:
+            self.tree.insert(node, tk.END, text=added_text, values=(entry_id, '', name))
+        for entry_id, name in diff.removed:
+            self.tree.insert(node, tk.END, text=removed_text, values=(entry_id, name, ''))
+        for entry_id, old_name, new_name in diff.renamed:
+            self.tree.insert(node, tk.END, text=renamed_text, values=(entry_id, old_name, new_name))
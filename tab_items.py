@@ -4,6 +4,9 @@ import tkinter as tk
 from tkinter import ttk
 from tkinter import messagebox, VERTICAL, RIGHT, LEFT, Y, END
 
+from search_engine import search_records
+from search_scheduler import search_scheduler
+
 class ItemsTab:
     def __init__(self, notebook, base_materials, lightcones, materials, other_items, unknown_items, command_manager, localization, server_type):
         self.notebook = notebook
@@ -15,10 +18,16 @@ class ItemsTab:
         self.command_manager = command_manager
         self.localization = localization
         self.server_type = server_type
+        # List refresh functions of the sub-tabs, called when the Handbook data is replaced
+        self.list_updaters = {}
 
         self.frame = ttk.Frame(notebook)
         self.init_tab()
 
+    def refresh(self):
+        for update_list in self.list_updaters.values():
+            update_list()
+
     def init_tab(self):
         # Create sub-tabs
         self.sub_notebook = ttk.Notebook(self.frame)
@@ -62,7 +71,7 @@ class ItemsTab:
 
         search_entry = tk.Entry(left_frame, textvariable=search_var)
         search_entry.pack()
-        search_var.trace('w', lambda *args: update_item_list())
+        search_var.trace('w', lambda *args: search_scheduler.schedule(search_entry, update_item_list))
 
         # Item selection with scrollbar
         item_frame = tk.Frame(left_frame)
@@ -77,17 +86,11 @@ class ItemsTab:
         # Bind item selection event
         def on_item_select(event):
             nonlocal selected_item_id
-            selected_indices = item_listbox.curselection()
-            if selected_indices:
-                index = selected_indices[0]
-                selected_item = item_listbox.get(index)
-                if '(' in selected_item and ')' in selected_item:
-                    id_str = selected_item.split('(')[-1].split(')')[0]
-                    selected_item_id = id_str
-                    # Update the command
-                    update_command()
-                else:
-                    self.command_manager.update_command('')
+            selected_item = search_scheduler.selected_record(item_listbox)
+            if selected_item is not None:
+                selected_item_id = selected_item.id
+                # Update the command
+                update_command()
             else:
                 self.command_manager.update_command('')
 
@@ -139,16 +142,9 @@ class ItemsTab:
 
         # Update item list function
         def update_item_list():
-            search_text = search_var.get().lower()
-
-            # Clear the listbox
-            item_listbox.delete(0, tk.END)
-
-            # Populate the listbox with items matching the search
-            for item in item_list:
-                display_text = f"{item.title} ({item.id})"
-                if search_text in item.title.lower() or search_text in item.id:
-                    item_listbox.insert(tk.END, display_text)
+            # Repopulate the listbox with items matching the search
+            items = search_records(item_list, search_var.get())
+            search_scheduler.fill_listbox(item_listbox, items, lambda item: f"{item.title} ({item.id})")
 
             # Clear the command
             self.command_manager.update_command('')
@@ -188,5 +184,6 @@ class ItemsTab:
             self.command_manager.update_command(command)
 
         # Initialize the item list
+        self.list_updaters[tab_name] = update_item_list
         update_item_list()
 
@@ -4,6 +4,9 @@ import tkinter as tk
 from tkinter import ttk
 from tkinter import VERTICAL, RIGHT, LEFT, Y, StringVar
 
+from search_engine import search_records
+from search_scheduler import search_scheduler
+
 class MazesTab:
     def __init__(self, notebook, mazes_list, command_manager, localization):
         self.notebook = notebook
@@ -12,8 +15,13 @@ class MazesTab:
         self.localization = localization
 
         self.frame = ttk.Frame(notebook)
+        self.update_list = None
         self.init_tab()
 
+    def refresh(self):
+        if self.update_list:
+            self.update_list()
+
     def init_tab(self):
         selected_maze_id = None
         search_var = StringVar()
@@ -28,7 +36,7 @@ class MazesTab:
 
         search_entry = tk.Entry(main_frame, textvariable=search_var)
         search_entry.pack()
-        search_var.trace('w', lambda *args: update_maze_list())
+        search_var.trace('w', lambda *args: search_scheduler.schedule(search_entry, update_maze_list))
 
         # Maze selection with scrollbar
         maze_frame = tk.Frame(main_frame)
@@ -43,18 +51,11 @@ class MazesTab:
         # Bind selection event
         def on_maze_select(event):
             nonlocal selected_maze_id
-            selected_indices = maze_listbox.curselection()
-            if selected_indices:
-                index = selected_indices[0]
-                selected_maze = maze_listbox.get(index)
-                if '(' in selected_maze and ')' in selected_maze:
-                    id_str = selected_maze.split('(')[-1].split(')')[0]
-                    selected_maze_id = id_str
-                    # Update the command
-                    update_command()
-                else:
-                    selected_maze_id = None
-                    self.command_manager.update_command('')
+            selected_maze = search_scheduler.selected_record(maze_listbox)
+            if selected_maze is not None:
+                selected_maze_id = selected_maze['id']
+                # Update the command
+                update_command()
             else:
                 selected_maze_id = None
                 self.command_manager.update_command('')
@@ -63,16 +64,9 @@ class MazesTab:
 
         # Update maze list function
         def update_maze_list():
-            search_text = search_var.get().lower()
-
-            # Clear the listbox
-            maze_listbox.delete(0, tk.END)
-
-            # Populate the listbox
-            for entry in self.mazes_list:
-                display_text = f"{entry['name']} ({entry['id']})"
-                if search_text in entry['name'].lower() or search_text in entry['id']:
-                    maze_listbox.insert(tk.END, display_text)
+            # Repopulate the listbox
+            mazes = search_records(self.mazes_list, search_var.get())
+            search_scheduler.fill_listbox(maze_listbox, mazes, lambda entry: f"{entry['name']} ({entry['id']})")
 
             # Clear the command
             self.command_manager.update_command('')
@@ -87,4 +81,5 @@ class MazesTab:
             self.command_manager.update_command(command)
 
         # Initialize the maze list
+        self.update_list = update_maze_list
         update_maze_list()
@@ -4,6 +4,8 @@ from tkinter import ttk
 from tkinter import messagebox
 from tkinter import VERTICAL, RIGHT, LEFT, Y, END
 
+from search_engine import search_records
+from search_scheduler import search_scheduler
 from tab_planars_gen.stats_id import substats, substats_levels, stats_3, stats_4, stats_5, stats_6
 from tab_planars_gen.substats_interface import SubstatsInterface
 
@@ -32,6 +34,9 @@ class PlanarsTab:
         self.frame = ttk.Frame(notebook)
         self.init_tab()
 
+    def refresh(self):
+        self.update_item_list()
+
     def init_tab(self):
         self.selected_item_id = None
         self.additional_stats = {}
@@ -79,7 +84,7 @@ class PlanarsTab:
         search_label.pack()
         search_entry = tk.Entry(right_frame, textvariable=self.search_var)
         search_entry.pack()
-        self.search_var.trace('w', lambda *args: self.update_item_list())
+        self.search_var.trace('w', lambda *args: search_scheduler.schedule(search_entry, self.update_item_list))
 
         # Item listbox
         item_frame = tk.Frame(right_frame)
@@ -151,75 +156,68 @@ class PlanarsTab:
     def update_item_list(self, *args):
         type_selected = self.type_var.get()
         rarity_selected = self.rarity_var.get()
-        search_text = self.search_var.get().lower()
-        items = [item for item in self.items if item.type == type_selected and str(item.rarity) == rarity_selected]
+        # Mark search matches; groups keep the order of the full item list. The type and rarity
+        # filter goes into the search, so fuzzy search picks its best matches among these items only
+        def selected(item):
+            return item.type == type_selected and str(item.rarity) == rarity_selected
+        matched = {id(item) for item in search_records(self.items, self.search_var.get(), predicate=selected)}
+        items = [item for item in self.items if selected(item)]
         groups = {}
         for item in items:
             id_prefix = item.id[:-1]
             if id_prefix not in groups:
                 groups[id_prefix] = []
             groups[id_prefix].append(item)
-        self.item_listbox.delete(0, tk.END)
+        # None stands for the separator between groups
+        rows = []
         for group in groups.values():
-            group_items = []
-            for item in group:
-                display_text = f'{item.title} ({item.id})'
-                if search_text in item.title.lower() or search_text in item.id:
-                    group_items.append(display_text)
+            group_items = [item for item in group if id(item) in matched]
             if group_items:
-                for display_text in group_items:
-                    self.item_listbox.insert(tk.END, display_text)
-                self.item_listbox.insert(tk.END, '---')
-        if self.item_listbox.size() > 0:
-            last_item = self.item_listbox.get(tk.END)
-            if last_item == '---':
-                self.item_listbox.delete(tk.END)
+                rows.extend(group_items)
+                rows.append(None)
+        if rows:
+            # No separator after the last group
+            rows.pop()
+        search_scheduler.fill_listbox(self.item_listbox, rows, lambda item: '---' if item is None else f'{item.title} ({item.id})')
         self.command_manager.update_command('')
 
     def on_item_select(self, event):
-        selected_indices = self.item_listbox.curselection()
-        if selected_indices:
-            index = selected_indices[0]
-            selected_item = self.item_listbox.get(index)
-            if selected_item != '---':
-                if '(' in selected_item and ')' in selected_item:
-                    id_str = selected_item.split('(')[-1].split(')')[0]
-                    self.selected_item_id = id_str
-                    last_digit = int(id_str[-1])
-                    if last_digit in [1, 2]:
-                        self.main_stat_label.config(text=self.localization['Main_Stat:_Fixed'])
-                        self.main_stat_var.set('Fixed')
-                        self.main_stat_menu['menu'].delete(0, 'end')
-                        self.main_stat_menu.config(state='disabled')
-                    else:
-                        self.main_stat_menu.config(state='normal')
-                        self.main_stat_label.config(text=self.localization['Select_Main_Stat:'])
-                        if last_digit == 3:
-                            main_stats = self.localized_stats_3
-                        elif last_digit == 4:
-                            main_stats = self.localized_stats_4
-                        elif last_digit == 5:
-                            main_stats = self.localized_stats_5
-                        elif last_digit == 6:
-                            main_stats = self.localized_stats_6
-                        else:
-                            main_stats = {}
-                        self.main_stat_options = list(main_stats.keys())
-                        if self.main_stat_options:
-                            self.main_stat_var.set(self.main_stat_options[0])
-                            self.main_stat_menu['menu'].delete(0, 'end')
-                            for option in self.main_stat_options:
-                                self.main_stat_menu['menu'].add_command(label=option, command=tk._setit(self.main_stat_var, option, self.update_command))
-                        else:
-                            self.main_stat_var.set('No Main Stats Available')
-                            self.main_stat_menu['menu'].delete(0, 'end')
-                            self.main_stat_menu['menu'].add_command(label=self.localization['No_Main_Stats_Available'], command=tk._setit(self.main_stat_var, 'No Main Stats Available', self.update_command))
-                            self.main_stat_menu.config(state='disabled')
-                    self.update_command()
-                else:
-                    self.command_manager.update_command('')
+        # Separator rows between item groups have no record
+        selected_item = search_scheduler.selected_record(self.item_listbox)
+        if selected_item is not None:
+            id_str = selected_item.id
+            self.selected_item_id = id_str
+            last_digit = int(id_str[-1])
+            if last_digit in [1, 2]:
+                self.main_stat_label.config(text=self.localization['Main_Stat:_Fixed'])
+                self.main_stat_var.set('Fixed')
+                self.main_stat_menu['menu'].delete(0, 'end')
+                self.main_stat_menu.config(state='disabled')
             else:
-                self.command_manager.update_command('')
+                self.main_stat_menu.config(state='normal')
+                self.main_stat_label.config(text=self.localization['Select_Main_Stat:'])
+                if last_digit == 3:
+                    main_stats = self.localized_stats_3
+                elif last_digit == 4:
+                    main_stats = self.localized_stats_4
+                elif last_digit == 5:
+                    main_stats = self.localized_stats_5
+                elif last_digit == 6:
+                    main_stats = self.localized_stats_6
+                else:
+                    main_stats = {}
+                self.main_stat_options = list(main_stats.keys())
+                if self.main_stat_options:
+                    self.main_stat_var.set(self.main_stat_options[0])
+                    self.main_stat_menu['menu'].delete(0, 'end')
+                    for option in self.main_stat_options:
+                        self.main_stat_menu['menu'].add_command(label=option, command=tk._setit(self.main_stat_var, option, self.update_command))
+                else:
+                    self.main_stat_var.set('No Main Stats Available')
+                    self.main_stat_menu['menu'].delete(0, 'end')
+                    self.main_stat_menu['menu'].add_command(label=self.localization['No_Main_Stats_Available'], command=tk._setit(self.main_stat_var, 'No Main Stats Available', self.update_command))
+                    self.main_stat_menu.config(state='disabled')
+            self.update_command()
         else:
             self.command_manager.update_command('')
 
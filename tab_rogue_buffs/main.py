@@ -53,4 +53,8 @@ class RogueBuffsTab:
             self.command_manager,
             self.localization
         )
-    
+
+    def refresh(self):
+        self.virtual_universe_blessings_tab.update_blessings_list()
+        self.virtual_universe_miracles_tab.update_miracles_list()
+        self.virtual_universe_misc_tab.refresh()
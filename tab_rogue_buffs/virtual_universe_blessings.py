@@ -1,6 +1,9 @@
 import tkinter as tk
 from tkinter import ttk, VERTICAL, RIGHT, LEFT, Y, StringVar, messagebox
 
+from search_engine import search_records
+from search_scheduler import search_scheduler
+
 class VirtualUniverseBlessingsTab:
     def __init__(self, notebook, rogue_buffs_su, command_manager, localization):
         self.rogue_buffs_su = rogue_buffs_su
@@ -36,6 +39,7 @@ class VirtualUniverseBlessingsTab:
         search_entry = tk.Entry(parent_frame, textvariable=self.search_var)
         search_entry.pack()
         search_entry.bind('<Return>', self.on_search)
+        self.search_var.trace('w', lambda *args: search_scheduler.schedule(search_entry, self.update_blessings_list))
 
         # Category filter
         category_label = tk.Label(parent_frame, text=self.localization["Category"])
@@ -135,11 +139,8 @@ class VirtualUniverseBlessingsTab:
         enhance_all_button.grid(row=0, column=2, padx=5)
 
     def update_blessings_list(self):
-        # Clear the listbox
-        self.blessings_listbox.delete(0, tk.END)
-
         # Get the search and filter criteria
-        search_text = self.search_var.get().lower()
+        search_text = self.search_var.get()
         selected_category = self.category_var.get()
         selected_type = self.type_var.get()
         selected_rarity = self.rarity_var.get()
@@ -182,35 +183,29 @@ class VirtualUniverseBlessingsTab:
         selected_rarity_internal = rarity_map.get(selected_rarity, '')
 
         # Populate the listbox, добавляем отображение категории и типа
-        for buff in self.rogue_buffs_su:
-            # Форматируем строку так, чтобы были видны имя, ID, категория и тип
-            display_text = f"{buff.name} ({buff.id}) - {buff.category or '—'} - {buff.buff_type or '—'}"
-            if search_text and search_text not in buff.name.lower():
-                continue
+        # Фильтры передаются в поиск: нечёткий поиск выбирает лучшие совпадения только среди них
+        def selected(buff):
             if selected_category_internal and buff.category != selected_category_internal:
-                continue
+                return False
             if selected_type_internal and buff.buff_type != selected_type_internal:
-                continue
+                return False
             if selected_rarity_internal and buff.rarity != selected_rarity_internal:
-                continue
-            self.blessings_listbox.insert(tk.END, display_text)
+                return False
+            return True
+        buffs = search_records(self.rogue_buffs_su, search_text, match_id=False, predicate=selected)
+        # Форматируем строку так, чтобы были видны имя, ID, категория и тип
+        search_scheduler.fill_listbox(
+            self.blessings_listbox, buffs,
+            lambda buff: f"{buff.name} ({buff.id}) - {buff.category or '—'} - {buff.buff_type or '—'}"
+        )
 
     def on_search(self, event=None):
+        search_scheduler.cancel(self.update_blessings_list)
         self.update_blessings_list()
 
     def on_blessing_select(self, event):
-        selected_indices = self.blessings_listbox.curselection()
-        if selected_indices:
-            index = selected_indices[0]
-            selected_blessing = self.blessings_listbox.get(index)
-            # Предполагаем, что ID находится в скобках
-            if '(' in selected_blessing and ')' in selected_blessing:
-                id_str = selected_blessing.split('(')[-1].split(')')[0]
-                self.selected_blessing_id = id_str
-            else:
-                self.selected_blessing_id = None
-        else:
-            self.selected_blessing_id = None
+        selected_blessing = search_scheduler.selected_record(self.blessings_listbox)
+        self.selected_blessing_id = selected_blessing.id if selected_blessing is not None else None
 
     def execute_get_blessing(self):
         target_id = self.selected_blessing_id
@@ -1,6 +1,9 @@
 import tkinter as tk
 from tkinter import ttk, VERTICAL, RIGHT, LEFT, Y, StringVar, messagebox
 
+from search_engine import search_records, invalidate_search_index
+from search_scheduler import search_scheduler
+
 class SimpleListTab:
     def __init__(self, notebook, items, command_manager, localization, tab_key):
         self.command_manager = command_manager
@@ -25,6 +28,7 @@ class SimpleListTab:
         search_entry = tk.Entry(search_frame, textvariable=self.search_var)
         search_entry.pack(side=tk.LEFT, padx=5)
         search_entry.bind('<Return>', self.on_search)
+        self.search_var.trace('w', lambda *args: search_scheduler.schedule(search_entry, self.update_list))
 
         # Список с прокруткой
         list_frame = tk.Frame(main_frame)
@@ -49,29 +53,16 @@ class SimpleListTab:
         self.update_list()
 
     def update_list(self):
-        self.listbox.delete(0, tk.END)
-        search_text = self.search_var.get().lower()
-        for item in self.items:
-            if search_text and search_text not in item['name'].lower():
-                continue
-            display_text = f"{item['name']} ({item['id']})"
-            self.listbox.insert(tk.END, display_text)
+        items = search_records(self.items, self.search_var.get(), match_id=False)
+        search_scheduler.fill_listbox(self.listbox, items, lambda item: f"{item['name']} ({item['id']})")
 
     def on_search(self, event=None):
+        search_scheduler.cancel(self.update_list)
         self.update_list()
 
     def on_select(self, event):
-        selected_indices = self.listbox.curselection()
-        if selected_indices:
-            index = selected_indices[0]
-            selected_text = self.listbox.get(index)
-            if '(' in selected_text and ')' in selected_text:
-                id_str = selected_text.split('(')[-1].split(')')[0]
-                self.selected_item_id = id_str
-            else:
-                self.selected_item_id = None
-        else:
-            self.selected_item_id = None
+        selected_item = search_scheduler.selected_record(self.listbox)
+        self.selected_item_id = selected_item['id'] if selected_item is not None else None
 
     def execute_get(self):
         if not self.selected_item_id:
@@ -95,6 +86,8 @@ class VirtualUniverseMiscTab:
     def __init__(self, notebook, rogue_buffs_food, rogue_buffs_various, rogue_buffs_from_entities, rogue_buffs_other, command_manager, localization):
         self.localization = localization
         self.command_manager = command_manager
+        self.rogue_buffs_from_entities = rogue_buffs_from_entities
+        self.rogue_buffs_other = rogue_buffs_other
 
         # Основной фрейм для новой группы вкладок
         self.frame = ttk.Frame(notebook)
@@ -131,3 +124,10 @@ class VirtualUniverseMiscTab:
             localization,
             "Rogue_Buffs_Entities_Other"
         )
+
+    def refresh(self):
+        # Объединённый список собирается заново, остальные списки уже обновлены на месте
+        self.entities_other_tab.items[:] = self.rogue_buffs_from_entities + self.rogue_buffs_other
+        invalidate_search_index(self.entities_other_tab.items)
+        for tab in (self.food_tab, self.various_tab, self.entities_other_tab):
+            tab.update_list()
@@ -2,6 +2,9 @@
 import tkinter as tk
 from tkinter import ttk, VERTICAL, RIGHT, LEFT, Y, StringVar, messagebox
 
+from search_engine import search_records
+from search_scheduler import search_scheduler
+
 class VirtualUniverseMiraclesTab:
     def __init__(self, notebook, rogue_miracles, command_manager, localization):
         self.rogue_miracles = rogue_miracles
@@ -37,6 +40,7 @@ class VirtualUniverseMiraclesTab:
         search_entry = tk.Entry(parent_frame, textvariable=self.miracle_search_var)
         search_entry.pack()
         search_entry.bind('<Return>', self.on_miracle_search)
+        self.miracle_search_var.trace('w', lambda *args: search_scheduler.schedule(search_entry, self.update_miracles_list))
 
         # Category filter
         category_label = tk.Label(parent_frame, text=self.localization["Category"])
@@ -79,11 +83,8 @@ class VirtualUniverseMiraclesTab:
         self.update_miracles_list()
 
     def update_miracles_list(self):
-        # Clear the listbox
-        self.miracles_listbox.delete(0, tk.END)
-
         # Get the search and filter criteria
-        search_text = self.miracle_search_var.get().lower()
+        search_text = self.miracle_search_var.get()
         selected_category = self.miracle_category_var.get()
 
         # Map localized category back to internal values
@@ -110,29 +111,21 @@ class VirtualUniverseMiraclesTab:
                 return 'unknown'
 
         # Populate the listbox
-        for miracle in self.rogue_miracles:
-            category = categorize_miracle(miracle)
-            display_text = f"{miracle['name']} ({miracle['id']})"
-            if search_text and search_text not in miracle['name'].lower():
-                continue
-            if selected_category_internal and category != selected_category_internal:
-                continue
-            self.miracles_listbox.insert(tk.END, display_text)
+        # The category filter goes into the search, so fuzzy search picks its best matches among these miracles only
+        def selected(miracle):
+            return not selected_category_internal or categorize_miracle(miracle) == selected_category_internal
+        miracles = search_records(self.rogue_miracles, search_text, match_id=False, predicate=selected)
+        search_scheduler.fill_listbox(self.miracles_listbox, miracles, lambda miracle: f"{miracle['name']} ({miracle['id']})")
 
     def on_miracle_search(self, event=None):
+        search_scheduler.cancel(self.update_miracles_list)
         self.update_miracles_list()
 
     def on_miracle_select(self, event):
-        selected_indices = self.miracles_listbox.curselection()
-        if selected_indices:
-            index = selected_indices[0]
-            selected_miracle = self.miracles_listbox.get(index)
-            if '(' in selected_miracle and ')' in selected_miracle:
-                id_str = selected_miracle.split('(')[-1].split(')')[0]
-                self.selected_miracle_id = id_str
-                self.execute_get_miracle()  # Automatically execute command when selected
-            else:
-                self.selected_miracle_id = None
+        selected_miracle = search_scheduler.selected_record(self.miracles_listbox)
+        if selected_miracle is not None:
+            self.selected_miracle_id = selected_miracle['id']
+            self.execute_get_miracle()  # Automatically execute command when selected
         else:
             self.selected_miracle_id = None
 
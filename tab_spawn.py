@@ -5,6 +5,9 @@ from tkinter import ttk
 from tkinter import VERTICAL, RIGHT, LEFT, Y, StringVar, IntVar
 from tkinter import messagebox
 
+from search_engine import search_records
+from search_scheduler import search_scheduler
+
 class SpawnTab:
     def __init__(self, notebook, props_list, npc_monsters_list, battle_stages, battle_monsters_list, command_manager, localization):
         self.notebook = notebook
@@ -14,10 +17,17 @@ class SpawnTab:
         self.battle_monsters_list = battle_monsters_list
         self.command_manager = command_manager
         self.localization = localization
+        # List refresh functions, called when the Handbook data is replaced.
+        # The 'battle' entry is replaced when switching between monsters and stages
+        self.list_updaters = {}
 
         self.frame = ttk.Frame(notebook)
         self.init_tab()
 
+    def refresh(self):
+        for update_list in self.list_updaters.values():
+            update_list()
+
     def init_tab(self):
         # Create sub-tabs
         self.sub_notebook = ttk.Notebook(self.frame)
@@ -46,7 +56,7 @@ class SpawnTab:
 
         search_entry = tk.Entry(main_frame, textvariable=search_var)
         search_entry.pack()
-        search_var.trace('w', lambda *args: update_prop_list())
+        search_var.trace('w', lambda *args: search_scheduler.schedule(search_entry, update_prop_list))
 
         # Prop selection with scrollbar
         prop_frame = tk.Frame(main_frame)
@@ -61,17 +71,11 @@ class SpawnTab:
         # Bind selection event
         def on_prop_select(event):
             nonlocal selected_prop_id
-            selected_indices = prop_listbox.curselection()
-            if selected_indices:
-                index = selected_indices[0]
-                selected_prop = prop_listbox.get(index)
-                if '(' in selected_prop and ')' in selected_prop:
-                    id_str = selected_prop.split('(')[-1].split(')')[0]
-                    selected_prop_id = id_str
-                    # Update the command
-                    update_command()
-                else:
-                    self.command_manager.update_command('')
+            selected_prop = search_scheduler.selected_record(prop_listbox)
+            if selected_prop is not None:
+                selected_prop_id = selected_prop['id']
+                # Update the command
+                update_command()
             else:
                 self.command_manager.update_command('')
 
@@ -79,18 +83,10 @@ class SpawnTab:
 
         # Update prop list function
         def update_prop_list():
-            search_text = search_var.get().lower()
-
-            props_data = self.props_list
-
-            # Clear the listbox
-            prop_listbox.delete(0, tk.END)
+            props_data = search_records(self.props_list, search_var.get())
 
-            # Populate the listbox
-            for entry in props_data:
-                display_text = f"{entry['name']} ({entry['id']})"
-                if search_text in entry['name'].lower() or search_text in entry['id']:
-                    prop_listbox.insert(tk.END, display_text)
+            # Repopulate the listbox
+            search_scheduler.fill_listbox(prop_listbox, props_data, lambda entry: f"{entry['name']} ({entry['id']})")
 
             # Clear the command
             self.command_manager.update_command('')
@@ -107,6 +103,7 @@ class SpawnTab:
             self.command_manager.update_command(command)
 
         # Initialize the prop list
+        self.list_updaters['props'] = update_prop_list
         update_prop_list()
 
     def create_monsters_tab(self):
@@ -203,7 +200,7 @@ class SpawnTab:
         npc_search_label.pack()
         npc_search_entry = tk.Entry(npc_monster_frame, textvariable=npc_search_var)
         npc_search_entry.pack()
-        npc_search_var.trace('w', lambda *args: update_npc_monster_list())
+        npc_search_var.trace('w', lambda *args: search_scheduler.schedule(npc_search_entry, update_npc_monster_list))
 
         npc_scrollbar = tk.Scrollbar(npc_monster_frame, orient=VERTICAL)
         npc_listbox = tk.Listbox(npc_monster_frame, width=50, height=20, yscrollcommand=npc_scrollbar.set, exportselection=False)
@@ -214,18 +211,11 @@ class SpawnTab:
         # Bind selection event
         def on_npc_select(event):
             nonlocal selected_npc_monster_id
-            selected_indices = npc_listbox.curselection()
-            if selected_indices:
-                index = selected_indices[0]
-                selected_npc = npc_listbox.get(index)
-                if '(' in selected_npc and ')' in selected_npc:
-                    id_str = selected_npc.split('(')[-1].split(')')[0]
-                    selected_npc_monster_id = id_str
-                    # Update the command
-                    update_command()
-                else:
-                    selected_npc_monster_id = None
-                    self.command_manager.update_command('')
+            selected_npc = search_scheduler.selected_record(npc_listbox)
+            if selected_npc is not None:
+                selected_npc_monster_id = selected_npc['id']
+                # Update the command
+                update_command()
             else:
                 selected_npc_monster_id = None
                 self.command_manager.update_command('')
@@ -294,7 +284,7 @@ class SpawnTab:
             battle_search_label.pack()
             battle_search_entry = tk.Entry(battle_frame, textvariable=battle_search_var)
             battle_search_entry.pack()
-            battle_search_var.trace('w', lambda *args: update_battle_monster_list())
+            battle_search_var.trace('w', lambda *args: search_scheduler.schedule(battle_search_entry, update_battle_monster_list))
 
             # Available Battle Monsters list
             battle_monster_frame = tk.Frame(battle_frame)
@@ -322,6 +312,8 @@ class SpawnTab:
             selected_battle_scrollbar.config(command=selected_battle_listbox.yview)
             selected_battle_scrollbar.pack(side=RIGHT, fill=Y)
             selected_battle_listbox.pack(side=LEFT, fill=tk.BOTH, expand=True)
+            # The new list starts empty: drop the monsters picked before the UI was switched
+            selected_battle_monster_ids.clear()
 
             # 'Remove' and 'Clear' buttons
             buttons_frame = tk.Frame(battle_frame)
@@ -333,41 +325,26 @@ class SpawnTab:
             clear_button.pack(side=LEFT)
 
             def update_battle_monster_list():
-                battle_search_text = battle_search_var.get().lower()
-
-                battle_monsters_data = self.battle_monsters_list
+                battle_monsters_data = search_records(self.battle_monsters_list, battle_search_var.get())
 
-                # Clear the listbox
-                battle_monster_listbox.delete(0, tk.END)
-
-                # Populate the listbox
-                for entry in battle_monsters_data:
-                    display_text = f"{entry['name']} ({entry['id']})"
-                    if battle_search_text in entry['name'].lower() or battle_search_text in entry['id']:
-                        battle_monster_listbox.insert(tk.END, display_text)
+                # Repopulate the listbox
+                search_scheduler.fill_listbox(battle_monster_listbox, battle_monsters_data, lambda entry: f"{entry['name']} ({entry['id']})")
 
             def add_battle_monster(listbox):
+                # The rows of selected_battle_listbox follow the order of selected_battle_monster_ids
                 selected_indices = listbox.curselection()
                 for index in selected_indices:
-                    selected_item = listbox.get(index)
-                    if selected_item not in selected_battle_listbox.get(0, tk.END):
-                        selected_battle_listbox.insert(tk.END, selected_item)
-                        # Extract the ID
-                        if '(' in selected_item and ')' in selected_item:
-                            id_str = selected_item.split('(')[-1].split(')')[0]
-                            selected_battle_monster_ids.append(id_str)
+                    selected_monster = search_scheduler.record_at(listbox, index)
+                    if selected_monster is not None and selected_monster['id'] not in selected_battle_monster_ids:
+                        selected_battle_listbox.insert(tk.END, listbox.get(index))
+                        selected_battle_monster_ids.append(selected_monster['id'])
                 update_command()
 
             def remove_selected_battle_monster(listbox):
                 selected_indices = listbox.curselection()
                 for index in reversed(selected_indices):
-                    selected_item = listbox.get(index)
                     listbox.delete(index)
-                    # Remove the ID from selected_battle_monster_ids
-                    if '(' in selected_item and ')' in selected_item:
-                        id_str = selected_item.split('(')[-1].split(')')[0]
-                        if id_str in selected_battle_monster_ids:
-                            selected_battle_monster_ids.remove(id_str)
+                    del selected_battle_monster_ids[index]
                 update_command()
 
             def clear_selected_battle_monsters(listbox):
@@ -375,6 +352,7 @@ class SpawnTab:
                 selected_battle_monster_ids.clear()
                 update_command()
 
+            self.list_updaters['battle'] = update_battle_monster_list
             update_battle_monster_list()
 
         def setup_stages_ui():
@@ -402,28 +380,18 @@ class SpawnTab:
 
             # Define update_battle_stage_list before it's used
             def update_battle_stage_list():
-                battle_search_text = battle_search_var.get().lower()
                 selected_level = level_var_stage.get()
 
-                battle_stages_data = self.battle_stages
-
-                # Clear the listbox
-                battle_stage_listbox.delete(0, tk.END)
+                # Filter by search text and level. The level filter goes into the search,
+                # so fuzzy search picks its best matches among stages of this level only
+                predicate = None
+                if selected_level != 'All':
+                    # The last character of the stage ID is its level
+                    predicate = lambda entry: entry['id'][-1] == selected_level
+                battle_stages_data = search_records(self.battle_stages, battle_search_var.get(), predicate=predicate)
 
-                # Populate the listbox
-                for entry in battle_stages_data:
-                    # Filter by level
-                    stage_id = entry['id']
-                    if selected_level != 'All':
-                        if not stage_id[-1].isdigit():
-                            continue  # Skip if last character is not a digit
-                        if stage_id[-1] != selected_level:
-                            continue  # Skip stages that don't match the selected level
-
-                    # Filter by search text
-                    if battle_search_text in entry['name'].lower() or battle_search_text in entry['id']:
-                        display_text = f"{entry['name']} ({entry['id']})"
-                        battle_stage_listbox.insert(tk.END, display_text)
+                # Repopulate the listbox
+                search_scheduler.fill_listbox(battle_stage_listbox, battle_stages_data, lambda entry: f"{entry['name']} ({entry['id']})")
 
             # 'Search' button
             search_button = tk.Button(battle_frame, text=self.localization["Search"], command=update_battle_stage_list)
@@ -439,15 +407,11 @@ class SpawnTab:
             # Bind selection event
             def on_battle_stage_select(event):
                 nonlocal selected_stage_id
-                selected_indices = battle_stage_listbox.curselection()
-                if selected_indices:
-                    index = selected_indices[0]
-                    selected_item = battle_stage_listbox.get(index)
-                    if '(' in selected_item and ')' in selected_item:
-                        id_str = selected_item.split('(')[-1].split(')')[0]
-                        selected_stage_id = id_str
-                        selected_battle_monster_ids.clear()
-                        update_command()
+                selected_stage = search_scheduler.selected_record(battle_stage_listbox)
+                if selected_stage is not None:
+                    selected_stage_id = selected_stage['id']
+                    selected_battle_monster_ids.clear()
+                    update_command()
                 else:
                     selected_stage_id = None
                     update_command()
@@ -455,6 +419,7 @@ class SpawnTab:
             battle_stage_listbox.bind('<<ListboxSelect>>', on_battle_stage_select)
 
             # Initialize the battle stage list
+            self.list_updaters['battle'] = update_battle_stage_list
             update_battle_stage_list()
 
 
@@ -463,20 +428,13 @@ class SpawnTab:
 
         # Update NPC Monster list function
         def update_npc_monster_list():
-            search_text = npc_search_var.get().lower()
-
-            npc_monsters_data = self.npc_monsters_list
-
-            # Clear the listbox
-            npc_listbox.delete(0, tk.END)
+            npc_monsters_data = search_records(self.npc_monsters_list, npc_search_var.get())
 
-            # Populate the listbox
-            for entry in npc_monsters_data:
-                display_text = f"{entry['name']} ({entry['id']})"
-                if search_text in entry['name'].lower() or search_text in entry['id']:
-                    npc_listbox.insert(tk.END, display_text)
+            # Repopulate the listbox
+            search_scheduler.fill_listbox(npc_listbox, npc_monsters_data, lambda entry: f"{entry['name']} ({entry['id']})")
 
         # Initialize the NPC monster list
+        self.list_updaters['npc_monsters'] = update_npc_monster_list
         update_npc_monster_list()
 
         # Trace the toggle variable to update UI when changed